@@ -1,125 +1,533 @@
-import csv
-import re
-
-BOOKS_FILE = "books_data.csv"
-RATINGS_FILE = "books_rating.csv"
-OUTPUT_FILE = "amazon_books.ttl"
-MAX_RECORDS = 300000
-
-def sanitize_identifier(text):
-    return re.sub(r'\W|^(?=\d)', '_', text.strip().lower()) if text else "unknown"
-
-def escape_literal(value):
-    if not value:
-        return ""
-    return value.replace('\\', '\\\\').replace('\n', ' ').replace('\r', ' ').replace('"', '\\"').replace('^', '').strip()
-
-def create_ttl_prefixes():
-    return """@prefix : <http://www.semanticweb.org/emili/ontologies/2025/3/recommendations/> .
-@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
-@prefix owl: <http://www.w3.org/2002/07/owl#> .
-@prefix schema: <http://schema.org/> .
-@prefix foaf: <http://xmlns.com/foaf/0.1/> .
-@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
-
-:Book a rdfs:Class .
-:Reviewer a rdfs:Class .
-:Genre a rdfs:Class .
-
-:hasGenre a rdf:Property ; rdfs:domain :Book ; rdfs:range :Genre .
-:Value a rdf:Property ; rdfs:domain schema:Rating ; rdfs:range xsd:float .
-schema:rating a rdf:Property ; rdfs:domain foaf:Person ; rdfs:range schema:Rating .
-schema:aboutBook a rdf:Property ; rdfs:domain schema:Rating ; rdfs:range schema:Book .
-
-"""
-
-def generate_genre_triple(genre):
-    genre_clean = escape_literal(genre)
-    genre_id = sanitize_identifier(genre_clean)
-    return f":{genre_id} a :Genre ;\n    rdfs:label \"{genre_clean}\" ."
-
-def generate_book_triple(book_id, title, genre):
-    title_clean = escape_literal(title)
-    genre_uri = f":{sanitize_identifier(genre)}"
-    book_uri = f":Book_{sanitize_identifier(book_id)}"
-    return f"""{book_uri} a schema:Book ;
-    rdfs:label "{title_clean}" ;
-    :hasGenre {genre_uri} ."""
-
-def generate_rating_triple(user_id, book_id, rating):
-    try:
-        rating_value = float(rating)
-    except ValueError:
-        rating_value = 0.0
-    rating_uri = f":Rating_{sanitize_identifier(user_id)}_{sanitize_identifier(book_id)}"
-    book_uri = f":Book_{sanitize_identifier(book_id)}"
-    return f"""{rating_uri} a schema:Rating ;
-    schema:aboutBook {book_uri} ;
-    :Value "{rating_value}"^^xsd:float ."""
-
-def generate_reviewer_triple(name):
-    name_clean = escape_literal(name)
-    reviewer_uri = f":{sanitize_identifier(name_clean)}"
-    return f"""{reviewer_uri} a foaf:Person ;
-    rdfs:label "{name_clean}" ."""
-
-def generate_reviewer_rating_link(name, user_id, book_id):
-    reviewer_uri = f":{sanitize_identifier(name)}"
-    rating_uri = f":Rating_{sanitize_identifier(user_id)}_{sanitize_identifier(book_id)}"
-    return f"{reviewer_uri} schema:rating {rating_uri} ."
-
-
-book_info = {}
-with open(BOOKS_FILE, newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        title = row["Title"].replace('"', '').strip()
-        category = row["categories"].replace('"', '').strip() if row["categories"] else None
-        if title and category and category.lower() != "books":
-            book_info[title.lower()] = {
-                "category": category,
-                "publisher": row.get("publisher", "")
-            }
-
-written_books = set()
-written_genres = set()
-written_reviewers = set()
-count = 0
-
-with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-    out.write(create_ttl_prefixes() + "\n")
-
-    with open(RATINGS_FILE, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if count >= MAX_RECORDS:
-                break
-
-            title = row.get("Title", "").replace('"', '').strip()
-            user_id = row.get("User_id", "").strip()
-            rating = row.get("review/score", "").strip()
-
-            if not title or title.lower() not in book_info or not user_id or not rating:
-                continue
-
-            book_data = book_info[title.lower()]
-            genre = book_data["category"]
-            profile_name = row.get("profileName", "").replace('"', '').strip() or user_id
-
-            if genre not in written_genres:
-                out.write(generate_genre_triple(genre) + "\n\n")
-                written_genres.add(genre)
-
-            if title not in written_books:
-                out.write(generate_book_triple(title, title, genre) + "\n\n")
-                written_books.add(title)
-
-            out.write(generate_rating_triple(user_id, title, rating) + "\n\n")
-
-            if profile_name not in written_reviewers:
-                out.write(generate_reviewer_triple(profile_name) + "\n\n")
-                written_reviewers.add(profile_name)
-
-            out.write(generate_reviewer_rating_link(profile_name, user_id, title) + "\n\n")
-
-            count += 1
+import argparse
+import csv
+import io
+import os
+import pickle
+import sys
+from collections import deque
+from multiprocessing import Pool
+
+from compressed_io import Compression, add_compression_arguments, compression_from_args, compression_of, open_input
+from csv_partition import read_csv_header, split_csv_ranges
+from incremental import report, write_deltas
+from instrumentation import RunReport, add_report_arguments
+from key_sets import add_dedup_arguments, new_key_map, new_key_set
+from rating_tensor import RatingTensor, report_tensor
+from rdf_emitter import (Literal, TripleEmitter, default_graph_iri, escape_literal, output_paths, parse_formats,
+                         parse_size, sanitize_identifier, spool_path, written_paths)
+from rollups import RatingRollups, report_rollups
+from sampling import RatingSampler
+
+BOOKS_FILE = "books_data.csv"
+RATINGS_FILE = "books_rating.csv"
+OUTPUT_FILE = "amazon_books.ttl"
+MAX_RECORDS = 300000
+OUTPUT_FORMATS = "turtle"
+WORKERS = 1
+# Byte ranges are kept small enough that the pool can stop early once MAX_RECORDS is reached.
+RANGE_BYTES = 64 << 20
+# "first" keeps the first MAX_RECORDS matching ratings; the others sample the whole file in one pass.
+SAMPLE_MODES = ("first", "reservoir", "genre", "book")
+
+SCHEMA_TRIPLES = [
+    (":Book", "a", "rdfs:Class"),
+    (":Reviewer", "a", "rdfs:Class"),
+    (":Genre", "a", "rdfs:Class"),
+    (":hasGenre", "a", "rdf:Property"),
+    (":hasGenre", "rdfs:domain", ":Book"),
+    (":hasGenre", "rdfs:range", ":Genre"),
+    (":Value", "a", "rdf:Property"),
+    (":Value", "rdfs:domain", "schema:Rating"),
+    (":Value", "rdfs:range", "xsd:float"),
+    ("schema:rating", "a", "rdf:Property"),
+    ("schema:rating", "rdfs:domain", "foaf:Person"),
+    ("schema:rating", "rdfs:range", "schema:Rating"),
+    ("schema:aboutBook", "a", "rdf:Property"),
+    ("schema:aboutBook", "rdfs:domain", "schema:Rating"),
+    ("schema:aboutBook", "rdfs:range", "schema:Book"),
+]
+
+def generate_genre_triples(genre):
+    genre_clean = escape_literal(genre)
+    genre_uri = f":{sanitize_identifier(genre_clean)}"
+    return [
+        (genre_uri, "a", ":Genre"),
+        (genre_uri, "rdfs:label", Literal(genre_clean)),
+    ]
+
+def generate_book_triples(book_id, title, genre):
+    book_uri = f":Book_{sanitize_identifier(book_id)}"
+    return [
+        (book_uri, "a", "schema:Book"),
+        (book_uri, "rdfs:label", Literal(escape_literal(title))),
+        (book_uri, ":hasGenre", f":{sanitize_identifier(genre)}"),
+    ]
+
+def generate_rating_triples(user_id, book_id, rating):
+    try:
+        rating_value = float(rating)
+    except ValueError:
+        rating_value = 0.0
+    rating_uri = f":Rating_{sanitize_identifier(user_id)}_{sanitize_identifier(book_id)}"
+    return [
+        (rating_uri, "a", "schema:Rating"),
+        (rating_uri, "schema:aboutBook", f":Book_{sanitize_identifier(book_id)}"),
+        (rating_uri, ":Value", Literal(str(rating_value), "xsd:float")),
+    ]
+
+# Context values rolled up with --rollups next to the totals per book and media type.
+ROLLUP_DIMENSIONS = [(":hasGenre",)]
+
+def rating_args(title, rating, genre):
+    # Item, media type, value and context of one rating for --rollups and --tensor (same parsing as the triples).
+    try:
+        rating_value = float(rating)
+    except ValueError:
+        rating_value = 0.0
+    return (f":Book_{sanitize_identifier(title)}", "schema:Book", rating_value,
+            [(":hasGenre", f":{sanitize_identifier(genre)}")])
+
+def generate_reviewer_triples(name):
+    name_clean = escape_literal(name)
+    reviewer_uri = f":{sanitize_identifier(name_clean)}"
+    return [
+        (reviewer_uri, "a", "foaf:Person"),
+        (reviewer_uri, "rdfs:label", Literal(name_clean)),
+    ]
+
+def generate_reviewer_rating_link(name, user_id, book_id):
+    reviewer_uri = f":{sanitize_identifier(name)}"
+    rating_uri = f":Rating_{sanitize_identifier(user_id)}_{sanitize_identifier(book_id)}"
+    return [(reviewer_uri, "schema:rating", rating_uri)]
+
+
+def load_book_info(books_file, run_report=None, dedup_store="exact"):
+    # Lowercased title -> category; the hashed table keeps a few bytes per title (see key_sets).
+    run_report = run_report or RunReport()
+    book_info = new_key_map(dedup_store)
+    with open_input(books_file, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            title = row["Title"].replace('"', '').strip()
+            category = row["categories"].replace('"', '').strip() if row["categories"] else None
+            if not title:
+                run_report.skip("book without title")
+            elif not category:
+                run_report.skip("book without category")
+            elif category.lower() == "books":
+                run_report.skip("book in the generic 'Books' category")
+            else:
+                book_info[title.lower()] = category
+    return book_info
+
+def iter_matching_ratings(reader, book_info, limit, run_report=None):
+    run_report = run_report or RunReport()
+    count = 0
+    for row in reader:
+        if count >= limit:
+            break
+
+        title = row.get("Title", "").replace('"', '').strip()
+        user_id = row.get("User_id", "").strip()
+        rating = row.get("review/score", "").strip()
+
+        if not title:
+            run_report.skip("rating without title")
+            continue
+        genre = book_info.get(title.lower())
+        if genre is None:
+            run_report.skip("rating of a title missing from book_info")
+            continue
+        if not user_id or not rating:
+            run_report.skip("rating without User_id or review/score")
+            continue
+
+        profile_name = row.get("profileName", "").replace('"', '').strip() or user_id
+        yield title, user_id, rating, profile_name, genre
+        count += 1
+        run_report.progress(count, "ratings")
+
+def add_tensor_rating(rating_tensor, title, rating, profile_name, genre):
+    item, _, value, context = rating_args(title, rating, genre)
+    rating_tensor.add(f":{sanitize_identifier(profile_name)}", item, value, context)
+
+class OffsetLines:
+    # Decoded lines of a binary stream; offset is the byte position after the last line read.
+    # csv readers do not read ahead, so after a row it is the start of the next record.
+    def __init__(self, f, offset=0):
+        self._f = f
+        self.offset = offset
+
+    def __iter__(self):
+        for line in self._f:
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+def read_ratings(ratings_file, book_info, limit, run_report, position):
+    # Yields the matching ratings from position["offset"] on and keeps position at the record after
+    # the last one yielded.  position["fieldnames"] is None when the header is still to be read.
+    with open_input(ratings_file, "rb") as f:
+        if position["offset"]:
+            f.seek(position["offset"])
+        lines = OffsetLines(f, position["offset"])
+        reader = csv.DictReader(lines, fieldnames=position["fieldnames"])
+        for rating in iter_matching_ratings(reader, book_info, limit, run_report):
+            position["offset"] = lines.offset
+            position["fieldnames"] = reader.fieldnames
+            yield rating
+
+def checkpoint_path(output_file):
+    return os.path.splitext(output_file)[0] + ".checkpoint"
+
+def run_signature(ratings_file, books_file, output_file, formats, max_records, sample, seed, incremental, rollups,
+                  tensor, dedup_store):
+    # A checkpoint is only resumed by a run with the same inputs and options.
+    files = [(os.path.abspath(path), os.path.getsize(path), os.stat(path).st_mtime_ns)
+             for path in (ratings_file, books_file)]
+    return (files, os.path.abspath(output_file), list(formats), max_records, sample, seed, incremental, rollups,
+            tensor, dedup_store)
+
+def save_checkpoint(path, state):
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+def load_checkpoint(path, signature):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state["signature"] != signature:
+        raise ValueError(f"'{path}' was written by a run with other inputs or options; "
+                         f"rerun with the same ones or without --resume")
+    return state
+
+def sample_stratum(sample, title, genre):
+    return None if sample == "reservoir" else genre if sample == "genre" else title
+
+def emit_rating(out, written, title, user_id, rating, profile_name, genre, rating_rollups, rating_tensor):
+    written_genres, written_books, written_reviewers = written
+    if genre not in written_genres:
+        out.extend(generate_genre_triples(genre))
+        written_genres.add(genre)
+
+    if title not in written_books:
+        out.extend(generate_book_triples(title, title, genre))
+        written_books.add(title)
+
+    out.extend(generate_rating_triples(user_id, title, rating))
+
+    if profile_name not in written_reviewers:
+        out.extend(generate_reviewer_triples(profile_name))
+        written_reviewers.add(profile_name)
+
+    out.extend(generate_reviewer_rating_link(profile_name, user_id, title))
+    if rating_rollups is not None:
+        rating_rollups.add(*rating_args(title, rating, genre))
+    if rating_tensor is not None:
+        add_tensor_rating(rating_tensor, title, rating, profile_name, genre)
+
+def process_ratings(ratings_file, output_file, book_info, max_records, formats=("turtle",), incremental=False,
+                    rollups=False, tensor=False, run_report=None, compression=Compression(), shard_bytes=None,
+                    sample="first", seed=None, checkpoint_every=0, resume=False, books_file=BOOKS_FILE,
+                    dedup_store="exact"):
+    run_report = run_report or RunReport()
+    checkpoint_file = checkpoint_path(output_file)
+    signature = None
+    if checkpoint_every or resume:
+        signature = run_signature(ratings_file, books_file, output_file, formats, max_records, sample, seed,
+                                  incremental, rollups, tensor, dedup_store)
+    # Skips counted before this point (while loading books_data.csv) are not part of a checkpoint.
+    skipped_before = dict(run_report.skipped)
+    state = load_checkpoint(checkpoint_file, signature) if resume else None
+    if state is None:
+        state = {
+            "signature": signature,
+            # offset and fieldnames of the next ratings record, see read_ratings()
+            "position": {"offset": 0, "fieldnames": None},
+            "sampler": RatingSampler(max_records, seed) if sample != "first" else None,
+            "sample": None,
+            "count": 0,
+            "written": (new_key_set(dedup_store), new_key_set(dedup_store), new_key_set(dedup_store)),
+            "emitter": None,
+            "rollups": RatingRollups(ROLLUP_DIMENSIONS) if rollups else None,
+            "tensor": RatingTensor([":hasGenre"]) if tensor else None,
+            "skipped": {},
+        }
+    else:
+        print(f"Resuming from '{checkpoint_file}' ({state['count']} ratings written)", file=sys.stderr)
+        for reason, count in state["skipped"].items():
+            run_report.skip(reason, count)
+    rating_rollups = state["rollups"]
+    rating_tensor = state["tensor"]
+
+    def checkpoint(out=None):
+        if out is not None:
+            state["emitter"] = out.checkpoint()
+        state["skipped"] = {reason: count - skipped_before.get(reason, 0)
+                            for reason, count in run_report.skipped.items()}
+        save_checkpoint(checkpoint_file, state)
+
+    if state["sampler"] is not None:
+        # One pass over the whole file; the graph is written from the sample afterwards.
+        sampler = state["sampler"]
+        with run_report.stage("sampling"):
+            for rating in read_ratings(ratings_file, book_info, sys.maxsize, run_report, state["position"]):
+                sampler.add(rating, sample_stratum(sample, rating[0], rating[4]))
+                if checkpoint_every and sampler.position % checkpoint_every == 0:
+                    checkpoint()
+        state["sample"] = sampler.items()
+        state["sampler"] = None
+
+    with run_report.stage("ratings"), TripleEmitter(output_file, formats=formats, track_entities=incremental,
+                                                    compression=compression, shard_bytes=shard_bytes,
+                                                    resume=state["emitter"]) as out:
+        if state["emitter"] is None:
+            out.extend(SCHEMA_TRIPLES)
+        if state["sample"] is not None:
+            ratings = state["sample"][state["count"]:]
+        else:
+            ratings = read_ratings(ratings_file, book_info, max_records - state["count"], run_report,
+                                   state["position"])
+        for rating in ratings:
+            emit_rating(out, state["written"], *rating, rating_rollups, rating_tensor)
+            state["count"] += 1
+            if checkpoint_every and state["count"] % checkpoint_every == 0:
+                checkpoint(out)
+    count = state["count"]
+    run_report.record_emitter(out, "ratings")
+    run_report.count("rows", count)
+    run_report.count("triples", out.triple_count)
+
+    if incremental:
+        with run_report.stage("incremental"):
+            report(output_file, write_deltas(output_file, out.entity_hashes))
+    if rating_rollups is not None:
+        with run_report.stage("rollups"):
+            rating_rollups.write(output_file)
+        report_rollups(output_file, rating_rollups)
+    if rating_tensor is not None:
+        with run_report.stage("tensor"):
+            rating_tensor.write(output_file)
+        report_tensor(output_file, rating_tensor)
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    return out.triple_count
+
+
+# Per-process state, set once by the pool initializer
+_worker_state = {}
+
+def _init_worker(ratings_file, fieldnames, book_info, formats, graph, incremental, rollups, tensor):
+    _worker_state.update(ratings_file=ratings_file, fieldnames=fieldnames, book_info=book_info,
+                         formats=formats, graph=graph, incremental=incremental, rollups=rollups, tensor=tensor)
+
+def process_range(task):
+    # Writes the per-rating triples of one byte range to a headerless fragment and
+    # returns the genres, books and reviewers it references so the parent can define them once.
+    index, start, end, limit, fragment_path = task
+    with open(_worker_state["ratings_file"], "rb") as f:
+        f.seek(start)
+        data = f.read(end - start).decode("utf-8")
+    reader = csv.DictReader(io.StringIO(data, newline=''), fieldnames=_worker_state["fieldnames"])
+
+    genres = {}
+    books = {}
+    reviewers = {}
+    rating_rollups = RatingRollups(ROLLUP_DIMENSIONS) if _worker_state["rollups"] else None
+    rating_tensor = RatingTensor([":hasGenre"]) if _worker_state["tensor"] else None
+    run_report = RunReport()
+    count = 0
+    with run_report.stage("ratings"), TripleEmitter(fragment_path, formats=_worker_state["formats"], header=False,
+                                                    graph=_worker_state["graph"],
+                                                    track_entities=_worker_state["incremental"]) as out:
+        for title, user_id, rating, profile_name, genre in iter_matching_ratings(reader, _worker_state["book_info"], limit,
+                                                                                 run_report):
+            genres[genre] = None
+            books.setdefault(title, genre)
+            reviewers[profile_name] = None
+            out.extend(generate_rating_triples(user_id, title, rating))
+            out.extend(generate_reviewer_rating_link(profile_name, user_id, title))
+            if rating_rollups is not None:
+                rating_rollups.add(*rating_args(title, rating, genre))
+            if rating_tensor is not None:
+                add_tensor_rating(rating_tensor, title, rating, profile_name, genre)
+            count += 1
+    run_report.record_emitter(out, "ratings")
+    cells = rating_rollups.cells if rating_rollups is not None else None
+    return (index, count, out.triple_count, list(genres), books, list(reviewers), out.entity_hashes, cells,
+            run_report.to_dict(), rating_tensor)
+
+def process_ratings_parallel(ratings_file, output_file, book_info, max_records, workers, formats=("turtle",),
+                             incremental=False, rollups=False, tensor=False, run_report=None,
+                             compression=Compression(), dedup_store="exact"):
+    run_report = run_report or RunReport()
+    parts = max(workers, os.path.getsize(ratings_file) // RANGE_BYTES + 1)
+    ranges = split_csv_ranges(ratings_file, parts)
+    stem, extension = os.path.splitext(output_file)
+    fragments = [f"{stem}.part{i}{extension}" for i in range(len(ranges))]
+    tasks = [(i, start, end, max_records, fragments[i]) for i, (start, end) in enumerate(ranges)]
+    fieldnames = read_csv_header(ratings_file)
+
+    accepted = []
+    total = 0
+    try:
+        initargs = (ratings_file, fieldnames, book_info, formats, default_graph_iri(output_file), incremental,
+                    rollups, tensor)
+        with run_report.stage("ratings (pool)"), Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            # Ranges are submitted a few at a time and consumed in order, so the first
+            # max_records matches are the same as in a serial run and the rest is never read.
+            pending = deque()
+            next_task = 0
+            while pending or next_task < len(tasks):
+                while next_task < len(tasks) and len(pending) < workers * 2:
+                    pending.append(pool.apply_async(process_range, (tasks[next_task],)))
+                    next_task += 1
+                result = pending.popleft().get()
+                count = result[1]
+                if total + count > max_records:
+                    index, start, end, _, fragment = tasks[result[0]]
+                    result = pool.apply(process_range, ((index, start, end, max_records - total, fragment),))
+                    count = result[1]
+                accepted.append(result)
+                total += count
+                run_report.progress(total, "ratings")
+                if total >= max_records:
+                    break
+            for result in pending:
+                result.wait()
+            pool.close()
+            pool.join()
+
+        written_genres = new_key_set(dedup_store)
+        written_books = new_key_set(dedup_store)
+        written_reviewers = new_key_set(dedup_store)
+        with run_report.stage("merge"), TripleEmitter(output_file, formats=formats, track_entities=incremental,
+                                                      compression=compression) as out:
+            out.extend(SCHEMA_TRIPLES)
+            for index, count, triple_count, genres, books, reviewers, entity_hashes, cells, _, _ in accepted:
+                for genre in genres:
+                    if genre not in written_genres:
+                        out.extend(generate_genre_triples(genre))
+                        written_genres.add(genre)
+                for title, genre in books.items():
+                    if title not in written_books:
+                        out.extend(generate_book_triples(title, title, genre))
+                        written_books.add(title)
+                for profile_name in reviewers:
+                    if profile_name not in written_reviewers:
+                        out.extend(generate_reviewer_triples(profile_name))
+                        written_reviewers.add(profile_name)
+            for index, count, triple_count, genres, books, reviewers, entity_hashes, cells, _, _ in accepted:
+                out.append_fragment(fragments[index], triple_count, entity_hashes)
+        run_report.record_emitter(out, "merge")
+    finally:
+        for fragment in fragments:
+            for path in [*output_paths(fragment, formats).values(), spool_path(fragment)]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    for result in accepted:
+        run_report.merge(result[8])
+    run_report.count("rows", total)
+    run_report.count("triples", out.triple_count)
+
+    if incremental:
+        with run_report.stage("incremental"):
+            report(output_file, write_deltas(output_file, out.entity_hashes))
+    if rollups:
+        with run_report.stage("rollups"):
+            rating_rollups = RatingRollups(ROLLUP_DIMENSIONS)
+            for result in accepted:
+                rating_rollups.merge(result[7])
+            rating_rollups.write(output_file)
+        report_rollups(output_file, rating_rollups)
+    if tensor:
+        with run_report.stage("tensor"):
+            rating_tensor = RatingTensor([":hasGenre"])
+            for result in accepted:
+                rating_tensor.merge(result[9])
+            rating_tensor.write(output_file)
+        report_tensor(output_file, rating_tensor)
+    return out.triple_count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert the Amazon books ratings dump to Turtle.")
+    parser.add_argument("--books", default=BOOKS_FILE)
+    parser.add_argument("--ratings", default=RATINGS_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--max-records", type=int, default=MAX_RECORDS)
+    parser.add_argument("--formats", type=parse_formats, default=OUTPUT_FORMATS,
+                        help="comma-separated output formats: turtle, xml, nt, nq, binary (written next to --output)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="also write insert/delete delta files against the manifest of the previous run")
+    parser.add_argument("--rollups", action="store_true",
+                        help="also write rating count/sum rollups per book, genre and media type (.rollups.csv/.ttl)")
+    parser.add_argument("--tensor", action="store_true",
+                        help="also write the reviewer x book ratings with a coded genre column as .npy arrays (.tensor/)")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="number of processes for the ratings file (0 = all cores)")
+    parser.add_argument("--shard-bytes", type=parse_size,
+                        help="split the graph into self-contained shards of about this size (e.g. 64M) "
+                             "with a .shards.json manifest")
+    add_dedup_arguments(parser)
+    parser.add_argument("--sample", choices=SAMPLE_MODES, default="first",
+                        help="which --max-records ratings to keep: the first ones, or a one-pass sample of the "
+                             "whole file (reservoir = uniform, genre/book = equal share per genre or book, the share "
+                             "of small ones going to the others); fewer ratings only when the file has fewer matching "
+                             "ones, and with more books than --max-records a random subset of books gives one each")
+    parser.add_argument("--seed", type=int, help="random seed of --sample")
+    parser.add_argument("--checkpoint-every", type=int, default=0, metavar="RATINGS",
+                        help="save a checkpoint (<output>.checkpoint) every RATINGS ratings (0 = never)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run from its checkpoint (same inputs and options)")
+    add_compression_arguments(parser)
+    add_report_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    workers = args.workers or os.cpu_count()
+    if workers > 1 and compression_of(args.ratings):
+        # A compressed file cannot be split into byte ranges; it is read as one stream.
+        print(f"'{args.ratings}' is compressed, reading it with one worker", file=sys.stderr)
+        workers = 1
+    if workers > 1 and args.shard_bytes:
+        # Worker fragments are appended as text, so they cannot be split by subject.
+        print("sharded output is written with one worker", file=sys.stderr)
+        workers = 1
+    if workers > 1 and (args.sample != "first" or args.checkpoint_every or args.resume):
+        # Sampling reads the whole file in order; checkpoints record one input offset.
+        print("sampled or checkpointed runs use one worker", file=sys.stderr)
+        workers = 1
+    if (args.checkpoint_every or args.resume) and (args.compress or args.shard_bytes or "binary" in args.formats):
+        sys.exit("--checkpoint-every and --resume need plain text outputs (no --compress, --shard-bytes or binary)")
+    if (args.checkpoint_every or args.resume) and args.dedup_store == "disk":
+        sys.exit("--checkpoint-every and --resume cannot save a --dedup-store disk; use exact or hashed")
+    run_report = RunReport("amazon")
+    run_report.enable(args.progress, args.profile, args.tracemalloc)
+    compression = compression_from_args(args)
+    with run_report.stage("load books"):
+        book_info = load_book_info(args.books, run_report, args.dedup_store)
+    if workers > 1:
+        triples = process_ratings_parallel(args.ratings, args.output, book_info, args.max_records, workers,
+                                           args.formats, args.incremental, args.rollups, args.tensor, run_report,
+                                           compression, args.dedup_store)
+    else:
+        try:
+            triples = process_ratings(args.ratings, args.output, book_info, args.max_records, args.formats,
+                                      args.incremental, args.rollups, args.tensor, run_report,
+                                      compression, args.shard_bytes, args.sample, args.seed,
+                                      args.checkpoint_every, args.resume, args.books, args.dedup_store)
+        except ValueError as error:
+            sys.exit(str(error))
+    run_report.finish(args.report)
+    paths = written_paths(args.output, args.formats, compression, args.shard_bytes)
+    print(f"TTL generated in {', '.join(repr(path) for path in paths)} ({triples} triples)")
+
+
+if __name__ == "__main__":
+    main()
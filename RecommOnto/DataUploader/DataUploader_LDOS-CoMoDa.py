@@ -1,294 +1,556 @@
-import csv
-
-movie_mapping_file = "mapping_files/Out_Mapping_Film.txt"
-actor_mapping_file = "mapping_files/Out_Mapping_Attori.txt"
-director_mapping_file = "mapping_files/Out_Mapping_Registi.txt"
-csv_file_path = "LDOS-CoMoDa.csv"
-ttl_output_path = "output_LDOS-CoMoDa.ttl"
-
-gender_map = {'1': 'Male', '2': 'Female'}
-time_map = {'1': 'Morning', '2': 'Afternoon', '3': 'Evening', '4': 'Night'}
-daytype_map = {'1': 'WorkingDay', '2': 'Weekend', '3': 'Holiday'}
-season_map = {'1': 'Spring', '2': 'Summer', '3': 'Autumn', '4': 'Winter'}
-location_map = {'1': 'Home', '2': 'PublicPlace', '3': 'FriendsHouse'}
-weather_map = {'1': 'Sunny', '2': 'Rainy', '3': 'Stormy', '4': 'Snowy', '5': 'Cloudy'}
-social_map = {
-    '1': 'Alone', '2': 'Partner', '3': 'Friends', '4': 'Colleagues',
-    '5': 'Parents', '6': 'Public', '7': 'Family'
-}
-emotion_map = {
-    '1': 'Sad', '2': 'Happy', '3': 'Scared', '4': 'Surprised',
-    '5': 'Angry', '6': 'Disgusted', '7': 'Neutral'
-}
-mood_map = {'1': 'Positive', '2': 'Neutral', '3': 'Negative'}
-physical_map = {'1': 'Healthy', '2': 'Ill'}
-genre_map = {
-    '1': 'Action', '2': 'Adventure', '3': 'Animation', '4': 'Biography', '5': 'Comedy', '6': 'Crime',
-    '7': 'Documentary', '8': 'Drama', '9': 'Family', '10': 'Fantasy', '11': 'History', '12': 'Horror',
-    '13': 'Music', '14': 'Musical', '15': 'Mystery', '16': 'Romance', '17': 'Sci-Fi', '18': 'Sport',
-    '19': 'Thriller', '20': 'War', '21': 'Western'
-}
-age_map = {'1':'Teen', '2':'Adult', '3':'Senior', '4':'UnknownAge'}
-
-movie_map = {}
-actor_map = {}
-director_map = {}
-
-with open(movie_mapping_file, "r", encoding="utf-8") as f:
-    for line in f:
-        parts = line.strip().split("\t")
-        if len(parts) < 3:
-            parts = line.strip().split(" ", 2)
-        if len(parts) == 3:
-            mid, title, uri = parts
-            movie_map[mid.strip()] = {"title": title.strip(), "uri": uri.strip()}
-
-with open(actor_mapping_file, "r", encoding="utf-8") as f:
-    for line in f:
-        parts = line.strip().split("\t")
-        if len(parts) != 3:
-            parts = line.strip().split(" ", 2)
-        if len(parts) == 3:
-            aid, name, uri = parts
-            actor_map[aid.strip()] = {"name": name.strip(), "uri": uri.strip()}
-
-with open(director_mapping_file, "r", encoding="utf-8") as f:
-    for line in f:
-        parts = line.strip().split("\t")
-        if len(parts) != 3:
-            parts = line.strip().split(" ", 2)
-        if len(parts) == 3:
-            did, name, uri = parts
-            director_map[did.strip()] = {"name": name.strip(), "uri": uri.strip()}
-
-def map_value(value, mapping):
-    return mapping.get(str(value).strip(), "Unknown")
-
-def get_age_group(age_value):
-    try:
-        age = int(age_value)
-        if age < 20:
-            return "Teen"
-        elif age < 65:
-            return "Adult"
-        else:
-            return "Senior"
-    except ValueError:
-        return "UnknownAge"
-
-def get_literal_or_unknown(value: str) -> str:
-    val = value.strip()
-    if not val or val.lower() == "unknown":
-        return '"Unknown"^^xsd:string'
-    return f':{val}'
-
-def sanitize_identifier(name: str) -> str:
-    return name.strip().replace(" ", "_").replace(".", "").replace(",", "").replace("-", "").replace("'", "").replace("/", "")
-
-
-def generate_movie_triples(row):
-    mid = row['itemID']
-    movie_data = movie_map.get(mid, {})
-    title = movie_data.get("title", f"UnknownMovie{mid}")
-    movie_uri = f":Movie{mid}"
-
-    did = row.get("director")
-    director_data = director_map.get(did, {})
-    director_uri = f":{sanitize_identifier(director_data.get('name', 'UnknownDirector'))}"
-
-    actor_uris = []
-    for actor_col in ['actor1', 'actor2', 'actor3']:
-        aid = row.get(actor_col)
-        if aid:
-            actor_name = actor_map.get(aid.strip(), {}).get('name', 'UnknownActor')
-            actor_uri = f":{sanitize_identifier(actor_name)}"
-            actor_uris.append(actor_uri)
-
-    genres = []
-    for genre_col in ['genre1', 'genre2', 'genre3']:
-        gids = row.get(genre_col, "").split(",")
-        for gid in gids:
-            gid = gid.strip()
-            if gid:
-                genre_uri = f":{map_value(gid, genre_map)}"
-                genres.append(genre_uri)
-
-    same_as = movie_data.get("uri")
-
-    triples = [
-        f"{movie_uri} a schema:Movie ;",
-        f'    rdfs:label "{title}" ;',
-        f'    :hasDirector {director_uri} ;',
-        f'    :hasCountry "{row["movieCountry"]}"^^xsd:string ;',
-        f'    :hasLanguage "{row["movieLanguage"]}"^^xsd:string ;',
-        f'    :hasYearOfProduction "{row["movieYear"]}"^^xsd:gYear ;',
-    ]
-
-    if genres:
-        triples.append(f'    :hasGenre {", ".join(genres)} ;')
-    if actor_uris:
-        triples.append(f'    :hasArtist {", ".join(actor_uris)} ;')
-
-    triples.append(f'    :hasBudget "{row["budget"]}"^^xsd:float{" ;" if same_as else " ." }')
-
-    if same_as:
-        triples.append(f'    owl:sameAs <{same_as}> .')
-
-    return "\n".join(triples)
-
-
-def generate_contextual_triples(row):
-    uid = row['userID']
-    mid = row['itemID']
-    context_uri = f":Context{uid}_{mid}"
-    rating_uri = f":Rating{uid}_{mid}"
-
-    triples = [
-        f"{context_uri} a :Context ;",
-        f"    :hasDemographicContext :DemographicContext{uid} ;",
-        f"    :hasLocationContext :LocationContext{uid}_{mid} ;",
-        f"    :hasWeatherContext :WeatherContext{uid}_{mid} ;",
-        f"    :hasSocialContext :SocialContext{uid}_{mid} ;",
-        f"    :hasUsersStateContext :UsersStateContext{uid}_{mid} ;",
-        f"    :hasEmotionalContext :EmotionalContext{uid}_{mid} ;",
-        f"    :hasTimeContext :TimeContext{uid}_{mid} .",
-
-        f":DemographicContext{uid} a :DemographicContext ;",
-        f"    :hasGender :{map_value(row['sex'], gender_map)} ;",
-        f"    :hasAgeGroup :{get_age_group(row['age'])} .",
-
-        f":LocationContext{uid}_{mid} a :LocationContext ;",
-        f"    :hasLocation :Location{uid}_{mid} .",
-
-        f":Location{uid}_{mid} a :Location ;",
-        f"    :hasCity :City{row['city']} ;",
-        f"    :hasCountry :Country{row['country']} ;",
-        f"    :hasLocation :{map_value(row['location'], location_map)} .",
-
-        f":WeatherContext{uid}_{mid} a :WeatherContext ;",
-        f"    :hasWeather :{map_value(row['weather'], weather_map)} .",
-
-        f":SocialContext{uid}_{mid} a :SocialContext ;",
-        f"    :hasCompanion :{map_value(row['social'], social_map)} .",
-
-        f":UsersStateContext{uid}_{mid} a :UsersStateContext ;",
-        f"    :hasPhysicalState :{map_value(row['physical'], physical_map)} ;",
-        f"    :hasUsersMood :{map_value(row['mood'], mood_map)} .",
-
-        f":EmotionalContext{uid}_{mid} a :EmotionalContext ;",
-        f"    :dominantEmotion :{map_value(row['dominantEmo'], emotion_map)} ;",
-        f"    :endEmotion :{map_value(row['endEmo'], emotion_map)} .",
-
-        f":TimeContext{uid}_{mid} a :TimeContext ;",
-        f"    :hasTime :Time{uid}_{mid} .",
-
-        f":Time{uid}_{mid} a :Time ;",
-        f"    :hasSeason :{map_value(row['season'], season_map)} ;",
-        f"    :hasTimeOfDay :{map_value(row['time'], time_map)} ;",
-        f"    :hasDayOfWeek :{map_value(row['daytype'], daytype_map)} .",
-
-        f":City{row['city']} a :City .",
-        f":Country{row['country']} a :Country ."
-    ]
-
-    return "\n".join(triples)
-
-
-def write_instances(mapping, class_name):
-    return "\n".join([
-        f":{v} a :{class_name} ; rdfs:label \"{v}\"^^xsd:string ." for v in mapping.values()
-    ])
-
-def generate_static_instances():
-    lines = []
-
-    added_actors = set()
-    added_directors = set()
-
-    for aid, actor in actor_map.items():
-        name_id = actor["name"].replace(" ", "_").replace(".", "").replace(",", "").replace("'", "").replace("-","").replace("/","")
-        if name_id not in added_actors:
-            lines.append(f":{name_id} a :Actor ; rdfs:label \"{actor['name']}\" .")
-            added_actors.add(name_id)
-
-    for did, director in director_map.items():
-        name_id = director["name"].replace(" ", "_").replace(".", "").replace(",", "").replace("'", "").replace("-","").replace("/","")
-        if name_id not in added_directors and name_id not in added_actors:
-            lines.append(f":{name_id} a :Director ; rdfs:label \"{director['name']}\" .")
-            added_directors.add(name_id)
-
-    return "\n".join(lines)
-
-def generate_triples_from_row(row):
-    uid = row['userID']
-    mid = row['itemID']
-    rating_val = float(row['rating'])
-    context_uri = f":Context{uid}_{mid}"
-
-    triples = [
-
-        f":Rating{uid}_{mid} a schema:Rating ;",
-        f"    schema:ratingValue \"{rating_val}\"^^xsd:float ;",
-        f"    :hasContext {context_uri} ;",
-        f"    schema:item :Movie{mid} . \n"
-
-        f":User{uid} a foaf:Person ;",
-        f"    :userID \"{uid}\"^^xsd:string ;",
-        f"    :rated :Rating{uid}_{mid} . \n",
-    ]
-
-    context_triples = generate_contextual_triples(row)
-    triples.append(context_triples)
-
-    return "\n".join(triples)
-
-def process_csv_to_ttl(csv_file_path, ttl_output_path):
-    with open(csv_file_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        with open(ttl_output_path, 'w', encoding='utf-8') as ttlfile:
-            ttlfile.write("""@prefix : <http://www.semanticweb.org/emili/ontologies/2025/3/recommendations/> .
-@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
-@prefix owl: <http://www.w3.org/2002/07/owl#> .
-@prefix schema: <http://schema.org/> .
-@prefix foaf: <http://xmlns.com/foaf/0.1/> .
-@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
-
-:Actor a owl:Class ;
-    rdfs:label "Actor" .
-:Director a owl:Class ;
-    rdfs:label "Director" .
-
-
-""")
-            ttlfile.write(generate_static_instances())
-            ttlfile.write("\n\n")
-            ttlfile.write(write_instances(gender_map, "Gender") + "\n")
-            ttlfile.write(write_instances(time_map, "TimeOfDay") + "\n")
-            ttlfile.write(write_instances(daytype_map, "DayType") + "\n")
-            ttlfile.write(write_instances(season_map, "Season") + "\n")
-            ttlfile.write(write_instances(location_map, "LocationType") + "\n")
-            ttlfile.write(write_instances(weather_map, "Weather") + "\n")
-            ttlfile.write(write_instances(social_map, "Companion") + "\n")
-            ttlfile.write(write_instances(emotion_map, "Emotion") + "\n")
-            ttlfile.write(write_instances(mood_map, "UsersMood") + "\n")
-            ttlfile.write(write_instances(physical_map, "PhysicalState") + "\n")
-            ttlfile.write(write_instances(genre_map, "Genre") + "\n")
-            ttlfile.write(write_instances(age_map, "AgeGroup") + "\n")
-            ttlfile.write("\n\n\n\n")
-
-            for row in reader:
-                ttlfile.write(generate_movie_triples(row))
-                ttlfile.write("\n\n")
-
-                ttlfile.write("\n\n\n")
-                ttlfile.write(generate_contextual_triples(row))
-                ttlfile.write("\n\n")
-                ttlfile.write(generate_triples_from_row(row))
-
-                ttlfile.write("\n\n\n")
-
-
-
-
-process_csv_to_ttl(csv_file_path, ttl_output_path)
-print(f"TTL generated in '{ttl_output_path}'")
+import argparse
+import csv
+import hashlib
+import tempfile
+
+from compressed_io import Compression, add_compression_arguments, compression_from_args, open_input
+from incremental import report, write_deltas
+from instrumentation import RunReport, add_report_arguments
+from key_sets import add_dedup_arguments, new_key_set
+from mapping_index import load_mapping
+from rating_tensor import RatingTensor, report_tensor
+from rdf_emitter import Literal, TripleEmitter, escape_literal, parse_formats, parse_size, written_paths
+from rollups import RatingRollups, report_rollups
+
+movie_mapping_file = "mapping_files/Out_Mapping_Film.txt"
+actor_mapping_file = "mapping_files/Out_Mapping_Attori.txt"
+director_mapping_file = "mapping_files/Out_Mapping_Registi.txt"
+csv_file_path = "LDOS-CoMoDa.csv"
+ttl_output_path = "output_LDOS-CoMoDa.ttl"
+output_formats = "turtle"
+
+gender_map = {'1': 'Male', '2': 'Female'}
+time_map = {'1': 'Morning', '2': 'Afternoon', '3': 'Evening', '4': 'Night'}
+daytype_map = {'1': 'WorkingDay', '2': 'Weekend', '3': 'Holiday'}
+season_map = {'1': 'Spring', '2': 'Summer', '3': 'Autumn', '4': 'Winter'}
+location_map = {'1': 'Home', '2': 'PublicPlace', '3': 'FriendsHouse'}
+weather_map = {'1': 'Sunny', '2': 'Rainy', '3': 'Stormy', '4': 'Snowy', '5': 'Cloudy'}
+social_map = {
+    '1': 'Alone', '2': 'Partner', '3': 'Friends', '4': 'Colleagues',
+    '5': 'Parents', '6': 'Public', '7': 'Family'
+}
+emotion_map = {
+    '1': 'Sad', '2': 'Happy', '3': 'Scared', '4': 'Surprised',
+    '5': 'Angry', '6': 'Disgusted', '7': 'Neutral'
+}
+mood_map = {'1': 'Positive', '2': 'Neutral', '3': 'Negative'}
+physical_map = {'1': 'Healthy', '2': 'Ill'}
+genre_map = {
+    '1': 'Action', '2': 'Adventure', '3': 'Animation', '4': 'Biography', '5': 'Comedy', '6': 'Crime',
+    '7': 'Documentary', '8': 'Drama', '9': 'Family', '10': 'Fantasy', '11': 'History', '12': 'Horror',
+    '13': 'Music', '14': 'Musical', '15': 'Mystery', '16': 'Romance', '17': 'Sci-Fi', '18': 'Sport',
+    '19': 'Thriller', '20': 'War', '21': 'Western'
+}
+age_map = {'1':'Teen', '2':'Adult', '3':'Senior', '4':'UnknownAge'}
+
+# Stage times and counters of this run (--report); the mappings are loaded on import.
+run_report = RunReport("ldos")
+
+def load_mapping_table(path, kind, resplit_long=True):
+    # {id: MappingEntry} with precomputed IRI and label literal, cached next to the file.
+    entries, malformed = load_mapping(path, resplit_long)
+    if malformed:
+        run_report.skip(f"malformed {kind} mapping line", malformed)
+    return entries
+
+with run_report.stage("load mappings"):
+    movie_map = load_mapping_table(movie_mapping_file, "movie", resplit_long=False)
+    actor_map = load_mapping_table(actor_mapping_file, "actor")
+    director_map = load_mapping_table(director_mapping_file, "director")
+
+def map_value(value, mapping):
+    return mapping.get(str(value).strip(), "Unknown")
+
+def get_age_group(age_value):
+    try:
+        age = int(age_value)
+        if age < 20:
+            return "Teen"
+        elif age < 65:
+            return "Adult"
+        else:
+            return "Senior"
+    except ValueError:
+        return "UnknownAge"
+
+def get_literal_or_unknown(value: str) -> str:
+    val = value.strip()
+    if not val or val.lower() == "unknown":
+        return '"Unknown"^^xsd:string'
+    return f':{val}'
+
+SCHEMA_TRIPLES = [
+    (":Actor", "a", "owl:Class"),
+    (":Actor", "rdfs:label", Literal("Actor")),
+    (":Director", "a", "owl:Class"),
+    (":Director", "rdfs:label", Literal("Director")),
+]
+
+
+def generate_movie_triples(row):
+    mid = row['itemID']
+    movie = movie_map.get(mid)
+    if movie is None:
+        run_report.count("unmapped movie ID")
+        title = escape_literal(f"UnknownMovie{mid}")
+    else:
+        title = movie.literal
+    movie_uri = f":Movie{mid}"
+
+    director = director_map.get(row.get("director"))
+    if director is None:
+        run_report.count("unmapped director ID")
+    director_uri = director.iri if director is not None else ":UnknownDirector"
+
+    triples = [
+        (movie_uri, "a", "schema:Movie"),
+        (movie_uri, "rdfs:label", Literal(title)),
+        (movie_uri, ":hasDirector", director_uri),
+        (movie_uri, ":hasCountry", Literal(row["movieCountry"], "xsd:string")),
+        (movie_uri, ":hasLanguage", Literal(row["movieLanguage"], "xsd:string")),
+        (movie_uri, ":hasYearOfProduction", Literal(row["movieYear"], "xsd:gYear")),
+    ]
+
+    for genre_col in ['genre1', 'genre2', 'genre3']:
+        gids = row.get(genre_col, "").split(",")
+        for gid in gids:
+            gid = gid.strip()
+            if gid:
+                triples.append((movie_uri, ":hasGenre", f":{map_value(gid, genre_map)}"))
+
+    for actor_col in ['actor1', 'actor2', 'actor3']:
+        aid = row.get(actor_col)
+        if aid:
+            actor = actor_map.get(aid.strip())
+            if actor is None:
+                run_report.count("unmapped actor ID")
+            triples.append((movie_uri, ":hasArtist", actor.iri if actor is not None else ":UnknownActor"))
+
+    triples.append((movie_uri, ":hasBudget", Literal(row["budget"], "xsd:float")))
+
+    if movie is not None and movie.uri:
+        triples.append((movie_uri, "owl:sameAs", f"<{movie.uri}>"))
+
+    return triples
+
+
+def generate_contextual_triples(row):
+    uid = row['userID']
+    mid = row['itemID']
+    key = f"{uid}_{mid}"
+    context_uri = f":Context{key}"
+    demographic_uri = f":DemographicContext{uid}"
+    location_context_uri = f":LocationContext{key}"
+    location_uri = f":Location{key}"
+    weather_uri = f":WeatherContext{key}"
+    social_uri = f":SocialContext{key}"
+    state_uri = f":UsersStateContext{key}"
+    emotional_uri = f":EmotionalContext{key}"
+    time_context_uri = f":TimeContext{key}"
+    time_uri = f":Time{key}"
+    city_uri = f":City{row['city']}"
+    country_uri = f":Country{row['country']}"
+
+    return [
+        (context_uri, "a", ":Context"),
+        (context_uri, ":hasDemographicContext", demographic_uri),
+        (context_uri, ":hasLocationContext", location_context_uri),
+        (context_uri, ":hasWeatherContext", weather_uri),
+        (context_uri, ":hasSocialContext", social_uri),
+        (context_uri, ":hasUsersStateContext", state_uri),
+        (context_uri, ":hasEmotionalContext", emotional_uri),
+        (context_uri, ":hasTimeContext", time_context_uri),
+
+        (location_context_uri, "a", ":LocationContext"),
+        (location_context_uri, ":hasLocation", location_uri),
+
+        (location_uri, "a", ":Location"),
+        (location_uri, ":hasCity", city_uri),
+        (location_uri, ":hasCountry", country_uri),
+        (location_uri, ":hasLocation", f":{map_value(row['location'], location_map)}"),
+
+        (weather_uri, "a", ":WeatherContext"),
+        (weather_uri, ":hasWeather", f":{map_value(row['weather'], weather_map)}"),
+
+        (social_uri, "a", ":SocialContext"),
+        (social_uri, ":hasCompanion", f":{map_value(row['social'], social_map)}"),
+
+        (state_uri, "a", ":UsersStateContext"),
+        (state_uri, ":hasPhysicalState", f":{map_value(row['physical'], physical_map)}"),
+        (state_uri, ":hasUsersMood", f":{map_value(row['mood'], mood_map)}"),
+
+        (emotional_uri, "a", ":EmotionalContext"),
+        (emotional_uri, ":dominantEmotion", f":{map_value(row['dominantEmo'], emotion_map)}"),
+        (emotional_uri, ":endEmotion", f":{map_value(row['endEmo'], emotion_map)}"),
+
+        (time_context_uri, "a", ":TimeContext"),
+        (time_context_uri, ":hasTime", time_uri),
+
+        (time_uri, "a", ":Time"),
+        (time_uri, ":hasSeason", f":{map_value(row['season'], season_map)}"),
+        (time_uri, ":hasTimeOfDay", f":{map_value(row['time'], time_map)}"),
+        (time_uri, ":hasDayOfWeek", f":{map_value(row['daytype'], daytype_map)}"),
+    ]
+
+
+def generate_demographic_triples(row):
+    demographic_uri = f":DemographicContext{row['userID']}"
+    return [
+        (demographic_uri, "a", ":DemographicContext"),
+        (demographic_uri, ":hasGender", f":{map_value(row['sex'], gender_map)}"),
+        (demographic_uri, ":hasAgeGroup", f":{get_age_group(row['age'])}"),
+    ]
+
+
+def generate_place_triples(row):
+    return [
+        (f":City{row['city']}", "a", ":City"),
+        (f":Country{row['country']}", "a", ":Country"),
+    ]
+
+
+# The columns a rating's context and rating triples are built from, spooled by CompactContexts.
+CONTEXT_COLUMNS = ['userID', 'itemID', 'rating', 'sex', 'age', 'city', 'country', 'location', 'weather', 'social',
+                   'physical', 'mood', 'dominantEmo', 'endEmo', 'season', 'time', 'daytype']
+
+
+class CompactContexts:
+    # Hash-consing for --compact-contexts: every distinct combination of context values gets
+    # one canonical node, written the first time it is seen, and ratings point at it.  The
+    # Context -> *Context -> value paths stay the same.  A user who rated the same movie twice
+    # gets one rating IRI, whose per-rating context node merges the values of both rows; with
+    # shared nodes it would point at two contexts, and a path like :hasContext/:hasSocialContext
+    # would match twice.  Those ratings (repeated) keep the per-rating nodes, so every query
+    # returns the same rows as without --compact-contexts.  A repeat is only known once its
+    # second row is read, so add() spools the context columns of every row to a temporary
+    # file during the one pass over the CSV, and rows() reads them back for the contexts and
+    # rating triples.
+    def __init__(self, dedup_store="exact"):
+        self.seen = new_key_set(dedup_store)
+        self.pairs = new_key_set(dedup_store)
+        self.repeated = new_key_set(dedup_store)
+        self._spool = tempfile.TemporaryFile("w+", encoding="utf-8", newline='')
+        self._writer = csv.writer(self._spool)
+
+    def add(self, row):
+        pair = (row['userID'], row['itemID'])
+        if pair in self.pairs:
+            self.repeated.add(pair)
+        else:
+            self.pairs.add(pair)
+        self._writer.writerow([row[column] for column in CONTEXT_COLUMNS])
+
+    def rows(self):
+        with self._spool:
+            self._spool.seek(0)
+            for values in csv.reader(self._spool):
+                yield dict(zip(CONTEXT_COLUMNS, values))
+
+    def node(self, uri, build, triples):
+        if uri not in self.seen:
+            self.seen.add(uri)
+            triples.extend(build(uri))
+        return uri
+
+    def context(self, row):
+        triples = []
+        if (row['userID'], row['itemID']) in self.repeated:
+            self.node(f":DemographicContext{row['userID']}", lambda uri: generate_demographic_triples(row), triples)
+            triples.extend(generate_contextual_triples(row))
+            return f":Context{row['userID']}_{row['itemID']}", triples
+        gender = map_value(row['sex'], gender_map)
+        age_group = get_age_group(row['age'])
+        place = f"{row['city']}_{row['country']}_{map_value(row['location'], location_map)}"
+        weather = map_value(row['weather'], weather_map)
+        companion = map_value(row['social'], social_map)
+        physical = map_value(row['physical'], physical_map)
+        mood = map_value(row['mood'], mood_map)
+        dominant = map_value(row['dominantEmo'], emotion_map)
+        end = map_value(row['endEmo'], emotion_map)
+        season = map_value(row['season'], season_map)
+        time_of_day = map_value(row['time'], time_map)
+        day_type = map_value(row['daytype'], daytype_map)
+        moment = f"{season}_{time_of_day}_{day_type}"
+
+        parts = [
+            (":hasDemographicContext", self.node(f":DemographicContext_{gender}_{age_group}", lambda uri: [
+                (uri, "a", ":DemographicContext"),
+                (uri, ":hasGender", f":{gender}"),
+                (uri, ":hasAgeGroup", f":{age_group}"),
+            ], triples)),
+            (":hasLocationContext", self.node(f":LocationContext_{place}", lambda uri: [
+                (uri, "a", ":LocationContext"),
+                (uri, ":hasLocation", self.node(f":Location_{place}", lambda location_uri: [
+                    (location_uri, "a", ":Location"),
+                    (location_uri, ":hasCity", f":City{row['city']}"),
+                    (location_uri, ":hasCountry", f":Country{row['country']}"),
+                    (location_uri, ":hasLocation", f":{map_value(row['location'], location_map)}"),
+                ], triples)),
+            ], triples)),
+            (":hasWeatherContext", self.node(f":WeatherContext_{weather}", lambda uri: [
+                (uri, "a", ":WeatherContext"),
+                (uri, ":hasWeather", f":{weather}"),
+            ], triples)),
+            (":hasSocialContext", self.node(f":SocialContext_{companion}", lambda uri: [
+                (uri, "a", ":SocialContext"),
+                (uri, ":hasCompanion", f":{companion}"),
+            ], triples)),
+            (":hasUsersStateContext", self.node(f":UsersStateContext_{physical}_{mood}", lambda uri: [
+                (uri, "a", ":UsersStateContext"),
+                (uri, ":hasPhysicalState", f":{physical}"),
+                (uri, ":hasUsersMood", f":{mood}"),
+            ], triples)),
+            (":hasEmotionalContext", self.node(f":EmotionalContext_{dominant}_{end}", lambda uri: [
+                (uri, "a", ":EmotionalContext"),
+                (uri, ":dominantEmotion", f":{dominant}"),
+                (uri, ":endEmotion", f":{end}"),
+            ], triples)),
+            (":hasTimeContext", self.node(f":TimeContext_{moment}", lambda uri: [
+                (uri, "a", ":TimeContext"),
+                (uri, ":hasTime", self.node(f":Time_{moment}", lambda time_uri: [
+                    (time_uri, "a", ":Time"),
+                    (time_uri, ":hasSeason", f":{season}"),
+                    (time_uri, ":hasTimeOfDay", f":{time_of_day}"),
+                    (time_uri, ":hasDayOfWeek", f":{day_type}"),
+                ], triples)),
+            ], triples)),
+        ]
+
+        digest = hashlib.blake2b("|".join(uri for _, uri in parts).encode("utf-8"), digest_size=8).hexdigest()
+        context_uri = self.node(f":Context_{digest}", lambda uri: [(uri, "a", ":Context")] + [
+            (uri, predicate, obj) for predicate, obj in parts
+        ], triples)
+        return context_uri, triples
+
+
+# Context values rolled up with --rollups: the ones the stored movie queries group by.
+ROLLUP_DIMENSIONS = [
+    (":hasCompanion",),
+    (":hasAgeGroup", ":hasUsersMood"),
+    (":hasLocation", ":hasDayOfWeek"),
+]
+
+def rating_context(row):
+    # The context values of one rating with the predicates the graph uses for them.
+    return [
+        (":hasGender", f":{map_value(row['sex'], gender_map)}"),
+        (":hasAgeGroup", f":{get_age_group(row['age'])}"),
+        (":hasLocation", f":{map_value(row['location'], location_map)}"),
+        (":hasWeather", f":{map_value(row['weather'], weather_map)}"),
+        (":hasCompanion", f":{map_value(row['social'], social_map)}"),
+        (":hasPhysicalState", f":{map_value(row['physical'], physical_map)}"),
+        (":hasUsersMood", f":{map_value(row['mood'], mood_map)}"),
+        (":dominantEmotion", f":{map_value(row['dominantEmo'], emotion_map)}"),
+        (":endEmotion", f":{map_value(row['endEmo'], emotion_map)}"),
+        (":hasSeason", f":{map_value(row['season'], season_map)}"),
+        (":hasTimeOfDay", f":{map_value(row['time'], time_map)}"),
+        (":hasDayOfWeek", f":{map_value(row['daytype'], daytype_map)}"),
+    ]
+
+
+# Code tables of the --tensor context columns: the CSV's own codes, 0 for Unknown.
+TENSOR_CONTEXT_MAPS = {
+    ":hasGender": gender_map,
+    ":hasAgeGroup": age_map,
+    ":hasLocation": location_map,
+    ":hasWeather": weather_map,
+    ":hasCompanion": social_map,
+    ":hasPhysicalState": physical_map,
+    ":hasUsersMood": mood_map,
+    ":dominantEmotion": emotion_map,
+    ":endEmotion": emotion_map,
+    ":hasSeason": season_map,
+    ":hasTimeOfDay": time_map,
+    ":hasDayOfWeek": daytype_map,
+}
+
+def tensor_columns():
+    return {predicate: [":Unknown"] + [f":{label}" for label in mapping.values()]
+            for predicate, mapping in TENSOR_CONTEXT_MAPS.items()}
+
+def tensor_item_labels(items):
+    # Movie titles as rdfs:label gives them, before escaping.
+    labels = {}
+    for item in items:
+        mid = item[len(":Movie"):]
+        movie = movie_map.get(mid)
+        labels[item] = movie.label if movie is not None else f"UnknownMovie{mid}"
+    return labels
+
+
+def write_instances(mapping, class_name):
+    triples = []
+    for v in mapping.values():
+        triples.append((f":{v}", "a", f":{class_name}"))
+        triples.append((f":{v}", "rdfs:label", Literal(v, "xsd:string")))
+    return triples
+
+def generate_static_instances(dedup_store="exact"):
+    triples = []
+
+    added_actors = new_key_set(dedup_store)
+    added_directors = new_key_set(dedup_store)
+
+    for actor in actor_map.values():
+        if actor.iri not in added_actors:
+            triples.append((actor.iri, "a", ":Actor"))
+            triples.append((actor.iri, "rdfs:label", Literal(actor.literal)))
+            added_actors.add(actor.iri)
+
+    for director in director_map.values():
+        if director.iri not in added_directors and director.iri not in added_actors:
+            triples.append((director.iri, "a", ":Director"))
+            triples.append((director.iri, "rdfs:label", Literal(director.literal)))
+            added_directors.add(director.iri)
+
+    return triples
+
+def generate_user_triples(row):
+    uid = row['userID']
+    user_uri = f":User{uid}"
+    return [
+        (user_uri, "a", "foaf:Person"),
+        (user_uri, ":userID", Literal(uid, "xsd:string")),
+    ]
+
+def generate_triples_from_row(row, context_uri=None):
+    uid = row['userID']
+    mid = row['itemID']
+    rating_val = float(row['rating'])
+    rating_uri = f":Rating{uid}_{mid}"
+
+    return [
+        (rating_uri, "a", "schema:Rating"),
+        (rating_uri, "schema:ratingValue", Literal(str(rating_val), "xsd:float")),
+        (rating_uri, ":hasContext", context_uri or f":Context{uid}_{mid}"),
+        (rating_uri, "schema:item", f":Movie{mid}"),
+
+        (f":User{uid}", ":rated", rating_uri),
+    ]
+
+# Columns an entity's description depends on.  An entity is written again only when
+# one of them changes, so the graph is the same as without deduplication.
+MOVIE_COLUMNS = ['itemID', 'director', 'movieCountry', 'movieLanguage', 'movieYear',
+                 'genre1', 'genre2', 'genre3', 'actor1', 'actor2', 'actor3', 'budget']
+DEMOGRAPHIC_COLUMNS = ['userID', 'sex', 'age']
+PLACE_COLUMNS = ['city', 'country']
+
+def entity_emitters(dedupe, compact_contexts=False, dedup_store="exact"):
+    entities = [
+        (MOVIE_COLUMNS, generate_movie_triples),
+        (['userID'], generate_user_triples),
+        (PLACE_COLUMNS, generate_place_triples),
+    ]
+    if not compact_contexts:
+        entities.append((DEMOGRAPHIC_COLUMNS, generate_demographic_triples))
+    return [(columns, generator, new_key_set(dedup_store) if dedupe else None) for columns, generator in entities]
+
+def process_csv_to_ttl(csv_file_path, ttl_output_path, formats=("turtle",), dedupe=True, compact_contexts=False,
+                       incremental=False, rollups=False, tensor=False, compression=Compression(),
+                       shard_bytes=None, dedup_store="exact"):
+    rating_rollups = RatingRollups(ROLLUP_DIMENSIONS) if rollups else None
+    rating_tensor = RatingTensor(tensor_columns()) if tensor else None
+    rows = 0
+    with open_input(csv_file_path, newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        with run_report.stage("ratings"), TripleEmitter(ttl_output_path, formats=formats,
+                                                       track_entities=incremental, compression=compression,
+                                                       shard_bytes=shard_bytes) as out:
+            out.extend(SCHEMA_TRIPLES)
+            out.extend(generate_static_instances(dedup_store))
+            out.extend(write_instances(gender_map, "Gender"))
+            out.extend(write_instances(time_map, "TimeOfDay"))
+            out.extend(write_instances(daytype_map, "DayType"))
+            out.extend(write_instances(season_map, "Season"))
+            out.extend(write_instances(location_map, "LocationType"))
+            out.extend(write_instances(weather_map, "Weather"))
+            out.extend(write_instances(social_map, "Companion"))
+            out.extend(write_instances(emotion_map, "Emotion"))
+            out.extend(write_instances(mood_map, "UsersMood"))
+            out.extend(write_instances(physical_map, "PhysicalState"))
+            out.extend(write_instances(genre_map, "Genre"))
+            out.extend(write_instances(age_map, "AgeGroup"))
+
+            entities = entity_emitters(dedupe, compact_contexts, dedup_store)
+            contexts = CompactContexts(dedup_store) if compact_contexts else None
+            for row in reader:
+                for columns, generator, seen in entities:
+                    if seen is not None:
+                        key = tuple([row[c] for c in columns])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    out.extend(generator(row))
+                if contexts is not None:
+                    contexts.add(row)
+                else:
+                    out.extend(generate_contextual_triples(row))
+                    out.extend(generate_triples_from_row(row))
+                if rating_rollups is not None or rating_tensor is not None:
+                    context = rating_context(row)
+                    if rating_rollups is not None:
+                        rating_rollups.add(f":Movie{row['itemID']}", "schema:Movie", float(row['rating']), context)
+                    if rating_tensor is not None:
+                        rating_tensor.add(f":User{row['userID']}", f":Movie{row['itemID']}", float(row['rating']),
+                                          context)
+                rows += 1
+                run_report.progress(rows)
+            if contexts is not None:
+                for row in contexts.rows():
+                    context_uri, context_triples = contexts.context(row)
+                    out.extend(context_triples)
+                    out.extend(generate_triples_from_row(row, context_uri))
+    run_report.record_emitter(out, "ratings")
+    run_report.count("rows", rows)
+    run_report.count("triples", out.triple_count)
+
+    if incremental:
+        with run_report.stage("incremental"):
+            report(ttl_output_path, write_deltas(ttl_output_path, out.entity_hashes))
+    if rating_rollups is not None:
+        with run_report.stage("rollups"):
+            rating_rollups.write(ttl_output_path)
+        report_rollups(ttl_output_path, rating_rollups)
+    if rating_tensor is not None:
+        with run_report.stage("tensor"):
+            rating_tensor.item_labels = tensor_item_labels(rating_tensor.item_ids)
+            rating_tensor.write(ttl_output_path)
+        report_tensor(ttl_output_path, rating_tensor)
+    return out.triple_count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert the LDOS-CoMoDa ratings to Turtle.")
+    parser.add_argument("--input", default=csv_file_path)
+    parser.add_argument("--output", default=ttl_output_path)
+    parser.add_argument("--formats", type=parse_formats, default=output_formats,
+                        help="comma-separated output formats: turtle, xml, nt, nq, binary (written next to --output)")
+    parser.add_argument("--no-dedupe", dest="dedupe", action="store_false",
+                        help="repeat the movie, user and demographic blocks for every rating (old behaviour)")
+    parser.add_argument("--compact-contexts", action="store_true",
+                        help="share one context node per distinct combination of context values")
+    parser.add_argument("--incremental", action="store_true",
+                        help="also write insert/delete delta files against the manifest of the previous run")
+    parser.add_argument("--rollups", action="store_true",
+                        help="also write rating count/sum rollups per movie for companion, age group x mood and "
+                             "location x day type (.rollups.csv/.ttl)")
+    parser.add_argument("--tensor", action="store_true",
+                        help="also write the user x movie ratings with coded context columns as .npy arrays (.tensor/)")
+    parser.add_argument("--shard-bytes", type=parse_size,
+                        help="split the graph into self-contained shards of about this size (e.g. 64M) "
+                             "with a .shards.json manifest")
+    add_dedup_arguments(parser)
+    add_compression_arguments(parser)
+    add_report_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_report.enable(args.progress, args.profile, args.tracemalloc)
+    compression = compression_from_args(args)
+    triples = process_csv_to_ttl(args.input, args.output, args.formats, args.dedupe, args.compact_contexts,
+                                 args.incremental, args.rollups, args.tensor, compression,
+                                 args.shard_bytes, args.dedup_store)
+    run_report.finish(args.report)
+    paths = written_paths(args.output, args.formats, compression, args.shard_bytes)
+    print(f"TTL generated in {', '.join(repr(path) for path in paths)} ({triples} triples)")
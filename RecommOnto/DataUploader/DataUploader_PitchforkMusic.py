@@ -1,156 +1,413 @@
-import sqlite3
-import pandas as pd
-import re
-from rdflib import Graph
-
-# Połączenie z bazą danych
-conn = sqlite3.connect('database.sqlite')
-cursor = conn.cursor()
-
-# Naprawa problematycznej etykiety
-cursor.execute("UPDATE labels SET label = NULL WHERE label = '\"fantasy live 1999\"'")
-conn.commit()
-
-# Wczytywanie tabel
-reviews_df = pd.read_sql('SELECT * FROM reviews', conn)
-artists_df = pd.read_sql('SELECT * FROM artists', conn)
-genres_df = pd.read_sql('SELECT * FROM genres', conn)
-labels_df = pd.read_sql('SELECT * FROM labels', conn)
-years_df = pd.read_sql('SELECT * FROM years', conn)
-content_df = pd.read_sql('SELECT * FROM content', conn)
-conn.close()
-
-# Scalanie danych
-merged_df = reviews_df.merge(artists_df, on='reviewid')
-merged_df = merged_df.merge(genres_df, on='reviewid')
-merged_df = merged_df.merge(labels_df, on='reviewid')
-merged_df = merged_df.merge(years_df, on='reviewid')
-merged_df = merged_df.merge(content_df, on='reviewid')
-
-# Funkcje pomocnicze
-def sanitize_identifier(name):
-    if pd.isna(name):
-        return "Unknown"
-    name = name.strip().replace('"', '').replace("'", '')
-    name = re.sub(r'[^\w]', '_', name)
-    if name and name[0].isdigit():
-        name = '_' + name
-    return name
-
-def escape_literal(value):
-    if not isinstance(value, str):
-        return value
-    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ').replace('\r', '').strip()
-
-def has_illegal_chars(text):
-    return any(c in str(text) for c in ['"', '^', '\\', '\n', '\r'])
-
-# Tworzenie trójek RDF
-def generate_artist_triple(artist):
-    if pd.isna(artist): return ""
-    artist_uri = f":{sanitize_identifier(artist)}"
-    return f'{artist_uri} a :Artist ;\n    rdfs:label "{escape_literal(artist)}" .'
-
-def generate_genre_triple(genre):
-    if pd.isna(genre): return ""
-    genre_uri = f":{sanitize_identifier(genre)}"
-    return f'{genre_uri} a :Genre ;\n    rdfs:label "{escape_literal(genre)}" .'
-
-def generate_review_triple(row):
-    review_uri = f":Rating_{row.get('reviewid', 'UnknownID')}"
-    album_uri = f":Album_{row.get('reviewid', 'UnknownID')}"
-    score = row.get('score', '0.0')
-    return f"""{review_uri} a schema:Rating ;
-    :aboutAlbum {album_uri} ;
-    :Value "{score}"^^xsd:float ."""
-
-def generate_user_triple(username):
-    if pd.isna(username): return ""
-    cleaned = escape_literal(username)
-    user_uri = f":{sanitize_identifier(cleaned)}"
-    return f"""{user_uri} a foaf:Person ;
-    rdfs:label "{cleaned}" ."""
-
-def generate_user_review_relation(row):
-    username = row.get('author')
-    review_uri = f":Rating_{row.get('reviewid', 'UnknownID')}"
-    if pd.isna(username): return ""
-    user_uri = f":{sanitize_identifier(username)}"
-    return f"{user_uri} schema:rating {review_uri} ."
-
-def generate_album_triples(row):
-    album_uri = f":Album_{row.get('reviewid', 'UnknownID')}"
-    artist = row.get('artist_x', 'UnknownArtist')
-    genre = row.get('genre', 'UnknownGenre')
-    label = row.get('label', 'UnknownLabel')
-    year_value = row.get('year', None)
-    title = row.get('title', 'Untitled Album')
-
-    artist_uri = f":{sanitize_identifier(artist) if artist is not None else 'UnknownArtist'}"
-    genre_uri = f":{sanitize_identifier(genre) if genre is not None else 'UnknownGenre'}"
-
-    if pd.notna(year_value):
-        try:
-            year = str(int(float(year_value)))
-        except ValueError:
-            year = "UnknownYear"
-    else:
-        year = "UnknownYear"
-
-    escaped_title = escape_literal(title)
-    triples = [
-        f"{album_uri} a schema:MusicAlbum ;",
-        f'    rdfs:label "{escaped_title}" ;',
-        f'    :hasArtist {artist_uri} ;',
-        f'    :hasGenre {genre_uri} ;',
-        f'    :hasYearOfProduction "{year}" .'
-    ]
-    return "\n".join(triples)
-
-
-with open('pitchfork_album_reviews.ttl', 'w', encoding='utf-8') as f:
-    f.write("""@prefix : <http://www.semanticweb.org/emili/ontologies/2025/3/recommendations/> .
-@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
-@prefix owl: <http://www.w3.org/2002/07/owl#> .
-@prefix schema: <http://schema.org/> .
-@prefix foaf: <http://xmlns.com/foaf/0.1/> .
-@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
-
-:Genre a rdfs:Class .
-:Artist a rdfs:Class .
-
-""")
-    for index, row in merged_df.iterrows():
-        author = row.get('author') or ""
-        title = row.get('title') or ""
-
-        if has_illegal_chars(author) or has_illegal_chars(title) or "fantasy live 1999" in title.lower():
-            continue
-
-        genre_triple = generate_genre_triple(row.get('genre'))
-        if genre_triple:
-            f.write(genre_triple + '\n\n')
-
-        artist_triple = generate_artist_triple(row.get('artist_x'))
-        if artist_triple:
-            f.write(artist_triple + '\n\n')
-
-        review_triple = generate_review_triple(row)
-        f.write(generate_album_triples(row) + '\n\n')
-        f.write(review_triple + '\n\n')
-
-        user_triple = generate_user_triple(row.get('author'))
-        if user_triple:
-            f.write(user_triple + '\n\n')
-
-        user_review_relation = generate_user_review_relation(row)
-        if user_review_relation:
-            f.write(user_review_relation + '\n\n')
-
-rdf_graph = Graph()
-try:
-    rdf_graph.parse('pitchfork_album_reviews.ttl', format='turtle')
-    rdf_graph.serialize(destination='pitchfork_album_reviews.rdf', format='xml')
-    print("RDF zapisany pomyślnie.")
-except Exception as e:
-    print("Błąd RDF:", e)
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+from bisect import bisect_right
+from contextlib import contextmanager
+from operator import itemgetter
+
+import pandas as pd
+
+from compressed_io import Compression, add_compression_arguments, compression_from_args, compression_of, open_input
+from incremental import report, write_deltas
+from instrumentation import RunReport, add_report_arguments
+from rating_tensor import RatingTensor, report_tensor
+from rdf_emitter import (LITERAL_REPLACEMENTS, NON_WORD, TripleEmitter, literal_column, parse_formats,
+                         parse_size, written_paths)
+from rollups import RatingRollups, report_rollups
+
+DATABASE_FILE = 'database.sqlite'
+OUTPUT_FILE = 'pitchfork_album_reviews.ttl'
+# Turtle oraz RDF/XML (pitchfork_album_reviews.rdf) w jednym przebiegu
+OUTPUT_FORMATS = 'turtle,xml'
+
+# Tabele, w których recenzja musi mieć wiersz (tak jak przy łączeniu inner join)
+LINKED_TABLES = ['artists', 'genres', 'labels', 'years', 'content']
+REVIEW_COLUMNS = ['reviewid', 'title', 'artist', 'score', 'author']
+CHUNK_SIZE = 5000
+
+@contextmanager
+def connect(path):
+    # Baza jest otwierana tylko do odczytu; skrypt niczego w niej nie zmienia.
+    # SQLite potrzebuje zwykłego pliku, więc skompresowana baza (.gz, .zip, ...) jest
+    # najpierw strumieniowo rozpakowywana do pliku tymczasowego.
+    temporary = None
+    if compression_of(path):
+        with open_input(path, "rb") as source, tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False) as target:
+            shutil.copyfileobj(source, target, 1 << 20)
+        temporary = path = target.name
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+        if temporary:
+            os.remove(temporary)
+
+# Wczytywanie tabel
+def load_merged(conn):
+    reviews_df = pd.read_sql('SELECT * FROM reviews', conn)
+    artists_df = pd.read_sql('SELECT * FROM artists', conn)
+    genres_df = pd.read_sql('SELECT * FROM genres', conn)
+    labels_df = pd.read_sql('SELECT * FROM labels', conn)
+    years_df = pd.read_sql('SELECT * FROM years', conn)
+    content_df = pd.read_sql('SELECT * FROM content', conn)
+
+    # Scalanie danych
+    merged_df = reviews_df.merge(artists_df, on='reviewid')
+    merged_df = merged_df.merge(genres_df, on='reviewid')
+    merged_df = merged_df.merge(labels_df, on='reviewid')
+    merged_df = merged_df.merge(years_df, on='reviewid')
+    merged_df = merged_df.merge(content_df, on='reviewid')
+
+    reviews = merged_df[['reviewid', 'title', 'artist_x', 'score', 'author']].rename(columns={'artist_x': 'artist'})
+    return (reviews.drop_duplicates(),
+            merged_df[['reviewid', 'artist_y']].rename(columns={'artist_y': 'artist'}).drop_duplicates(),
+            merged_df[['reviewid', 'genre']].drop_duplicates(),
+            merged_df[['reviewid', 'year']].drop_duplicates(),
+            merged_df[['reviewid', 'label']].drop_duplicates())
+
+def load_normalized(conn, run_report=None):
+    # Each table is read on its own, so a review with several artists, genres or labels
+    # stays one row instead of becoming a cartesian product of rows.
+    reviews = pd.read_sql('SELECT reviewid, title, artist, score, author FROM reviews', conn).drop_duplicates()
+    artists = pd.read_sql('SELECT DISTINCT reviewid, artist FROM artists', conn)
+    genres = pd.read_sql('SELECT DISTINCT reviewid, genre FROM genres', conn)
+    years = pd.read_sql('SELECT DISTINCT reviewid, year FROM years', conn)
+    labels = pd.read_sql('SELECT DISTINCT reviewid, label FROM labels', conn)
+
+    linked = reviews['reviewid'].notna()
+    for table in LINKED_TABLES:
+        ids = pd.read_sql(f'SELECT DISTINCT reviewid FROM {table}', conn)['reviewid']
+        linked &= reviews['reviewid'].isin(ids)
+    if run_report is not None:
+        run_report.skip("review missing from one of the linked tables", int((~linked).sum()))
+    return reviews[linked], artists, genres, years, labels
+
+# Strumieniowe czytanie bazy (--stream): warunki łączenia i wybór kolumn wykonuje SQLite,
+# a recenzje przychodzą porcjami posortowanymi po reviewid (tabela content nie jest czytana)
+LINKED_FILTER = " AND ".join(f"reviewid IN (SELECT reviewid FROM {table})" for table in LINKED_TABLES)
+STREAM_QUERIES = {
+    "reviews": f"SELECT DISTINCT {', '.join(REVIEW_COLUMNS)} FROM reviews WHERE {LINKED_FILTER} ORDER BY reviewid",
+    "artists": "SELECT DISTINCT reviewid, artist FROM artists WHERE reviewid IS NOT NULL ORDER BY reviewid",
+    "genres": "SELECT DISTINCT reviewid, genre FROM genres WHERE reviewid IS NOT NULL ORDER BY reviewid",
+    "years": "SELECT DISTINCT reviewid, year FROM years WHERE reviewid IS NOT NULL ORDER BY reviewid",
+    "labels": "SELECT DISTINCT reviewid, label FROM labels WHERE reviewid IS NOT NULL ORDER BY reviewid",
+}
+
+class SortedRows:
+    # Kursor posortowany po reviewid, czytany porcjami aż do podanego reviewid
+    def __init__(self, conn, query, chunk_size):
+        self.cursor = conn.execute(query)
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.position = 0
+
+    def until(self, last):
+        result = []
+        while True:
+            if self.position == len(self.rows):
+                self.rows = self.cursor.fetchmany(self.chunk_size)
+                self.position = 0
+                if not self.rows:
+                    return result
+            end = bisect_right(self.rows, last, self.position, key=itemgetter(0))
+            result.extend(self.rows[self.position:end])
+            self.position = end
+            if end < len(self.rows):
+                return result
+
+def stream_chunks(conn, chunk_size=CHUNK_SIZE, run_report=None):
+    # Zwraca (reviews, artists, genres, years, labels) dla kolejnych, rozłącznych zakresów reviewid;
+    # wiersze jednej recenzji nigdy nie są dzielone między dwie porcje.
+    run_report = run_report or RunReport()
+    reviews = conn.execute(STREAM_QUERIES["reviews"])
+    artists = SortedRows(conn, STREAM_QUERIES["artists"], chunk_size)
+    genres = SortedRows(conn, STREAM_QUERIES["genres"], chunk_size)
+    years = SortedRows(conn, STREAM_QUERIES["years"], chunk_size)
+    labels = SortedRows(conn, STREAM_QUERIES["labels"], chunk_size)
+    pending = []
+    streamed = 0
+    while True:
+        with run_report.stage("read database"):
+            rows = reviews.fetchmany(chunk_size)
+            if rows:
+                rows = pending + rows
+                split = len(rows)
+                while split and rows[split - 1][0] == rows[-1][0]:
+                    split -= 1
+                if split == 0:
+                    pending = rows
+                    continue
+                rows, pending = rows[:split], rows[split:]
+            elif pending:
+                rows, pending = pending, []
+            else:
+                break
+            last = rows[-1][0]
+            chunk = (pd.DataFrame.from_records(rows, columns=REVIEW_COLUMNS).astype({'score': float}),
+                     pd.DataFrame.from_records(artists.until(last), columns=['reviewid', 'artist']),
+                     pd.DataFrame.from_records(genres.until(last), columns=['reviewid', 'genre']),
+                     pd.DataFrame.from_records(years.until(last), columns=['reviewid', 'year']),
+                     pd.DataFrame.from_records(labels.until(last), columns=['reviewid', 'label']))
+        streamed += len(rows)
+        run_report.progress(streamed, "reviews")
+        yield chunk
+    total = conn.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {', '.join(REVIEW_COLUMNS)} FROM reviews)").fetchone()[0]
+    run_report.skip("review missing from one of the linked tables", total - streamed)
+
+# Funkcje pomocnicze (operują na całych kolumnach)
+ILLEGAL_CHARS = r'["^\\\n\r]'
+
+def sanitize_column(values, missing="Unknown"):
+    cleaned = values.astype(object).where(values.notna(), None)
+    result = (cleaned.fillna("").astype(str)
+              .str.replace('"', '', regex=False).str.replace("'", '', regex=False)
+              .str.strip().str.replace(NON_WORD, '_', regex=True))
+    result = result.where(result != "", "unknown")
+    return result.where(cleaned.notna(), missing)
+
+def escape_column(values):
+    result = values.fillna("").astype(str)
+    for old, new in LITERAL_REPLACEMENTS:
+        result = result.str.replace(old, new, regex=False)
+    return result.str.strip()
+
+def year_column(values):
+    years = pd.to_numeric(values, errors='coerce')
+    result = pd.Series("UnknownYear", index=values.index, dtype=object)
+    known = years.notna()
+    result[known] = years[known].astype('int64').astype(str)
+    return result
+
+# Wytwórnia, którą pierwotny skrypt zerował w bazie (UPDATE labels SET label = NULL ...)
+NULLED_LABELS = ['"fantasy live 1999"']
+
+def filter_reviews(df, run_report=None):
+    author = df['author'].fillna("").astype(str)
+    title = df['title'].fillna("").astype(str)
+    illegal = author.str.contains(ILLEGAL_CHARS, regex=True) | title.str.contains(ILLEGAL_CHARS, regex=True)
+    fantasy = title.str.lower().str.contains("fantasy live 1999", regex=False)
+    if run_report is not None:
+        run_report.skip("illegal characters in title or author", int(illegal.sum()))
+        run_report.skip("\"fantasy live 1999\" title", int((fantasy & ~illegal).sum()))
+    return df[~(illegal | fantasy)]
+
+# Tworzenie trójek RDF
+def emit_named_entities(out, names, class_uri, seen=None, prefix=":"):
+    names = names.dropna().drop_duplicates()
+    if seen is not None:
+        names = names[~names.isin(seen)]
+        seen.update(names)
+    out.extend_columns(prefix + sanitize_column(names), [
+        ("a", class_uri),
+        ("rdfs:label", literal_column(escape_column(names))),
+    ])
+
+def emit_albums(out, reviews, artists, genres, years, labels):
+    album_uri = ":Album_" + reviews['reviewid'].astype(str)
+    artist_uri = ":" + sanitize_column(reviews['artist'], missing="UnknownArtist")
+    out.extend_columns(album_uri, [
+        ("a", "schema:MusicAlbum"),
+        ("rdfs:label", literal_column(escape_column(reviews['title']))),
+        (":hasArtist", artist_uri),
+    ])
+    # Pozostali wykonawcy albumu z tabeli artists (wykonawca z recenzji jest już zapisany wyżej)
+    artists = artists.dropna(subset=['artist'])
+    album_artists = pd.DataFrame({
+        "uri": ":Album_" + artists['reviewid'].astype(str),
+        "artist": ":" + sanitize_column(artists['artist']),
+    }).drop_duplicates()
+    album_artists = album_artists.merge(pd.DataFrame({"uri": album_uri, "artist": artist_uri}),
+                                        how="left", indicator=True)
+    album_artists = album_artists[album_artists["_merge"] == "left_only"]
+    out.extend_columns(album_artists["uri"], [(":hasArtist", album_artists["artist"])])
+    album_genres = pd.DataFrame({
+        "uri": ":Album_" + genres['reviewid'].astype(str),
+        "genre": ":" + sanitize_column(genres['genre'], missing="UnknownGenre"),
+    }).drop_duplicates()
+    out.extend_columns(album_genres["uri"], [(":hasGenre", album_genres["genre"])])
+
+    album_years = pd.DataFrame({
+        "uri": ":Album_" + years['reviewid'].astype(str),
+        "year": year_column(years['year']),
+    }).drop_duplicates()
+    out.extend_columns(album_years["uri"], [(":hasYearOfProduction", literal_column(album_years["year"]))])
+
+    # Wytwórnie mają własny prefiks, bo ich nazwy często pokrywają się z nazwami wykonawców
+    labels = labels.dropna(subset=['label'])
+    album_labels = pd.DataFrame({
+        "uri": ":Album_" + labels['reviewid'].astype(str),
+        "label": ":Label_" + sanitize_column(labels['label']),
+    }).drop_duplicates()
+    out.extend_columns(album_labels["uri"], [(":hasLabel", album_labels["label"])])
+
+def emit_reviews(out, reviews):
+    review_uri = ":Rating_" + reviews['reviewid'].astype(str)
+    out.extend_columns(review_uri, [
+        ("a", "schema:Rating"),
+        (":aboutAlbum", ":Album_" + reviews['reviewid'].astype(str)),
+        (":Value", literal_column(reviews['score'].astype(str), "xsd:float")),
+    ])
+
+    rated = reviews['author'].notna()
+    authors = reviews['author'][rated]
+    out.extend_columns(":" + sanitize_column(authors), [("schema:rating", review_uri[rated])])
+
+def emit_users(out, reviews, seen=None):
+    authors = reviews['author'].dropna().drop_duplicates()
+    if seen is not None:
+        authors = authors[~authors.isin(seen)]
+        seen.update(authors)
+    out.extend_columns(":" + sanitize_column(escape_column(authors)), [
+        ("a", "foaf:Person"),
+        ("rdfs:label", literal_column(escape_column(authors))),
+    ])
+
+def rollup_reviews(reviews, genres):
+    # Liczba i suma ocen na album oraz dla wszystkich albumów, łącznie i według gatunku (--rollups)
+    scores = pd.DataFrame({
+        "reviewid": reviews['reviewid'],
+        "subject": ":Album_" + reviews['reviewid'].astype(str),
+        "score": pd.to_numeric(reviews['score'], errors='coerce'),
+    }).dropna(subset=["score"])
+    album_genres = pd.DataFrame({
+        "reviewid": genres['reviewid'],
+        "genre": ":" + sanitize_column(genres['genre'], missing="UnknownGenre"),
+    }).drop_duplicates()
+    by_genre = scores.merge(album_genres, on="reviewid")
+
+    rollups = RatingRollups()
+    for frame in (scores, scores.assign(subject="schema:MusicAlbum")):
+        totals = frame.groupby("subject", sort=False)["score"].agg(["count", "sum"])
+        for subject, count, total in totals.itertuples():
+            rollups.add_cell(subject, (), int(count), float(total))
+    for frame in (by_genre, by_genre.assign(subject="schema:MusicAlbum")):
+        totals = frame.groupby(["subject", "genre"], sort=False)["score"].agg(["count", "sum"])
+        for (subject, genre), count, total in totals.itertuples():
+            rollups.add_cell(subject, ((":hasGenre", genre),), int(count), float(total))
+    return rollups
+
+def tensor_reviews(reviews):
+    # Oceny autor × album dla --tensor (recenzje bez autora lub oceny są pomijane)
+    scores = pd.to_numeric(reviews['score'], errors='coerce')
+    rated = reviews['author'].notna() & scores.notna()
+    tensor = RatingTensor()
+    tensor.extend(":" + sanitize_column(reviews['author'][rated]),
+                  ":Album_" + reviews['reviewid'][rated].astype(str),
+                  scores[rated].astype(float))
+    return tensor
+
+
+SCHEMA_TRIPLES = [
+    (":Genre", "a", "rdfs:Class"),
+    (":Artist", "a", "rdfs:Class"),
+    (":RecordLabel", "a", "rdfs:Class"),
+    (":hasLabel", "rdfs:range", ":RecordLabel"),
+]
+
+def write_ttl(output_file, chunks, formats=("turtle",), incremental=False, rollups=False, tensor=False,
+              run_report=None, compression=Compression(), shard_bytes=None):
+    # chunks yields (reviews, artists, genres, years, labels) frames for disjoint sets of reviews: one
+    # frame with everything, or the stream_chunks portions.  Genres, artists, labels and users already
+    # written by an earlier chunk are not repeated.
+    run_report = run_report or RunReport()
+    seen = {"genres": set(), "artists": set(), "labels": set(), "users": set()}
+    rating_rollups = RatingRollups()
+    rating_tensor = RatingTensor()
+    rows = 0
+    with TripleEmitter(output_file, formats=formats, track_entities=incremental, compression=compression,
+                       shard_bytes=shard_bytes) as out:
+        with run_report.stage("emit"):
+            out.extend(SCHEMA_TRIPLES)
+        for reviews, artists, genres, years, labels in chunks:
+            with run_report.stage("filter"):
+                reviews = filter_reviews(reviews, run_report)
+                kept = reviews['reviewid'].unique()
+                artists = artists[artists['reviewid'].isin(kept)]
+                genres = genres[genres['reviewid'].isin(kept)]
+                years = years[years['reviewid'].isin(kept)]
+                labels = labels[labels['reviewid'].isin(kept) & ~labels['label'].isin(NULLED_LABELS)]
+
+            with run_report.stage("emit"):
+                emit_named_entities(out, genres['genre'], ":Genre", seen["genres"])
+                emit_named_entities(out, reviews['artist'], ":Artist", seen["artists"])
+                emit_named_entities(out, artists['artist'], ":Artist", seen["artists"])
+                emit_named_entities(out, labels['label'], ":RecordLabel", seen["labels"], prefix=":Label_")
+                emit_albums(out, reviews, artists, genres, years, labels)
+                emit_reviews(out, reviews)
+                emit_users(out, reviews, seen["users"])
+            rows += len(reviews)
+
+            if rollups:
+                with run_report.stage("rollups"):
+                    rating_rollups.merge(rollup_reviews(reviews, genres).cells)
+            if tensor:
+                with run_report.stage("tensor"):
+                    rating_tensor.merge(tensor_reviews(reviews))
+        with run_report.stage("emit"):
+            out.close()
+    run_report.record_emitter(out, "emit")
+    run_report.count("rows", rows)
+    run_report.count("triples", out.triple_count)
+
+    if incremental:
+        with run_report.stage("incremental"):
+            report(output_file, write_deltas(output_file, out.entity_hashes))
+    if rollups:
+        with run_report.stage("rollups"):
+            rating_rollups.write(output_file)
+        report_rollups(output_file, rating_rollups)
+    if tensor:
+        with run_report.stage("tensor"):
+            rating_tensor.write(output_file)
+        report_tensor(output_file, rating_tensor)
+    return out.triple_count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert the Pitchfork reviews database to Turtle and RDF/XML.")
+    parser.add_argument("--database", default=DATABASE_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--formats", type=parse_formats, default=OUTPUT_FORMATS,
+                        help="comma-separated output formats: turtle, xml, nt, nq, binary (written next to --output)")
+    parser.add_argument("--merged", action="store_true",
+                        help="build the old six-way joined frame instead of reading each table once (same graph, more memory)")
+    parser.add_argument("--stream", action="store_true",
+                        help="let SQLite do the joins and read the reviews in chunks, keeping memory flat")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="reviews per chunk with --stream")
+    parser.add_argument("--incremental", action="store_true",
+                        help="also write insert/delete delta files against the manifest of the previous run")
+    parser.add_argument("--rollups", action="store_true",
+                        help="also write rating count/sum rollups per album, genre and media type (.rollups.csv/.ttl)")
+    parser.add_argument("--tensor", action="store_true",
+                        help="also write the author x album scores as .npy arrays (.tensor/)")
+    parser.add_argument("--shard-bytes", type=parse_size,
+                        help="split the graph into self-contained shards of about this size (e.g. 64M) "
+                             "with a .shards.json manifest")
+    add_compression_arguments(parser)
+    add_report_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    run_report = RunReport("pitchfork")
+    run_report.enable(args.progress, args.profile, args.tracemalloc)
+
+    compression = compression_from_args(args)
+    # Połączenie z bazą danych (tylko do odczytu)
+    with connect(args.database) as conn:
+        if args.stream:
+            chunks = stream_chunks(conn, args.chunk_size, run_report)
+        else:
+            with run_report.stage("read database"):
+                chunks = [load_merged(conn) if args.merged else load_normalized(conn, run_report)]
+        triples = write_ttl(args.output, chunks, args.formats, args.incremental, args.rollups, args.tensor,
+                            run_report, compression, args.shard_bytes)
+    run_report.finish(args.report)
+    paths = written_paths(args.output, args.formats, compression, args.shard_bytes)
+    print(f"RDF zapisany pomyślnie do {', '.join(repr(path) for path in paths)} ({triples} triples).")
+
+
+if __name__ == "__main__":
+    main()
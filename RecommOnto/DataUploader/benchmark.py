@@ -0,0 +1,237 @@
+"""Throughput benchmark for the uploaders on synthetic inputs.
+
+For every dataset the inputs are generated with synthetic_data.py (stage
+"generate") and then converted by the uploader (stage "upload").  Each stage runs
+in its own process, so its peak RSS is its own.  The report lists rows/s,
+triples/s, bytes written and peak RSS, and can be stored as JSON and compared
+with an earlier run.  The uploader is run with --report, and its run report
+(exclusive time per stage, rows/s and triples/s without interpreter start-up)
+is merged into the upload result, so a comparison shows which stage changed:
+
+    python benchmark.py --scale 10 --json bench-new.json
+    python benchmark.py --scale 10 --compare bench-old.json
+    python benchmark.py --datasets amazon --args "amazon=--workers 4"
+
+Rows are rating rows (reviews for Pitchfork).  The peak RSS of worker processes
+started with --workers is not included, and it is not measured at all on
+platforms without os.wait4.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Rows per dataset at --scale 1; LDOS starts at ten copies of the real file.
+BASE_ROWS = {"amazon": 20000, "ldos": 22960, "pitchfork": 2000}
+TRIPLES_PATTERN = re.compile(r"\((\d+) triples\)")
+
+
+def uploader_command(dataset, directory, rows):
+    path = functools.partial(os.path.join, directory)
+    if dataset == "amazon":
+        return ["DataUploader_Amazon_Books.py", "--books", path("books_data.csv"), "--ratings", path("books_rating.csv"),
+                "--output", path("amazon_books.ttl"), "--max-records", str(rows)]
+    if dataset == "ldos":
+        return ["DataUploader_LDOS-CoMoDa.py", "--input", path("LDOS-CoMoDa.csv"), "--output", path("output_LDOS-CoMoDa.ttl")]
+    return ["DataUploader_PitchforkMusic.py", "--database", path("database.sqlite"),
+            "--output", path("pitchfork_album_reviews.ttl")]
+
+
+def snapshot(directory):
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files[path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def run_process(arguments):
+    # Runs one Python script from this directory; returns (seconds, peak RSS in KiB or None, output).
+    command = [sys.executable] + arguments
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=HERE)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            process.wait()
+            peak_rss = None
+        seconds = time.perf_counter() - start
+        log.seek(0)
+        output = log.read()
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(arguments)} exited with {process.returncode}:\n{output}")
+    return seconds, peak_rss, output
+
+
+def report_path(directory):
+    # Next to the dataset directory, so the report does not count as written output.
+    return directory.rstrip(os.sep) + ".report.json"
+
+
+def run_stage(dataset, stage, arguments, directory, rows, run_report=None):
+    before = snapshot(directory)
+    seconds, peak_rss, output = run_process(arguments)
+    after = snapshot(directory)
+    written = sum(size for path, (size, mtime) in after.items() if before.get(path) != (size, mtime))
+    match = TRIPLES_PATTERN.search(output)
+    triples = int(match.group(1)) if match else None
+    result = {
+        "dataset": dataset,
+        "stage": stage,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1),
+        "triples": triples,
+        "triples_per_second": round(triples / seconds, 1) if triples is not None else None,
+        "bytes_written": written,
+        "peak_rss_kb": peak_rss,
+    }
+    if run_report:
+        with open(run_report, encoding="utf-8") as f:
+            data = json.load(f)
+        result["stages"] = {name: entry["seconds"] for name, entry in data["stages"].items()}
+        result["uploader_rows_per_second"] = data.get("rows_per_second")
+        result["uploader_triples_per_second"] = data.get("triples_per_second")
+    return result
+
+
+def run_benchmark(datasets, scale, workdir, extra_args, seed=0):
+    results = []
+    for dataset in datasets:
+        directory = os.path.join(workdir, dataset)
+        os.makedirs(directory, exist_ok=True)
+        rows = max(int(BASE_ROWS[dataset] * scale), 1)
+        generate = ["synthetic_data.py", "--dataset", dataset, "--rows", str(rows), "--output", directory,
+                    "--seed", str(seed)]
+        results.append(run_stage(dataset, "generate", generate, directory, rows))
+        run_report = report_path(directory)
+        upload = (uploader_command(dataset, directory, rows) + ["--report", run_report, "--progress", "0"] +
+                  extra_args.get(dataset, []))
+        results.append(run_stage(dataset, "upload", upload, directory, rows, run_report))
+        print_result(results[-1])
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result, baseline=None):
+    line = (f"{result['dataset']:<10} {result['stage']:<9} {result['rows']:>9} rows {result['seconds']:>8.2f}s "
+            f"{result['rows_per_second']:>11.1f} rows/s")
+    if result["triples_per_second"] is not None:
+        line += f" {result['triples_per_second']:>11.1f} triples/s"
+    line += f" {result['bytes_written'] / 1e6:>9.1f} MB"
+    if result["peak_rss_kb"] is not None:
+        line += f" {result['peak_rss_kb'] / 1024:>8.1f} MiB RSS"
+    if result.get("uploader_rows_per_second"):
+        line += f"  (in the uploader: {result['uploader_rows_per_second']:.1f} rows/s"
+        if result.get("uploader_triples_per_second"):
+            line += f", {result['uploader_triples_per_second']:.1f} triples/s"
+        line += ")"
+    if baseline:
+        ratios = []
+        for key, label in (("rows_per_second", "rows/s"), ("uploader_rows_per_second", "uploader rows/s"),
+                           ("uploader_triples_per_second", "uploader triples/s"), ("peak_rss_kb", "RSS")):
+            if result.get(key) and baseline.get(key):
+                ratios.append(f"{label} x{result[key] / baseline[key]:.2f}")
+        line += "  [" + ", ".join(ratios) + "]"
+    print(line)
+    stages = result.get("stages")
+    if stages:
+        baseline_stages = (baseline or {}).get("stages", {})
+        for name, seconds in sorted(stages.items(), key=lambda stage: stage[1], reverse=True):
+            line = f"{'':<10} {'':<9}   {name:<24} {seconds:>8.2f}s"
+            if baseline_stages.get(name):
+                line += f"  [x{seconds / baseline_stages[name]:.2f}]"
+            print(line)
+
+
+def parse_extra_args(values):
+    extra = {}
+    for value in values:
+        dataset, _, arguments = value.partition("=")
+        if dataset not in BASE_ROWS:
+            raise argparse.ArgumentTypeError(f"--args expects DATASET=ARGS with DATASET in {', '.join(BASE_ROWS)}")
+        extra.setdefault(dataset, []).extend(shlex.split(arguments))
+    return extra
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the uploaders on synthetic inputs.")
+    parser.add_argument("--datasets", default=",".join(BASE_ROWS),
+                        help=f"comma-separated subset of {', '.join(BASE_ROWS)}")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiplier for the row counts (" +
+                             ", ".join(f"{name}: {rows}" for name, rows in BASE_ROWS.items()) + " at 1)")
+    parser.add_argument("--args", action="append", default=[], metavar="DATASET=ARGS",
+                        help="extra uploader arguments, e.g. \"amazon=--workers 4 --formats turtle,nt\"")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="directory for the generated inputs and outputs (default: a temporary one)")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    datasets = [name.strip() for name in args.datasets.split(",") if name.strip()]
+    unknown = [name for name in datasets if name not in BASE_ROWS]
+    if unknown:
+        sys.exit(f"unknown dataset(s): {', '.join(unknown)}")
+    try:
+        extra_args = parse_extra_args(args.args)
+    except argparse.ArgumentTypeError as error:
+        sys.exit(str(error))
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="uploader-bench-")
+    try:
+        results = run_benchmark(datasets, args.scale, workdir, extra_args, args.seed)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "args": args.args,
+        "results": results,
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {(r["dataset"], r["stage"]): r for r in json.load(f)["results"]}
+    print()
+    for result in results:
+        print_result(result, baseline.get((result["dataset"], result["stage"])))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to '{args.json}'")
+
+
+if __name__ == "__main__":
+    main()
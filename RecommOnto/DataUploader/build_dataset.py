@@ -0,0 +1,226 @@
+"""Runs the three uploaders concurrently and merges their graphs.
+
+Each uploader runs in its own process with its usual options, so the wall
+clock is close to that of the slowest dataset.  Every uploader also writes
+N-Triples, which the pool worker scans once the uploader is done.  Class and
+property declarations (":Genre a rdfs:Class") and the shared entities (genres)
+are the only subjects that occur in more than one dataset, so the scan keeps
+only those vocabulary subjects, a few hundred per dataset.  Only the triples of
+vocabulary subjects found in more than one dataset are deduplicated while the
+datasets are concatenated into one N-Triples file for a GraphDB bulk load:
+
+    python build_dataset.py                         # recommonto.nt next to the usual outputs
+    python build_dataset.py --output-dir build --args "amazon=--workers 4 --rollups"
+
+The per-dataset outputs stay in place, so they can be loaded one by one as
+before instead.  --compress gz (or bz2, xz, zst) is passed on to the uploaders
+and also compresses the merged file (recommonto.nt.gz).
+"""
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compressed_io import (Compression, add_compression_arguments, compressed_path, compression_from_args,
+                           open_input, open_output)
+from rdf_emitter import PREFIXES, RDF_TYPE, WRITE_BUFFER_BYTES, expand_iri, output_paths, parse_formats
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Script, output file and default formats of every uploader.
+PIPELINES = {
+    "amazon": ("DataUploader_Amazon_Books.py", "amazon_books.ttl", "turtle"),
+    "ldos": ("DataUploader_LDOS-CoMoDa.py", "output_LDOS-CoMoDa.ttl", "turtle"),
+    "pitchfork": ("DataUploader_PitchforkMusic.py", "pitchfork_album_reviews.ttl", "turtle,xml"),
+}
+MERGED_OUTPUT = "recommonto.nt"
+# Options the orchestrator sets itself; they cannot be passed through --args.
+RESERVED_OPTIONS = ("--output", "--formats", "--report", "--compress", "--compress-level", "--compress-threads")
+# The merge reads one N-Triples file per dataset.
+UNSUPPORTED_OPTIONS = ("--shard-bytes",)
+# Subjects typed with one of these, or described with one of the schema predicates,
+# are the vocabulary the datasets can have in common.
+VOCABULARY_TYPES = {f"<{expand_iri(term, PREFIXES)}>" for term in (
+    "rdfs:Class", "rdf:Property", "owl:Class", "owl:ObjectProperty", "owl:DatatypeProperty", ":Genre")}
+SCHEMA_PREDICATES = {f"<{expand_iri(term, PREFIXES)}>" for term in (
+    "rdfs:domain", "rdfs:range", "rdfs:subClassOf", "rdfs:subPropertyOf")}
+
+
+def pipeline_paths(dataset, output_dir, formats=None, compression=Compression()):
+    # formats is a parsed list (None: the uploader's defaults); returns (output path,
+    # formats the uploader is asked for, N-Triples path).
+    script, output, default_formats = PIPELINES[dataset]
+    output = os.path.join(output_dir, output)
+    formats = list(formats) if formats else parse_formats(default_formats)
+    if "nt" not in formats:
+        formats.append("nt")
+    return output, formats, compressed_path(output_paths(output, formats)["nt"], compression)
+
+
+def compression_options(compression):
+    if compression.method is None:
+        return []
+    options = ["--compress", compression.method, "--compress-threads", str(compression.threads)]
+    if compression.level is not None:
+        options += ["--compress-level", str(compression.level)]
+    return options
+
+
+def run_pipeline(dataset, output, formats, arguments, report_path=None, compression=Compression()):
+    # Runs in a pool process: the uploader itself is a child process of it, so its own
+    # --workers pool works the same as when it is started by hand.
+    script = PIPELINES[dataset][0]
+    command = [sys.executable, script, *arguments, "--output", output, "--formats", ",".join(formats),
+               *compression_options(compression)]
+    if report_path:
+        command += ["--report", report_path]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=HERE, check=True)
+    seconds = time.perf_counter() - start
+
+    subjects = vocabulary_subjects(compressed_path(output_paths(output, formats)["nt"], compression))
+    report = None
+    if report_path:
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+        os.remove(report_path)
+    return dataset, seconds, subjects, report
+
+
+def vocabulary_subjects(path):
+    # The class, property and genre subjects of an N-Triples file; the other subjects
+    # (ratings, users, items) belong to one dataset and are not kept.
+    rdf_type = f"<{RDF_TYPE}>"
+    subjects = set()
+    with open_input(path) as f:
+        for line in f:
+            subject, predicate, rest = line.split(" ", 2)
+            if predicate in SCHEMA_PREDICATES or (predicate == rdf_type and rest[:-3] in VOCABULARY_TYPES):
+                subjects.add(subject)
+    return subjects
+
+
+def shared_subjects(subject_sets):
+    seen = set()
+    shared = set()
+    for subjects in subject_sets:
+        shared |= subjects & seen
+        seen |= subjects
+    return shared
+
+
+def merge_ntriples(paths, shared, merged_path, compression=Compression()):
+    # Concatenates the files; only triples of shared subjects can repeat across datasets,
+    # so only those go through the duplicate check.  Returns (triples, duplicates dropped).
+    written = set()
+    triples = 0
+    duplicates = 0
+    with open_output(merged_path, "w", compression, buffering=WRITE_BUFFER_BYTES) as out:
+        for path in paths:
+            with open_input(path) as f:
+                for line in f:
+                    if line.partition(" ")[0] in shared:
+                        if line in written:
+                            duplicates += 1
+                            continue
+                        written.add(line)
+                    out.write(line)
+                    triples += 1
+    return triples, duplicates
+
+
+def parse_extra_args(values):
+    extra = {}
+    for value in values:
+        dataset, _, arguments = value.partition("=")
+        if dataset not in PIPELINES:
+            raise ValueError(f"--args expects DATASET=ARGS with DATASET in {', '.join(PIPELINES)}")
+        arguments = shlex.split(arguments)
+        reserved = [arg for arg in arguments if arg.split("=")[0] in RESERVED_OPTIONS]
+        if reserved:
+            raise ValueError(f"{', '.join(reserved)} is set by build_dataset.py (use --output-dir/--formats/--report)")
+        unsupported = [arg for arg in arguments if arg.split("=")[0] in UNSUPPORTED_OPTIONS]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} cannot be used with build_dataset.py")
+        extra.setdefault(dataset, []).extend(arguments)
+    return extra
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the uploaders concurrently and merge their graphs.")
+    parser.add_argument("--datasets", default=",".join(PIPELINES),
+                        help=f"comma-separated subset of {', '.join(PIPELINES)}")
+    parser.add_argument("--output-dir", default=".", help="directory for the dataset outputs and the merged file")
+    parser.add_argument("--formats", help="output formats of every dataset (default: each uploader's own)")
+    parser.add_argument("--merged-output", default=MERGED_OUTPUT,
+                        help="merged N-Triples file, relative to --output-dir")
+    parser.add_argument("--no-merge", dest="merge", action="store_false",
+                        help="only run the uploaders, keep the per-dataset outputs")
+    parser.add_argument("--args", action="append", default=[], metavar="DATASET=ARGS",
+                        help="extra uploader arguments, e.g. \"ldos=--compact-contexts\"")
+    parser.add_argument("--report", help="write the uploaders' run reports and the merge timings to this JSON file")
+    add_compression_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    datasets = [name.strip() for name in args.datasets.split(",") if name.strip()]
+    unknown = [name for name in datasets if name not in PIPELINES]
+    if unknown:
+        sys.exit(f"unknown dataset(s): {', '.join(unknown)}")
+    try:
+        extra_args = parse_extra_args(args.args)
+        formats = parse_formats(args.formats) if args.formats else None
+    except ValueError as error:
+        sys.exit(str(error))
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    compression = compression_from_args(args)
+
+    start = time.perf_counter()
+    paths = {dataset: pipeline_paths(dataset, output_dir, formats, compression) for dataset in datasets}
+    results = {}
+    with ProcessPoolExecutor(len(datasets)) as pool:
+        futures = []
+        for dataset in datasets:
+            output, dataset_formats, _ = paths[dataset]
+            report_path = os.path.join(output_dir, f".{dataset}.report.json") if args.report else None
+            futures.append(pool.submit(run_pipeline, dataset, output, dataset_formats,
+                                       extra_args.get(dataset, []), report_path, compression))
+        for future in futures:
+            dataset, seconds, subjects, report = future.result()
+            results[dataset] = {"seconds": round(seconds, 3), "subjects": subjects, "report": report}
+            print(f"{dataset}: done in {seconds:.1f}s")
+    upload_seconds = time.perf_counter() - start
+
+    summary = {"datasets": {}, "upload_seconds": round(upload_seconds, 3)}
+    for dataset in datasets:
+        summary["datasets"][dataset] = {"seconds": results[dataset]["seconds"], "report": results[dataset]["report"]}
+    if args.merge:
+        merge_start = time.perf_counter()
+        shared = shared_subjects(results[dataset]["subjects"] for dataset in datasets)
+        merged_path = compressed_path(os.path.join(output_dir, args.merged_output), compression)
+        triples, duplicates = merge_ntriples([paths[dataset][2] for dataset in datasets], shared, merged_path,
+                                             compression)
+        merge_seconds = time.perf_counter() - merge_start
+        summary.update(merged_output=merged_path, merged_triples=triples, duplicates_dropped=duplicates,
+                       shared_subjects=len(shared), merge_seconds=round(merge_seconds, 3))
+        print(f"Merged graph written to '{merged_path}' ({triples} triples, {len(shared)} shared subjects, "
+              f"{duplicates} duplicate triples dropped)")
+    # N-Triples copies the user did not ask for were only needed for the merge.
+    for dataset in datasets:
+        if "nt" not in (formats or parse_formats(PIPELINES[dataset][2])):
+            os.remove(paths[dataset][2])
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"Finished in {summary['seconds']:.1f}s (uploads {upload_seconds:.1f}s)")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
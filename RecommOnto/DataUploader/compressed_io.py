@@ -0,0 +1,174 @@
+"""Streaming reads from .gz, .bz2, .xz, .zst and .zip files, and compressed outputs.
+
+open_input() picks the decompressor from the file extension and returns a text
+(or binary) stream, so an uploader can read books_rating.csv.gz or
+recommendations.zip without unpacking it first.  A .zip archive is read from
+its only member, or from the member named like the archive
+(amazon_books.zip -> amazon_books.ttl).
+
+open_output() writes .gz, .bz2 and .xz files in independently compressed
+blocks of BLOCK_BYTES, concatenated as separate members; gzip, bzip2 and xz
+readers treat them as one stream.  With threads > 1 the blocks are compressed
+on a thread pool (zlib, bz2 and lzma release the GIL) while the next ones are
+formatted, and the file is the same whatever the number of threads.  .zst
+uses the zstandard package (optional) and its own worker threads.
+
+The uploaders take --compress METHOD (see add_compression_arguments): every
+text output of the graph is then written as <file>.<METHOD>, for example
+amazon_books.ttl.gz.  Memory-mapped .rdfb files stay uncompressed.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+import zipfile
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCK_BYTES = 4 << 20
+WRITE_BUFFER_BYTES = 1 << 20
+COMPRESSIONS = ("gz", "bz2", "xz", "zst")
+DEFAULT_LEVELS = {"gz": 6, "bz2": 9, "xz": 6, "zst": 3}
+BLOCK_COMPRESSORS = {
+    "gz": lambda data, level: gzip.compress(data, level, mtime=0),
+    "bz2": lambda data, level: bz2.compress(data, level),
+    "xz": lambda data, level: lzma.compress(data, preset=level),
+}
+
+# method is None for plain files.
+Compression = namedtuple("Compression", ["method", "level", "threads"], defaults=(None, None, 1))
+
+
+def compression_of(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in COMPRESSIONS or extension == "zip" else None
+
+
+def zip_member(archive, path):
+    names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    if len(names) == 1:
+        return names[0]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for name in names:
+        if os.path.splitext(os.path.basename(name))[0] == stem:
+            return name
+    raise ValueError(f"cannot tell which member of '{path}' to read: {', '.join(names)}")
+
+
+def source_name(path):
+    """The name of the data inside path: the .zip member, or path without the compression suffix."""
+    method = compression_of(path)
+    if method == "zip":
+        with zipfile.ZipFile(path) as archive:
+            return zip_member(archive, path)
+    return os.path.splitext(path)[0] if method else path
+
+
+def open_input(path, mode="rt", encoding="utf-8", newline=None):
+    method = compression_of(path)
+    if method == "zip":
+        with zipfile.ZipFile(path) as archive:
+            # the member keeps the archive file open until it is closed itself
+            stream = archive.open(zip_member(archive, path))
+    elif method == "gz":
+        stream = gzip.open(path, "rb")
+    elif method == "bz2":
+        stream = bz2.open(path, "rb")
+    elif method == "xz":
+        stream = lzma.open(path, "rb")
+    elif method == "zst":
+        import zstandard
+        # read_across_frames: appended outputs (open_output with mode "a") hold several frames
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        stream = io.BufferedReader(reader, WRITE_BUFFER_BYTES)
+    else:
+        return open(path, mode, encoding=None if "b" in mode else encoding, newline=newline)
+    if "b" in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+
+class BlockWriter(io.RawIOBase):
+    # Cuts the written bytes into BLOCK_BYTES blocks and writes them compressed, in order.
+    def __init__(self, out, compress, threads=1, block_bytes=BLOCK_BYTES):
+        self._out = out
+        self._compress = compress
+        self._block_bytes = block_bytes
+        self._buffer = bytearray()
+        self._threads = threads
+        self._pool = ThreadPoolExecutor(threads) if threads > 1 else None
+        self._pending = deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._block_bytes:
+            self._submit(bytes(self._buffer[:self._block_bytes]))
+            del self._buffer[:self._block_bytes]
+        return len(data)
+
+    def _submit(self, block):
+        if self._pool is None:
+            self._out.write(self._compress(block))
+            return
+        self._pending.append(self._pool.submit(self._compress, block))
+        while len(self._pending) > self._threads * 2:
+            self._out.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._out.write(self._pending.popleft().result())
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+            self._out.close()
+            super().close()
+
+
+def open_output(path, mode="w", compression=Compression(), encoding="utf-8", buffering=WRITE_BUFFER_BYTES):
+    """Opens path for writing, compressed with compression.method unless that is None.
+
+    With mode "a" a compressed file is appended to as a new member (or zstd frame)."""
+    method = compression.method
+    if method is None:
+        return open(path, mode, encoding=None if "b" in mode else encoding, buffering=buffering)
+    level = DEFAULT_LEVELS[method] if compression.level is None else compression.level
+    file_mode = "ab" if "a" in mode else "wb"
+    if method == "zst":
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=level,
+                                              threads=compression.threads if compression.threads > 1 else 0)
+        raw = compressor.stream_writer(open(path, file_mode), closefd=True)
+    else:
+        compress = BLOCK_COMPRESSORS[method]
+        raw = BlockWriter(open(path, file_mode), lambda data: compress(data, level), compression.threads)
+    stream = io.BufferedWriter(raw, buffering)
+    if "b" in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding)
+
+
+def compressed_path(path, compression=Compression()):
+    return f"{path}.{compression.method}" if compression.method else path
+
+
+def add_compression_arguments(parser):
+    parser.add_argument("--compress", choices=COMPRESSIONS,
+                        help="write the text outputs of the graph compressed (<file>.gz, .bz2, .xz or .zst)")
+    parser.add_argument("--compress-level", type=int,
+                        help="compression level (default: gz 6, bz2 9, xz 6, zst 3)")
+    parser.add_argument("--compress-threads", type=int, default=1,
+                        help="threads compressing blocks in parallel (0 = all cores)")
+
+
+def compression_from_args(args):
+    return Compression(args.compress, args.compress_level, args.compress_threads or os.cpu_count())
@@ -0,0 +1,69 @@
+"""Split a CSV file into byte ranges that start and end on record boundaries.
+
+A newline only ends a record when it is outside a quoted field, so the file is
+scanned once while tracking quote parity ("" escapes count twice and keep it).
+"""
+import csv
+import os
+
+SCAN_BLOCK_BYTES = 16 << 20
+
+
+def _odd_quotes(block, start, end=None):
+    count = block.count(b'"', start) if end is None else block.count(b'"', start, end)
+    return count % 2 == 1
+
+
+def split_csv_ranges(path, parts, skip_header=True):
+    size = os.path.getsize(path)
+    boundaries = []
+    first = None if skip_header else 0
+    target = None
+    split = 0
+    in_quotes = False
+    offset = 0
+
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            pos = 0
+            while pos < len(block):
+                if first is not None:
+                    # Jump to the next split target, carrying quote parity over the skipped bytes.
+                    last = boundaries[-1] if boundaries else first
+                    while target is None or target <= last:
+                        split += 1
+                        target = first + (size - first) * split // parts
+                    if target >= size:
+                        break
+                    skip_to = min(max(pos, target - offset), len(block))
+                    in_quotes ^= _odd_quotes(block, pos, skip_to)
+                    pos = skip_to
+                newline = block.find(b"\n", pos)
+                if newline < 0:
+                    in_quotes ^= _odd_quotes(block, pos)
+                    pos = len(block)
+                    break
+                in_quotes ^= _odd_quotes(block, pos, newline)
+                pos = newline + 1
+                if in_quotes:
+                    continue
+                if first is None:
+                    first = offset + pos
+                else:
+                    boundaries.append(offset + pos)
+            if first is not None and target is not None and target >= size:
+                break
+            offset += len(block)
+
+    if first is None or first >= size:
+        return []
+    edges = [first] + [b for b in boundaries if first < b < size] + [size]
+    return list(zip(edges, edges[1:]))
+
+
+def read_csv_header(path, encoding="utf-8"):
+    with open(path, newline="", encoding=encoding) as f:
+        return next(csv.reader(f), [])
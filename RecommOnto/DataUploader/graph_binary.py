@@ -0,0 +1,442 @@
+"""Dictionary-encoded, compressed binary graph files (.rdfb).
+
+A .rdfb file holds one graph as integer IDs so it can be memory-mapped and
+scanned without parsing any text:
+
+  header            magic, version, term/triple/predicate counts, section offsets
+  term blocks       uint64[term blocks + 1], byte ranges into the term blob
+  term blob         UTF-8 N-Triples terms (<iri>, "literal"^^<datatype>), sorted,
+                    so a term's ID is its rank and lookups are a binary search.
+                    Front-coded in blocks of TERM_BLOCK terms: the first term of a
+                    block is stored whole, the others as (length of the prefix
+                    shared with the previous term, suffix)
+  subject blocks    uint64[subject blocks + 1], byte ranges into the triples
+  triples           per block of SUBJECT_BLOCK subject IDs: the triple count of
+                    each subject, then its (predicate, object) pairs sorted by
+                    predicate and object, delta-coded: the predicate as the gap
+                    to the previous one of the subject, the object as the gap to
+                    the previous one of the same predicate (or as is after a new
+                    predicate)
+  predicate IDs     uint32[predicates]
+  predicate blocks  uint64[predicates + 1], byte ranges into the section below
+  by predicate      per predicate: its triple count, then the (object, subject)
+                    pairs sorted by object and subject, delta-coded the same way
+
+All numbers in the triples and term sections are LEB128 varints, so an ID
+triple takes 2-4 bytes instead of 12.  A subject block, a predicate or a term
+block is decoded on its own, which keeps lookups by subject, predicate or term
+random-access; blocks() decodes the graph one subject block at a time.  The
+fixed-width sections are 8-byte aligned and little-endian; BinaryGraph reads
+them as numpy views of the mapped file.
+
+The writer (rdf_emitter.BinaryGraphSerializer) keeps the term dictionary and
+three uint32 columns of the graph in memory until it is closed, because the
+triples have to be sorted before they are written.
+
+    python graph_binary.py amazon_books.rdfb --predicate "<http://schema.org/name>"
+
+prints the matching triples as N-Triples (the whole graph without filters).
+"""
+import argparse
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"RDFB"
+VERSION = 2
+# magic, version, reserved, terms, triples, predicates, then the offsets of the seven sections after the header
+HEADER = struct.Struct("<4sHHQQQ7Q")
+MAX_TERMS = 1 << 32
+TERM_BLOCK = 16
+SUBJECT_BLOCK = 64
+EMPTY = np.empty(0, dtype=np.uint32)
+
+
+def _pad(out, position):
+    padding = -position % 8
+    if padding:
+        out.write(b"\0" * padding)
+    return position + padding
+
+
+def encode_varints(values):
+    """LEB128 encoding of a uint64 array; returns (bytes, byte length of every value)."""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= np.uint64(1 << shift)
+    starts = np.cumsum(lengths) - lengths
+    owner = np.repeat(np.arange(len(values)), lengths)
+    position = np.arange(int(lengths.sum())) - starts[owner]
+    data = (values[owner] >> (7 * position).astype(np.uint64)) & np.uint64(0x7F)
+    data |= np.where(position < lengths[owner] - 1, np.uint64(0x80), np.uint64(0))
+    return data.astype(np.uint8).tobytes(), lengths
+
+
+def decode_varints(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.empty(len(ends), dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def _read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _segment_starts(first, length):
+    # first: positions where segments start, as a boolean array of the given length.
+    starts = np.zeros(length, dtype=bool)
+    starts[first] = True
+    return starts
+
+
+def _delta_encode(major, minor, segments):
+    # Gaps of the (major, minor) pairs: major against the previous pair of its segment,
+    # minor against the previous pair with the same major (as is when major changes).
+    major = major.astype(np.int64)
+    minor = minor.astype(np.int64)
+    major_gap = major.copy()
+    major_gap[1:] -= major[:-1]
+    major_gap[segments] = major[segments]
+    runs = segments | (major_gap != 0)
+    minor_gap = minor.copy()
+    minor_gap[1:] -= minor[:-1]
+    minor_gap[runs] = minor[runs]
+    return major_gap, minor_gap
+
+
+def _segmented_cumsum(values, starts):
+    total = np.cumsum(values)
+    first = np.flatnonzero(starts)
+    base = (total - values)[first]
+    return total - np.repeat(base, np.diff(np.append(first, len(values))))
+
+
+def _delta_decode(major_gap, minor_gap, segments):
+    major = _segmented_cumsum(major_gap, segments)
+    minor = _segmented_cumsum(minor_gap, segments | (major_gap != 0))
+    return major.astype(np.uint32), minor.astype(np.uint32)
+
+
+def _front_code(encoded):
+    # Returns (block offsets, blob) for the sorted, UTF-8 encoded terms.
+    offsets = [0]
+    parts = []
+    size = 0
+    previous = b""
+    for index, term in enumerate(encoded):
+        if index % TERM_BLOCK == 0:
+            if index:
+                offsets.append(size)
+            part = _varint(len(term)) + term
+        else:
+            shared = 0
+            limit = min(len(term), len(previous))
+            while shared < limit and term[shared] == previous[shared]:
+                shared += 1
+            part = _varint(shared) + _varint(len(term) - shared) + term[shared:]
+        parts.append(part)
+        size += len(part)
+        previous = term
+    offsets.append(size)
+    return np.asarray(offsets, dtype=np.uint64), b"".join(parts)
+
+
+def _encode_groups(groups, counts, major, minor, segments):
+    # One varint stream per group: the counts of its members, then their delta-coded pairs.
+    # groups is a list of (member slice, pair slice); returns (byte offsets per group, stream).
+    major_gap, minor_gap = _delta_encode(major, minor, segments)
+    pairs = np.empty(2 * len(major), dtype=np.int64)
+    pairs[0::2] = major_gap
+    pairs[1::2] = minor_gap
+    values = []
+    for members, rows in groups:
+        values.append(counts[members])
+        values.append(pairs[2 * rows.start:2 * rows.stop])
+    values = np.concatenate(values) if values else np.empty(0, dtype=np.int64)
+    data, lengths = encode_varints(values)
+    value_ends = np.cumsum([0] + [len(counts[members]) + 2 * (rows.stop - rows.start) for members, rows in groups])
+    byte_ends = np.concatenate([[0], np.cumsum(lengths)])
+    return byte_ends[value_ends].astype(np.uint64), data
+
+
+def write_graph(out, terms, subjects, predicates, objects):
+    """Writes a .rdfb graph to the binary file object out.
+
+    terms lists the N-Triples form of every term; subjects, predicates and objects
+    are equally long uint32 buffers of indexes into terms.  Duplicate triples are
+    written once.
+    """
+    if len(terms) >= MAX_TERMS:
+        raise ValueError(f"too many distinct terms for a .rdfb file: {len(terms)}")
+    order = sorted(range(len(terms)), key=terms.__getitem__)
+    remap = np.empty(len(terms), dtype=np.uint32)
+    remap[np.asarray(order, dtype=np.int64)] = np.arange(len(terms), dtype=np.uint32)
+    encoded = [terms[i].encode("utf-8") for i in order]
+
+    s = remap[np.frombuffer(subjects, dtype=np.uint32)]
+    p = remap[np.frombuffer(predicates, dtype=np.uint32)]
+    o = remap[np.frombuffer(objects, dtype=np.uint32)]
+    spo = np.lexsort((o, p, s))
+    s, p, o = s[spo], p[spo], o[spo]
+    if len(s):
+        keep = np.ones(len(s), dtype=bool)
+        keep[1:] = (s[1:] != s[:-1]) | (p[1:] != p[:-1]) | (o[1:] != o[:-1])
+        s, p, o = s[keep], p[keep], o[keep]
+
+    term_offsets, blob = _front_code(encoded)
+
+    subject_counts = np.bincount(s, minlength=len(encoded)).astype(np.int64)
+    subject_rows = np.concatenate([[0], np.cumsum(subject_counts)])
+    subject_groups = [(slice(start, min(start + SUBJECT_BLOCK, len(encoded))),
+                       slice(int(subject_rows[start]), int(subject_rows[min(start + SUBJECT_BLOCK, len(encoded))])))
+                      for start in range(0, len(encoded), SUBJECT_BLOCK)]
+    subject_segments = np.ones(len(s), dtype=bool)
+    subject_segments[1:] = s[1:] != s[:-1]
+    subject_offsets, subject_data = _encode_groups(subject_groups, subject_counts, p, o, subject_segments)
+
+    pos = np.lexsort((s, o, p))
+    predicate_ids, starts, predicate_counts = np.unique(p[pos], return_index=True, return_counts=True)
+    predicate_groups = [(slice(i, i + 1), slice(int(start), int(start + count)))
+                        for i, (start, count) in enumerate(zip(starts, predicate_counts))]
+    predicate_segments = _segment_starts(starts, len(pos))
+    predicate_offsets, predicate_data = _encode_groups(predicate_groups, predicate_counts.astype(np.int64),
+                                                       o[pos], s[pos], predicate_segments)
+
+    sections = [term_offsets, blob, subject_offsets, subject_data,
+                predicate_ids.astype(np.uint32), predicate_offsets, predicate_data]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        position += -position % 8
+        offsets.append(position)
+        position += len(section) if isinstance(section, bytes) else section.nbytes
+
+    out.write(HEADER.pack(MAGIC, VERSION, 0, len(encoded), len(s), len(predicate_ids), *offsets))
+    position = HEADER.size
+    for offset, section in zip(offsets, sections):
+        position = _pad(out, position)
+        data = section if isinstance(section, bytes) else section.tobytes()
+        out.write(data)
+        position += len(data)
+    return len(s)
+
+
+class BinaryGraph:
+    """Read-only, memory-mapped view of a .rdfb file.
+
+    Term IDs are positions in the sorted dictionary; triples come back as
+    (subjects, predicates, objects) uint32 arrays that decode() turns into terms.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, terms, triples, predicates, *offsets = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} .rdfb file")
+        self.term_count = terms
+        self.triple_count = triples
+        term_blocks = -(-terms // TERM_BLOCK)
+        self.subject_blocks = -(-terms // SUBJECT_BLOCK)
+        self._term_offsets = np.frombuffer(self._map, np.uint64, term_blocks + 1, offsets[0])
+        self._blob = memoryview(self._map)[offsets[1]:offsets[1] + int(self._term_offsets[-1])]
+        self._subject_offsets = np.frombuffer(self._map, np.uint64, self.subject_blocks + 1, offsets[2])
+        self._subject_data = offsets[3]
+        self._predicate_ids = np.frombuffer(self._map, np.uint32, predicates, offsets[4])
+        self._predicate_offsets = np.frombuffer(self._map, np.uint64, predicates + 1, offsets[5])
+        self._predicate_data = offsets[6]
+
+    def __len__(self):
+        return self.triple_count
+
+    def _term_block(self, block):
+        # The terms of one front-coded block, as bytes.
+        blob = self._blob
+        position = int(self._term_offsets[block])
+        end = int(self._term_offsets[block + 1])
+        length, position = _read_varint(blob, position)
+        term = bytes(blob[position:position + length])
+        position += length
+        terms = [term]
+        while position < end:
+            shared, position = _read_varint(blob, position)
+            length, position = _read_varint(blob, position)
+            term = term[:shared] + bytes(blob[position:position + length])
+            position += length
+            terms.append(term)
+        return terms
+
+    def _first_term(self, block):
+        position = int(self._term_offsets[block])
+        length, position = _read_varint(self._blob, position)
+        return bytes(self._blob[position:position + length])
+
+    def term(self, term_id):
+        return self._term_block(term_id // TERM_BLOCK)[term_id % TERM_BLOCK].decode("utf-8")
+
+    def term_id(self, term):
+        # Binary search over the first terms of the blocks, then a scan of one block;
+        # returns None for unknown terms.
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self._term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first_term(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        block = lo - 1
+        if block < 0:
+            return None
+        for index, candidate in enumerate(self._term_block(block)):
+            if candidate == key:
+                return block * TERM_BLOCK + index
+        return None
+
+    def _varints(self, base, offsets, index):
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        return decode_varints(self._map[base + start:base + end])
+
+    def _subject_block(self, block):
+        first = block * SUBJECT_BLOCK
+        members = min(SUBJECT_BLOCK, self.term_count - first)
+        values = self._varints(self._subject_data, self._subject_offsets, block)
+        counts = values[:members].astype(np.int64)
+        pairs = values[members:].astype(np.int64)
+        subjects = np.repeat(np.arange(first, first + members, dtype=np.uint32), counts)
+        segments = _segment_starts((np.cumsum(counts) - counts)[counts > 0], len(subjects))
+        p, o = _delta_decode(pairs[0::2], pairs[1::2], segments)
+        return subjects, p, o
+
+    def blocks(self):
+        """Yields the graph as (subjects, predicates, objects) ID arrays, one subject block at a time."""
+        for block in range(self.subject_blocks):
+            s, p, o = self._subject_block(block)
+            if len(s):
+                yield s, p, o
+
+    def triples(self, subject=None, predicate=None):
+        """Returns the matching triples as (subjects, predicates, objects) ID arrays.
+
+        subject and predicate are N-Triples terms or IDs; both are optional.
+        """
+        if isinstance(subject, str):
+            subject = self.term_id(subject)
+            if subject is None:
+                return EMPTY, EMPTY, EMPTY
+        if isinstance(predicate, str):
+            predicate = self.term_id(predicate)
+            if predicate is None:
+                return EMPTY, EMPTY, EMPTY
+
+        if subject is not None:
+            s, p, o = self._subject_block(subject // SUBJECT_BLOCK)
+            lo, hi = np.searchsorted(s, [subject, subject + 1])
+            p, o = p[lo:hi], o[lo:hi]
+            if predicate is not None:
+                # Within a subject the triples are sorted by predicate.
+                lo, hi = np.searchsorted(p, [predicate, predicate + 1])
+                p, o = p[lo:hi], o[lo:hi]
+            return np.full(len(p), subject, dtype=np.uint32), p, o
+
+        if predicate is not None:
+            slot = np.searchsorted(self._predicate_ids, predicate)
+            if slot == len(self._predicate_ids) or self._predicate_ids[slot] != predicate:
+                return EMPTY, EMPTY, EMPTY
+            values = self._varints(self._predicate_data, self._predicate_offsets, slot)
+            pairs = values[1:].astype(np.int64)
+            segments = _segment_starts([0], len(pairs) // 2)
+            o, s = _delta_decode(pairs[0::2], pairs[1::2], segments)
+            return s, np.full(len(s), predicate, dtype=np.uint32), o
+
+        columns = list(zip(*self.blocks()))
+        if not columns:
+            return EMPTY, EMPTY, EMPTY
+        return tuple(np.concatenate(column) for column in columns)
+
+    def decode(self, ids):
+        # Each term block is decoded once, however many of its terms are asked for.
+        blocks = {}
+        terms = []
+        for term_id in ids:
+            block = blocks.get(term_id // TERM_BLOCK)
+            if block is None:
+                block = blocks[term_id // TERM_BLOCK] = self._term_block(term_id // TERM_BLOCK)
+            terms.append(block[term_id % TERM_BLOCK].decode("utf-8"))
+        return terms
+
+    def write_ntriples(self, out, subject=None, predicate=None):
+        s, p, o = self.triples(subject, predicate)
+        terms = {}
+
+        def term(i):
+            text = terms.get(i)
+            if text is None:
+                text = terms[i] = self.term(i)
+            return text
+
+        for si, pi, oi in zip(s.tolist(), p.tolist(), o.tolist()):
+            out.write(f"{term(si)} {term(pi)} {term(oi)} .\n")
+        return len(s)
+
+    def close(self):
+        # Views into the map must be released before it can be closed.
+        self._blob = self._term_offsets = self._subject_offsets = None
+        self._predicate_ids = self._predicate_offsets = None
+        try:
+            self._map.close()
+        except BufferError:
+            # Arrays returned by triples() still point into the map; it is unmapped once they are gone.
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Print the triples of a .rdfb graph as N-Triples.")
+    parser.add_argument("path", help=".rdfb file written with --formats binary")
+    parser.add_argument("--subject", help="only triples with this subject (N-Triples form, e.g. <http://...>)")
+    parser.add_argument("--predicate", help="only triples with this predicate (N-Triples form)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with BinaryGraph(args.path) as graph:
+        graph.write_ntriples(sys.stdout, args.subject, args.predicate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Batched bulk loading of the generated graphs into a SPARQL Graph Store endpoint.
+
+    python graph_store_loader.py recommonto.nt
+    python graph_store_loader.py amazon_books.nt --graph http://example.org/graph/amazon \\
+        --endpoint http://localhost:7200/repositories/RecommOnto/rdf-graphs/service
+    python graph_store_loader.py --stand-in 8088 --fail-rate 0.1   # local stand-in endpoint
+
+Triples are sent as N-Triples (or N-Quads) in POST requests of at most
+--batch-bytes / --batch-triples.  .nt and .nq files are streamed line by line,
+a .ttl file a few statements at a time (query_engine.iter_turtle), and a .rdfb
+file one subject block at a time, decoding only the terms that block uses.
+Text files can also be read from .gz, .bz2, .xz, .zst or .zip archives
+(amazon_books.ttl.gz, ../recommendations.zip).  Each POST is one transaction,
+either on the RDF4J/GraphDB statements endpoint of the RecommOnto repository
+(GraphDBRepository/RecommOnto-config.ttl, the default) or on a Graph Store
+endpoint (with --graph, which takes triples only, so not .nq files).
+
+--concurrency threads each keep one keep-alive connection.  The reader blocks
+while twice that many batches are waiting, so memory stays bounded.  A batch
+that fails with a connection error, 408, 429 or 5xx is retried with exponential
+backoff; any other status stops the load.  Re-sending a batch is harmless
+because a graph is a set of triples, so after a failure the load can be resumed
+with the --start-batch it prints.
+
+A .shards.json manifest (written by the uploaders with --shard-bytes) stands for
+its shard files, N-Triples or N-Quads when they were written.  The shards can
+also be passed one by one, or loaded by several loaders in parallel, so a failed
+shard can be loaded again on its own.
+"""
+import argparse
+import base64
+import http.client
+import queue
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+from compressed_io import open_input, source_name
+from rdf_emitter import shard_files
+
+DEFAULT_ENDPOINT = "http://localhost:7200/repositories/RecommOnto/statements"
+BATCH_BYTES = 4 << 20
+BATCH_TRIPLES = 50000
+CONCURRENCY = 4
+RETRIES = 5
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30.0
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+CONTENT_TYPES = {"nt": "application/n-triples", "nq": "application/n-quads"}
+# Decoded .rdfb terms kept between subject blocks (predicates, classes, shared objects).
+TERM_CACHE_SIZE = 1 << 16
+
+
+class LoadError(Exception):
+    def __init__(self, message, resume_batch=None):
+        super().__init__(message)
+        self.resume_batch = resume_batch
+
+
+def read_lines(path):
+    """Yields the triples of a generated file as N-Triples (.nq: N-Quads) lines."""
+    name = source_name(path)
+    if name.endswith(".rdfb"):
+        import graph_binary
+        with graph_binary.BinaryGraph(path) as graph:
+            terms = {}
+            for block in graph.blocks():
+                if len(terms) > TERM_CACHE_SIZE:
+                    terms.clear()
+                missing = sorted({term_id for column in block for term_id in column.tolist()}.difference(terms))
+                terms.update(zip(missing, graph.decode(missing)))
+                for s, p, o in zip(*(column.tolist() for column in block)):
+                    yield f"{terms[s]} {terms[p]} {terms[o]} .\n"
+    elif name.endswith(".ttl"):
+        from query_engine import iter_turtle
+        with open_input(path) as f:
+            for s, p, o in iter_turtle(f):
+                yield f"{s} {p} {o} .\n"
+    else:
+        with open_input(path) as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    yield line
+
+
+def batches(lines, batch_bytes=BATCH_BYTES, batch_triples=BATCH_TRIPLES):
+    """Groups lines into (body, triple count) request bodies of bounded size."""
+    batch = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        batch.append(data)
+        size += len(data)
+        if size >= batch_bytes or len(batch) >= batch_triples:
+            yield b"".join(batch), len(batch)
+            batch = []
+            size = 0
+    if batch:
+        yield b"".join(batch), len(batch)
+
+
+class GraphStoreLoader:
+    def __init__(self, endpoint=DEFAULT_ENDPOINT, graph=None, concurrency=CONCURRENCY, retries=RETRIES,
+                 timeout=120, user=None):
+        url = urlsplit(endpoint)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"unsupported endpoint: {endpoint}")
+        self.connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self.host = url.netloc
+        self.path = url.path or "/"
+        if url.query:
+            self.path += "?" + url.query
+        if graph:
+            self.path += ("&" if "?" in self.path else "?") + "graph=" + quote(graph, safe="")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.headers = {"Connection": "keep-alive"}
+        if user:
+            self.headers["Authorization"] = "Basic " + base64.b64encode(user.encode("utf-8")).decode("ascii")
+        self.stats = {"batches": 0, "triples": 0, "bytes": 0, "retries": 0}
+        self._lock = threading.Lock()
+
+    def send(self, connection, body, content_type):
+        # Returns the connection to reuse for the next batch; raises LoadError when the
+        # batch cannot be stored.
+        delay = RETRY_DELAY
+        headers = dict(self.headers, **{"Content-Type": content_type})
+        for attempt in range(self.retries + 1):
+            try:
+                if connection is None:
+                    connection = self.connection_class(self.host, timeout=self.timeout)
+                connection.request("POST", self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                payload = response.read()  # drained so the connection can be reused
+                if response.status < 300:
+                    return connection
+                message = f"HTTP {response.status}: {payload[:300].decode('utf-8', 'replace').strip()}"
+                if response.status not in RETRY_STATUSES:
+                    raise LoadError(message)
+            except (OSError, http.client.HTTPException) as error:
+                message = f"{type(error).__name__}: {error}"
+                if connection is not None:
+                    connection.close()
+                connection = None
+            if attempt == self.retries:
+                raise LoadError(f"{message} (after {attempt + 1} attempts)")
+            with self._lock:
+                self.stats["retries"] += 1
+            time.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def load(self, sources, batch_bytes=BATCH_BYTES, batch_triples=BATCH_TRIPLES, start_batch=0):
+        """Loads (lines, content type) sources; batches are numbered across all of them."""
+        work = queue.Queue(self.concurrency * 2)
+        done = set()
+        failures = []
+
+        def worker():
+            connection = None
+            while True:
+                item = work.get()
+                if item is None:
+                    break
+                index, body, count, content_type = item
+                if failures:
+                    continue
+                try:
+                    connection = self.send(connection, body, content_type)
+                except LoadError as error:
+                    with self._lock:
+                        failures.append((index, error))
+                    continue
+                with self._lock:
+                    done.add(index)
+                    self.stats["batches"] += 1
+                    self.stats["triples"] += count
+                    self.stats["bytes"] += len(body)
+            if connection is not None:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        index = 0
+        try:
+            for lines, content_type in sources:
+                if failures:
+                    break
+                for body, count in batches(lines, batch_bytes, batch_triples):
+                    if failures:
+                        break
+                    if index >= start_batch:
+                        work.put((index, body, count, content_type))  # blocks while the queue is full
+                    index += 1
+        finally:
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
+
+        if failures:
+            failed, error = min(failures, key=lambda failure: failure[0])
+            resume = min(i for i in range(start_batch, index + 1) if i not in done)
+            raise LoadError(f"batch {failed}: {error}", resume)
+        return self.stats
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Accepts any POST as a batch of N-Triples/N-Quads; GET returns the number of stored lines.
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if server.fail_rate and random.random() < server.fail_rate:
+            self.reply(503, b"stand-in failure\n")
+            return
+        lines = [line for line in body.split(b"\n") if line.strip()]
+        with server.lock:
+            server.statements.update(lines)
+            server.received += len(lines)
+            server.requests += 1
+        self.reply(204)
+
+    def do_GET(self):
+        with self.server.lock:
+            size = len(self.server.statements)
+        self.reply(200, f"{size}\n".encode("ascii"))
+
+    def reply(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def stand_in_server(port=0, fail_rate=0.0):
+    """A local endpoint keeping the distinct statements it receives in memory (for testing the loader).
+
+    received counts every stored line, so statements posted twice show up as received > len(statements)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    server.daemon_threads = True
+    server.fail_rate = fail_rate
+    server.statements = set()
+    server.requests = 0
+    server.received = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load generated triples into a Graph Store / RDF4J endpoint.")
+    parser.add_argument("files", nargs="*", help=".nt, .nq, .ttl or .rdfb files or .shards.json manifests to load, in order "
+                             "(text files may be compressed)")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    parser.add_argument("--graph", help="named graph IRI, sent as the Graph Store ?graph= parameter")
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_BYTES)
+    parser.add_argument("--batch-triples", type=int, default=BATCH_TRIPLES)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="parallel requests")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="retries per batch before giving up")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per request")
+    parser.add_argument("--user", help="USER:PASSWORD for basic authentication")
+    parser.add_argument("--start-batch", type=int, default=0, help="skip the batches before this one (resume)")
+    parser.add_argument("--stand-in", type=int, metavar="PORT",
+                        help="run a local stand-in endpoint on PORT instead of loading")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="share of stand-in requests answered with 503, to exercise retries")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.stand_in is not None:
+        server = stand_in_server(args.stand_in, args.fail_rate)
+        print(f"Stand-in endpoint on http://127.0.0.1:{server.server_address[1]}/ (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"\n{server.requests} batches, {server.received} statements ({len(server.statements)} distinct)")
+        return
+    if not args.files:
+        sys.exit("no files to load")
+
+    loader = GraphStoreLoader(args.endpoint, args.graph, args.concurrency, args.retries, args.timeout, args.user)
+    paths = [shard for path in args.files
+             for shard in (shard_files(path) if path.endswith(".shards.json") else [path])]
+    quads = [path for path in paths if source_name(path).endswith(".nq")]
+    if args.graph and quads:
+        sys.exit(f"--graph cannot be used with N-Quads files ({', '.join(quads)}): a Graph Store request takes "
+                 f"triples; load them on the statements endpoint without --graph, or use the .nt output")
+    sources = ((read_lines(path), CONTENT_TYPES["nq" if source_name(path).endswith(".nq") else "nt"])
+               for path in paths)
+    start = time.perf_counter()
+    try:
+        stats = loader.load(sources, args.batch_bytes, args.batch_triples, args.start_batch)
+    except LoadError as error:
+        sys.exit(f"Load failed: {error}\nResume with --start-batch {error.resume_batch}")
+    seconds = time.perf_counter() - start
+    print(f"Loaded {stats['triples']} triples in {stats['batches']} batches ({stats['bytes'] / 1e6:.1f} MB, "
+          f"{stats['retries']} retries) in {seconds:.1f}s ({stats['triples'] / max(seconds, 1e-9):.0f} triples/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Delta output for incremental uploader runs.
+
+An uploader run with --incremental still writes its full output, but it also
+tracks a content hash per entity (every subject it emitted; see
+rdf_emitter.EntitySpool).  write_deltas() compares those hashes with the
+manifest of the previous run and writes only what changed:
+
+  <stem>.delta-delete.ru   SPARQL Update removing changed and removed entities
+  <stem>.delta-insert.ttl  Turtle with the current triples of added and changed entities
+
+Applying the delete file and then loading the insert file brings a store that
+holds the previous output up to date.  The manifest is an SQLite file next to
+the output and is replaced only after both delta files are written.
+"""
+import os
+import sqlite3
+
+from rdf_emitter import PREFIXES, TripleEmitter, spool_path
+
+DELETE_BATCH = 1000
+
+
+def manifest_path(output_path):
+    return os.path.splitext(output_path)[0] + ".manifest.sqlite"
+
+
+def delta_paths(output_path):
+    stem = os.path.splitext(output_path)[0]
+    return stem + ".delta-insert.ttl", stem + ".delta-delete.ru"
+
+
+def _write_manifest(path, entity_hashes):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entity (subject TEXT PRIMARY KEY, hash INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO entity VALUES (?, ?)", entity_hashes.items())
+    conn.commit()
+    return conn
+
+
+def _write_delete_file(path, subjects, prefixes):
+    with open(path, "w", encoding="utf-8") as out:
+        out.write("".join(f"PREFIX {name}: <{iri}>\n" for name, iri in prefixes.items()))
+        for start in range(0, len(subjects), DELETE_BATCH):
+            batch = " ".join(subjects[start:start + DELETE_BATCH])
+            out.write(f"\nDELETE {{ ?s ?p ?o }} WHERE {{ VALUES ?s {{ {batch} }} ?s ?p ?o }} ;\n")
+
+
+def _write_insert_file(path, subjects, spool, prefixes):
+    wanted = set(subjects)
+    with TripleEmitter(path, prefixes=prefixes) as out, open(spool, encoding="utf-8") as lines:
+        for line in lines:
+            subject, predicate, obj = line.rstrip("\n").split("\t", 2)
+            if subject in wanted:
+                # obj is already a rendered Turtle term, which the Turtle serializer passes through.
+                out.add(subject, predicate, obj)
+        return out.triple_count
+
+
+def write_deltas(output_path, entity_hashes, prefixes=PREFIXES):
+    """Writes the delta files for this run and replaces the manifest.
+
+    Returns (entities inserted or changed, entities deleted or changed), or None on the
+    first run, when there is no previous manifest to compare with.
+    """
+    manifest = manifest_path(output_path)
+    spool = spool_path(output_path)
+    new_manifest = manifest + ".new"
+    conn = _write_manifest(new_manifest, entity_hashes)
+    try:
+        if not os.path.exists(manifest):
+            result = None
+        else:
+            conn.execute("ATTACH DATABASE ? AS previous", (manifest,))
+            upserts = [row[0] for row in conn.execute(
+                "SELECT n.subject FROM entity n LEFT JOIN previous.entity o ON o.subject = n.subject "
+                "WHERE o.hash IS NULL OR o.hash != n.hash")]
+            deletes = [row[0] for row in conn.execute(
+                "SELECT o.subject FROM previous.entity o LEFT JOIN entity n ON n.subject = o.subject "
+                "WHERE n.hash IS NULL OR n.hash != o.hash")]
+            conn.execute("DETACH DATABASE previous")
+            insert_path, delete_path = delta_paths(output_path)
+            _write_delete_file(delete_path, deletes, prefixes)
+            _write_insert_file(insert_path, upserts, spool, prefixes)
+            result = len(upserts), len(deletes)
+    finally:
+        conn.close()
+    os.replace(new_manifest, manifest)
+    os.remove(spool)
+    return result
+
+
+def report(output_path, result):
+    if result is None:
+        print(f"Manifest created in '{manifest_path(output_path)}'; the next --incremental run writes deltas.")
+    else:
+        insert_path, delete_path = delta_paths(output_path)
+        print(f"Delta: {result[0]} entities to insert ('{insert_path}'), {result[1]} to delete ('{delete_path}').")
@@ -0,0 +1,178 @@
+"""Stage timers, counters and the run report of the uploaders.
+
+    run_report = RunReport("amazon")
+    run_report.enable(progress_seconds=10, profile="amazon.prof", trace_memory=True)
+    with run_report.stage("load books"):
+        ...
+    run_report.skip("title not in books_data.csv")
+    run_report.progress(rows)
+    run_report.finish("amazon.report.json")
+
+Stage times are exclusive: the formatting and writing a TripleEmitter does
+inside a stage are moved out of it by record_emitter, so the stages add up to
+the run time.  Skipped rows are counted per reason, everything else (rows,
+triples, unmapped IDs) with count().  The report is a JSON file; finish also
+prints the stage table to stderr.
+
+The optional profile is a cProfile dump of the whole run (read it with pstats
+or snakeviz); trace_memory runs tracemalloc, which records the peak traced
+memory of every stage and the largest allocation sites but slows the run
+down several times.  Neither sees worker processes; their stage times are
+merged into the report as "worker ..." stages (CPU seconds summed over the
+workers).
+"""
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROGRESS_SECONDS = 10
+TOP_ENTRIES = 15
+
+
+def add_report_arguments(parser):
+    parser.add_argument("--report", help="write a JSON run report (stage times, skipped rows, counters) to this file")
+    parser.add_argument("--progress", type=float, default=PROGRESS_SECONDS, metavar="SECONDS",
+                        help="print progress to stderr every SECONDS seconds (0 = never)")
+    parser.add_argument("--profile", metavar="FILE", help="profile the run with cProfile and dump the stats to FILE")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="record the peak traced memory per stage and the top allocation sites (slow)")
+
+
+class RunReport:
+    def __init__(self, name=""):
+        self.name = name
+        self.stages = {}
+        self.skipped = {}
+        self.counters = {}
+        self.progress_seconds = 0
+        self.trace_memory = False
+        self._started = time.perf_counter()
+        self._next_progress = None
+        self._profile_path = None
+        self._profiler = None
+
+    def enable(self, progress_seconds=0, profile=None, trace_memory=False):
+        self.progress_seconds = progress_seconds
+        if progress_seconds:
+            self._next_progress = time.perf_counter() + progress_seconds
+        if profile:
+            self._profile_path = profile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if trace_memory:
+            self.trace_memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def _entry(self, name):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {"seconds": 0.0, "calls": 0}
+        return entry
+
+    @contextmanager
+    def stage(self, name):
+        entry = self._entry(name)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                entry["peak_traced_bytes"] = max(entry.get("peak_traced_bytes", 0), peak)
+
+    def add_time(self, name, seconds, within=None, calls=1):
+        entry = self._entry(name)
+        entry["seconds"] += seconds
+        entry["calls"] += calls
+        if within is not None:
+            self._entry(within)["seconds"] -= seconds
+
+    def record_emitter(self, emitter, within):
+        # Moves the emitter's formatting and writing time out of the stage that fed it.
+        for name, seconds in emitter.timings.items():
+            self.add_time(name, seconds, within)
+
+    def skip(self, reason, count=1):
+        self.skipped[reason] = self.skipped.get(reason, 0) + count
+
+    def count(self, name, count=1):
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def progress(self, rows, unit="rows"):
+        # Cheap enough to call for every row; prints at most once per progress_seconds.
+        if self._next_progress is None:
+            return
+        now = time.perf_counter()
+        if now < self._next_progress:
+            return
+        self._next_progress = now + self.progress_seconds
+        elapsed = now - self._started
+        print(f"[{self.name}] {rows} {unit} after {elapsed:.0f}s ({rows / elapsed:.0f} {unit}/s)",
+              file=sys.stderr, flush=True)
+
+    def to_dict(self):
+        return {"stages": self.stages, "skipped": self.skipped, "counters": self.counters}
+
+    def merge(self, data, prefix="worker "):
+        # Adds a report of another process (see to_dict); its stages get the prefix.
+        for name, entry in data["stages"].items():
+            self.add_time(prefix + name, entry["seconds"], calls=entry["calls"])
+        for reason, count in data["skipped"].items():
+            self.skip(reason, count)
+        for name, count in data["counters"].items():
+            self.count(name, count)
+
+    def finish(self, path=None):
+        seconds = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self._profile_path)
+        data = {
+            "name": self.name,
+            "seconds": round(seconds, 3),
+            "stages": {name: dict(entry, seconds=round(entry["seconds"], 3)) for name, entry in self.stages.items()},
+            "skipped": self.skipped,
+            "counters": self.counters,
+        }
+        for name in ("rows", "triples"):
+            if self.counters.get(name) and seconds:
+                data[f"{name}_per_second"] = round(self.counters[name] / seconds, 1)
+        if self._profiler is not None:
+            data["profile"] = {"path": self._profile_path, "top": self._top_functions()}
+        if self.trace_memory:
+            data["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            data["top_allocations"] = [
+                {"site": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                for stat in tracemalloc.take_snapshot().statistics("lineno")[:TOP_ENTRIES]
+            ]
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            self.print_summary(data, path)
+        return data
+
+    def _top_functions(self):
+        stats = pstats.Stats(self._profiler)
+        rows = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                         "own_seconds": round(own, 3), "cumulative_seconds": round(cumulative, 3)})
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        return rows[:TOP_ENTRIES]
+
+    def print_summary(self, data, path):
+        total = data["seconds"] or 1
+        print(f"[{self.name}] {data['seconds']:.2f}s, report written to '{path}'", file=sys.stderr)
+        for name, entry in sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            print(f"  {name:<28} {entry['seconds']:>9.3f}s {100 * entry['seconds'] / total:>5.1f}%", file=sys.stderr)
+        for reason, count in sorted(data["skipped"].items()):
+            print(f"  skipped: {reason}: {count}", file=sys.stderr)
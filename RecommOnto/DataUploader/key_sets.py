@@ -0,0 +1,232 @@
+"""Compact "already written?" sets and lookup tables for large uploads.
+
+The uploaders remember every entity they have written (books, genres,
+reviewers, actors, ...) so it is written once.  A Python set of the key
+strings costs about 100 bytes per key and grows with the input.  The stores
+here keep the memory predictable (--dedup-store):
+
+  exact    a plain set, as before
+  hashed   HashedKeySet: 64-bit blake2b hashes of the keys in an open-addressing
+           array, 16-32 bytes per key.  Two keys with the same hash are taken
+           for one, which for n keys happens with probability about n^2 / 2^65
+           (3e-6 for ten million keys)
+  disk     VerifiedKeySet: a Bloom filter in memory (about 10 bits per key) in
+           front of the exact keys in a temporary SQLite file, which is only read
+           when the filter reports a possible hit.  Exact, at the cost of a disk
+           lookup for every repeated key
+
+HashedKeyMap is the lookup-table counterpart: key hashes in one array and a
+slot per key pointing into the list of distinct values, so a table of
+millions of titles with a few hundred categories needs about 24-48 bytes per
+title.  Keys are strings or tuples of strings.
+"""
+import hashlib
+import sqlite3
+from array import array
+
+DEDUP_STORES = ("exact", "hashed", "disk")
+# Tables are doubled once they are this full, so probe sequences stay short.
+MAX_LOAD = 0.5
+INITIAL_SLOTS = 1 << 10
+
+
+def key_bytes(key):
+    return ("\x1f".join(key) if isinstance(key, tuple) else key).encode("utf-8")
+
+
+def key_hash(key):
+    # 0 marks an empty slot, so it is never a hash.
+    value = int.from_bytes(hashlib.blake2b(key_bytes(key), digest_size=8).digest(), "little")
+    return value or 1
+
+
+class HashedKeySet:
+    def __init__(self, slots=INITIAL_SLOTS):
+        self._table = array("Q", bytes(8 * slots))
+        self._mask = slots - 1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._table.itemsize * len(self._table)
+
+    def _slot(self, value):
+        # Linear probing: the slot holding value, or the empty slot where it would go.
+        table = self._table
+        mask = self._mask
+        index = value & mask
+        while True:
+            current = table[index]
+            if current == value or current == 0:
+                return index
+            index = (index + 1) & mask
+
+    def __contains__(self, key):
+        return self._table[self._slot(key_hash(key))] != 0
+
+    def add(self, key):
+        self._insert(key_hash(key))
+
+    def _insert(self, value):
+        index = self._slot(value)
+        if self._table[index]:
+            return index
+        self._table[index] = value
+        self._count += 1
+        if self._count > len(self._table) * MAX_LOAD:
+            self._grow()
+            return self._slot(value)
+        return index
+
+    def _grow(self):
+        old = self._table
+        self._table = array("Q", bytes(16 * len(old)))
+        self._mask = len(self._table) - 1
+        for value in old:
+            if value:
+                self._table[self._slot(value)] = value
+
+
+class HashedKeyMap(HashedKeySet):
+    def __init__(self, slots=INITIAL_SLOTS):
+        super().__init__(slots)
+        self._slots = array("I", bytes(4 * slots))
+        self.values = []
+        self._codes = {}
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self._slots.itemsize * len(self._slots)
+
+    def __setitem__(self, key, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        # _insert can grow the arrays, so the slot index comes first
+        index = self._insert(key_hash(key))
+        self._slots[index] = code
+
+    def get(self, key, default=None):
+        index = self._slot(key_hash(key))
+        if not self._table[index]:
+            return default
+        return self.values[self._slots[index]]
+
+    def __getitem__(self, key):
+        index = self._slot(key_hash(key))
+        if not self._table[index]:
+            raise KeyError(key)
+        return self.values[self._slots[index]]
+
+    def _grow(self):
+        old_table, old_slots = self._table, self._slots
+        self._table = array("Q", bytes(16 * len(old_table)))
+        self._slots = array("I", bytes(8 * len(old_table)))
+        self._mask = len(self._table) - 1
+        for value, code in zip(old_table, old_slots):
+            if value:
+                index = self._slot(value)
+                self._table[index] = value
+                self._slots[index] = code
+
+
+class BloomFilter:
+    # Grows by adding filters of twice the capacity, each with about 1% false positives.
+    HASHES = 7
+    BITS_PER_KEY = 10
+
+    def __init__(self, capacity=1 << 16):
+        self._layers = []
+        self._capacity = capacity
+        self._count = 0
+        self._add_layer()
+
+    def _add_layer(self):
+        bits = max(64, self._capacity * self.BITS_PER_KEY)
+        self._layers.append((bytearray((bits + 7) // 8), bits, self._capacity))
+        self._count = 0
+
+    @property
+    def nbytes(self):
+        return sum(len(bits) for bits, _, _ in self._layers)
+
+    def _positions(self, key, size):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % size for i in range(self.HASHES)]
+
+    def __contains__(self, key):
+        for bits, size, _ in self._layers:
+            if all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key, size)):
+                return True
+        return False
+
+    def add(self, key):
+        bits, size, capacity = self._layers[-1]
+        if self._count >= capacity:
+            self._capacity *= 2
+            self._add_layer()
+            bits, size, capacity = self._layers[-1]
+        for p in self._positions(key, size):
+            bits[p >> 3] |= 1 << (p & 7)
+        self._count += 1
+
+
+class VerifiedKeySet:
+    # The keys live in a private temporary SQLite database (deleted when the connection
+    # is closed), whose page cache bounds the memory it uses.
+    def __init__(self):
+        self._filter = BloomFilter()
+        self._db = sqlite3.connect("")
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE keys (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._filter.nbytes
+
+    def __contains__(self, key):
+        data = key_bytes(key)
+        if data not in self._filter:
+            return False
+        return self._db.execute("SELECT 1 FROM keys WHERE key = ?", (data,)).fetchone() is not None
+
+    def add(self, key):
+        data = key_bytes(key)
+        if data in self._filter and self._db.execute("SELECT 1 FROM keys WHERE key = ?", (data,)).fetchone():
+            return
+        self._filter.add(data)
+        self._db.execute("INSERT INTO keys VALUES (?)", (data,))
+        self._count += 1
+
+    def close(self):
+        self._db.close()
+
+
+def new_key_set(store="exact"):
+    if store == "hashed":
+        return HashedKeySet()
+    if store == "disk":
+        return VerifiedKeySet()
+    return set()
+
+
+def new_key_map(store="exact"):
+    # Lookup tables have no disk mode: the hashed map is already a few bytes per key.
+    return {} if store == "exact" else HashedKeyMap()
+
+
+def add_dedup_arguments(parser):
+    parser.add_argument("--dedup-store", choices=DEDUP_STORES, default="exact",
+                        help="how written entities are remembered: exact sets, 64-bit hashes (hashed) "
+                             "or a Bloom filter over a temporary SQLite file (disk)")
@@ -0,0 +1,94 @@
+"""Compiled lookup tables for the LDOS-CoMoDa mapping files.
+
+A mapping file has one ID, label and DBpedia URI per line, tab-separated with
+a fallback to splitting on the first two spaces.  Each line becomes a
+MappingEntry that already holds what the uploader needs per row: the local IRI
+built by sanitize_name and the escaped label literal.  The table is pickled
+next to the mapping file (<file>.cache) and reused as long as the file's size
+and mtime match, or failing that its content hash.
+"""
+import hashlib
+import io
+import os
+import pickle
+from collections import namedtuple
+
+from rdf_emitter import escape_literal, sanitize_name
+
+CACHE_VERSION = 1
+
+MappingEntry = namedtuple("MappingEntry", ["label", "uri", "iri", "literal"])
+
+
+def cache_path(path):
+    return path + ".cache"
+
+
+def parse_mapping(lines, resplit_long=True):
+    # Returns ({id: MappingEntry}, number of malformed lines).  With resplit_long=False only
+    # lines with fewer than three tab fields fall back to spaces (the film file's rule).
+    entries = {}
+    malformed = 0
+    for line in lines:
+        parts = line.strip().split("\t")
+        if len(parts) < 3 or (resplit_long and len(parts) != 3):
+            parts = line.strip().split(" ", 2)
+        if len(parts) == 3:
+            key, label, uri = (part.strip() for part in parts)
+            entries[key] = MappingEntry(label, uri, f":{sanitize_name(label)}", escape_literal(label))
+        elif line.strip():
+            malformed += 1
+    return entries, malformed
+
+
+def _read_cache(path):
+    try:
+        with open(path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(path, cached):
+    # Written to a temporary file first so a concurrent reader never sees half a cache.
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except OSError:
+        # A read-only checkout still works, it just parses the file every time.
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load_mapping(path, resplit_long=True):
+    """Returns ({id: MappingEntry}, number of malformed lines) for a mapping file."""
+    stat = os.stat(path)
+    fingerprint = (stat.st_size, stat.st_mtime_ns)
+    cached = _read_cache(cache_path(path))
+    if cached is not None and cached["resplit_long"] != resplit_long:
+        cached = None
+    if cached is not None and cached["fingerprint"] == fingerprint:
+        return cached["entries"], cached["malformed"]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.blake2b(data).hexdigest()
+    if cached is not None and cached["digest"] == digest:
+        entries, malformed = cached["entries"], cached["malformed"]
+    else:
+        # Same line splitting as iterating over the file in text mode.
+        entries, malformed = parse_mapping(io.StringIO(data.decode("utf-8"), newline=None), resplit_long)
+    _write_cache(cache_path(path), {
+        "version": CACHE_VERSION,
+        "resplit_long": resplit_long,
+        "fingerprint": fingerprint,
+        "digest": digest,
+        "entries": entries,
+        "malformed": malformed,
+    })
+    return entries, malformed
@@ -0,0 +1,823 @@
+"""In-memory triple store and the SPARQL subset used by the queries in ../Queries.
+
+The CSV files in ../QueryResults were produced with GraphDB.  This module loads
+the uploader outputs (Turtle as written by rdf_emitter, N-Triples, N-Quads or
+.rdfb) into integer-encoded SPO/POS/OSP indexes and runs the queries without a
+server:
+
+    python query_engine.py            regenerate every ../QueryResults/<query>_results.csv
+    python query_engine.py --check    compare against the stored CSVs instead (exit code 1 on differences)
+
+Supported SPARQL: PREFIX, SELECT [DISTINCT] with variables and (COUNT|SUM|AVG|MIN|MAX
+(...) AS ?x), basic graph patterns (with ';', ',', 'a' and '/' property paths),
+FILTER with comparisons, &&, ||, !, IN, STR, LCASE, UCASE, CONTAINS, STRSTARTS,
+REGEX, BOUND, GROUP BY, ORDER BY [ASC|DESC], LIMIT and OFFSET.  Patterns are
+joined in the order given by the index statistics, with each FILTER applied as
+soon as its variables are bound.
+"""
+import argparse
+import csv
+import glob
+import operator
+import os
+import re
+import struct
+import sys
+from collections import Counter
+
+from compressed_io import open_input
+from rdf_emitter import unescape_literal
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RDF_TYPE_TERM = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+STRING_SUFFIX = f'"^^<{XSD}string>'
+NUMERIC_TYPES = {
+    f"{XSD}integer": int, f"{XSD}int": int, f"{XSD}long": int, f"{XSD}short": int,
+    f"{XSD}nonNegativeInteger": int, f"{XSD}positiveInteger": int,
+    f"{XSD}decimal": float, f"{XSD}float": float, f"{XSD}double": float,
+}
+# Numeric type promotion for aggregates: integer < decimal < float < double.
+NUMERIC_RANK = {f"{XSD}decimal": 1, f"{XSD}float": 2, f"{XSD}double": 3}
+RANK_TYPES = {0: f"{XSD}integer", 1: f"{XSD}decimal", 2: f"{XSD}float", 3: f"{XSD}double"}
+
+QUERY_DIR = os.path.join("..", "Queries")
+RESULTS_DIR = os.path.join("..", "QueryResults")
+DATA_FILES = ["output_LDOS-CoMoDa.ttl", "amazon_books.ttl", "pitchfork_album_reviews.ttl"]
+
+TOKEN = re.compile(r'''
+    (?P<space>\s+|\#[^\n]*)
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<long>"""(?:[^"\\]|\\.|"(?!""))*""")
+  | (?P<literal>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<lang>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<var>[?$]\w+)
+  | (?P<number>[+-]?(?:\d+\.\d+|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<pname>(?:[A-Za-z][\w-]*)?:(?:[\w%-]|\.(?=[\w%-]))*)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<op>\^\^|&&|\|\||!=|<=|>=|[.;,{}()=<>!*/+\[\]-])
+''', re.X)
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"unexpected character {text[pos]!r} at offset {pos}")
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append((kind, match.group()))
+        pos = match.end()
+    tokens.append(("eof", ""))
+    return tokens
+
+
+class Iri(str):
+    """An IRI value inside FILTER expressions (plain str values are literals)."""
+
+
+def literal_parts(term):
+    # Splits an N-Triples literal into (escaped lexical form, datatype IRI or None, language or None).
+    end = term.rfind('"')
+    suffix = term[end + 1:]
+    if suffix.startswith("^^<"):
+        return term[1:end], suffix[3:-1], None
+    if suffix.startswith("@"):
+        return term[1:end], None, suffix[1:]
+    return term[1:end], None, None
+
+
+def term_value(term):
+    if term is None:
+        return None
+    if term.startswith("<"):
+        return Iri(term[1:-1])
+    lexical, datatype, _ = literal_parts(term)
+    cast = NUMERIC_TYPES.get(datatype)
+    if cast is not None:
+        try:
+            return cast(lexical)
+        except ValueError:
+            pass
+    if datatype == f"{XSD}boolean":
+        return lexical == "true"
+    return unescape_literal(lexical)
+
+
+def csv_value(term):
+    if term is None:
+        return ""
+    if term.startswith("<"):
+        return term[1:-1]
+    return unescape_literal(literal_parts(term)[0])
+
+
+def canonical_literal(lexical, datatype=None, lang=None):
+    if lang:
+        return f'"{lexical}"@{lang}'
+    if datatype and datatype != f"{XSD}string":
+        return f'"{lexical}"^^<{datatype}>'
+    return f'"{lexical}"'
+
+
+def format_number(value, datatype):
+    if datatype == f"{XSD}integer":
+        return str(int(value))
+    if datatype == f"{XSD}float":
+        # Print the shortest form that survives a round trip through single precision, like GraphDB.
+        single = struct.unpack("f", struct.pack("f", value))[0]
+        for digits in range(1, 10):
+            candidate = float(f"{single:.{digits}g}")
+            if struct.unpack("f", struct.pack("f", candidate))[0] == single:
+                return repr(candidate)
+    return repr(float(value))
+
+
+class TermReader:
+    """Reads Turtle and N-Triples/N-Quads token streams into N-Triples term strings."""
+
+    def __init__(self, tokens, prefixes=None):
+        self.tokens = tokens
+        self.pos = 0
+        self.prefixes = {} if prefixes is None else prefixes
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        kind, text = self.next()
+        if text != value and not (kind == "word" and text.upper() == value):
+            raise ValueError(f"expected {value!r}, found {text!r}")
+
+    def iri(self, kind, text):
+        if kind == "iri":
+            return text
+        if kind == "pname":
+            prefix, _, local = text.partition(":")
+            if prefix not in self.prefixes:
+                raise ValueError(f"unknown prefix {prefix!r}")
+            return f"<{self.prefixes[prefix]}{local}>"
+        if kind == "word" and text == "a":
+            return RDF_TYPE_TERM
+        raise ValueError(f"expected an IRI, found {text!r}")
+
+    def term(self):
+        kind, text = self.next()
+        if kind in ("literal", "long"):
+            quote = 3 if kind == "long" else 1
+            lexical = text[quote:-quote]
+            if text[0] == "'":
+                lexical = lexical.replace('"', '\\"')
+            if self.peek()[0] == "lang":
+                return canonical_literal(lexical, lang=self.next()[1][1:])
+            if self.peek()[1] == "^^":
+                self.next()
+                return canonical_literal(lexical, self.iri(*self.next())[1:-1])
+            return canonical_literal(lexical)
+        if kind == "number":
+            if "e" in text or "E" in text:
+                datatype = "double"
+            else:
+                datatype = "decimal" if "." in text else "integer"
+            return canonical_literal(text, XSD + datatype)
+        if kind == "word" and text in ("true", "false"):
+            return canonical_literal(text, XSD + "boolean")
+        if text == "[" or text.startswith("_:"):
+            raise ValueError("blank nodes are not supported")
+        return self.iri(kind, text)
+
+
+def parse_turtle(text, prefixes=None):
+    """Yields (subject, predicate, object) N-Triples terms from Turtle, N-Triples or N-Quads."""
+    reader = TermReader(tokenize(text), prefixes)
+    while reader.peek()[0] != "eof":
+        kind, text = reader.peek()
+        if text in ("@prefix", "@base") or (kind == "word" and text.upper() in ("PREFIX", "BASE")):
+            reader.next()
+            if text.lstrip("@").upper() == "BASE":
+                raise ValueError("@base is not supported")
+            name = reader.next()[1]
+            reader.prefixes[name[:-1]] = reader.next()[1][1:-1]
+            if text.startswith("@"):
+                reader.expect(".")
+            continue
+        subject = reader.term()
+        while True:
+            predicate = reader.term()
+            while True:
+                yield subject, predicate, reader.term()
+                if reader.peek()[1] != ",":
+                    break
+                reader.next()
+            if reader.peek()[0] == "iri":
+                reader.next()  # the graph of an N-Quads line
+            if reader.peek()[1] != ";":
+                break
+            while reader.peek()[1] == ";":
+                reader.next()
+            if reader.peek()[1] == ".":
+                break
+        reader.expect(".")
+
+
+def iter_turtle(lines, prefixes=None, chunk_lines=10000):
+    """Like parse_turtle, but reads the text from an iterable of lines a few statements at a time.
+
+    The lines are parsed in chunks ending at a blank line (the uploaders separate
+    subjects with one) or after chunk_lines lines ending with "."; a chunk that
+    stops inside a statement fails to parse and is extended to the next such
+    line, so memory follows the largest statement instead of the file.
+    """
+    prefixes = {} if prefixes is None else prefixes
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        stripped = line.strip()
+        if stripped and not (stripped.endswith(".") and len(chunk) >= chunk_lines):
+            continue
+        try:
+            triples = list(parse_turtle("".join(chunk), prefixes))
+        except ValueError:
+            continue
+        yield from triples
+        chunk = []
+    if chunk:
+        yield from parse_turtle("".join(chunk), prefixes)
+
+
+class TripleStore:
+    """Integer-encoded triples with SPO, POS and OSP indexes (nested dicts of sets)."""
+
+    def __init__(self):
+        self._ids = {}
+        self.terms = []
+        self.spo = {}
+        self.pos = {}
+        self.osp = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def term_id(self, term):
+        return self._ids.get(term)
+
+    def _intern(self, term):
+        if term.endswith(STRING_SUFFIX):
+            term = term[:-len(STRING_SUFFIX) + 1]
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = self._ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def add(self, subject, predicate, obj):
+        s, p, o = self._intern(subject), self._intern(predicate), self._intern(obj)
+        objects = self.spo.setdefault(s, {}).setdefault(p, set())
+        if o in objects:
+            return
+        objects.add(o)
+        self.pos.setdefault(p, {}).setdefault(o, set()).add(s)
+        self.osp.setdefault(o, {}).setdefault(s, set()).add(p)
+        self.size += 1
+
+    def load(self, path):
+        before = self.size
+        if path.endswith(".rdfb"):
+            import graph_binary
+            with graph_binary.BinaryGraph(path) as graph:
+                terms = graph.decode(range(graph.term_count))
+                for s, p, o in zip(*(column.tolist() for column in graph.triples())):
+                    self.add(terms[s], terms[p], terms[o])
+        else:
+            with open_input(path) as f:
+                for triple in iter_turtle(f):
+                    self.add(*triple)
+        return self.size - before
+
+    def count(self, s=None, p=None, o=None):
+        if s is not None:
+            predicates = self.spo.get(s, {})
+            if p is not None:
+                objects = predicates.get(p, ())
+                return (1 if o in objects else 0) if o is not None else len(objects)
+            if o is not None:
+                return len(self.osp.get(o, {}).get(s, ()))
+            return sum(len(objects) for objects in predicates.values())
+        if p is not None:
+            subjects = self.pos.get(p, {})
+            if o is not None:
+                return len(subjects.get(o, ()))
+            return sum(len(x) for x in subjects.values())
+        if o is not None:
+            return sum(len(x) for x in self.osp.get(o, {}).values())
+        return self.size
+
+    def distinct(self, position, p=None):
+        # Number of distinct subjects or objects, overall or for one predicate (join estimates).
+        if position == "p":
+            return max(len(self.pos), 1)
+        if p is None:
+            return max(len(self.spo if position == "s" else self.osp), 1)
+        if position == "o":
+            return max(len(self.pos.get(p, ())), 1)
+        return max(len({s for subjects in self.pos.get(p, {}).values() for s in subjects}), 1)
+
+    def match(self, s=None, p=None, o=None):
+        if s is not None:
+            predicates = self.spo.get(s, {})
+            for pi in ((p,) if p is not None else predicates):
+                for oi in predicates.get(pi, ()):
+                    if o is None or oi == o:
+                        yield s, pi, oi
+        elif p is not None:
+            objects = self.pos.get(p, {})
+            for oi in ((o,) if o is not None else objects):
+                for si in objects.get(oi, ()):
+                    yield si, p, oi
+        elif o is not None:
+            for si, predicates in self.osp.get(o, {}).items():
+                for pi in predicates:
+                    yield si, pi, o
+        else:
+            for si, predicates in self.spo.items():
+                for pi, objects in predicates.items():
+                    for oi in objects:
+                        yield si, pi, oi
+
+
+class Query:
+    def __init__(self):
+        self.distinct = False
+        self.projection = []   # (name, None) for variables, (name, (function, distinct, argument)) for aggregates
+        self.patterns = []     # (s, p, o) with ("var", name) or ("term", N-Triples term)
+        self.filters = []
+        self.group_by = []
+        self.order_by = []     # (variable, descending)
+        self.limit = None
+        self.offset = 0
+
+
+AGGREGATES = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+COMPARISONS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt,
+               "<=": operator.le, ">=": operator.ge}
+
+
+class QueryParser(TermReader):
+    def __init__(self, text):
+        super().__init__(tokenize(text))
+        self._fresh = 0
+
+    def keyword(self, *words):
+        kind, text = self.peek()
+        return kind == "word" and text.upper() in words
+
+    def parse(self):
+        query = Query()
+        while self.keyword("PREFIX"):
+            self.next()
+            name = self.next()[1]
+            self.prefixes[name[:-1]] = self.next()[1][1:-1]
+        self.expect("SELECT")
+        if self.keyword("DISTINCT"):
+            self.next()
+            query.distinct = True
+        while self.peek()[1] != "{" and not self.keyword("WHERE"):
+            kind, text = self.next()
+            if kind == "var":
+                query.projection.append((text[1:], None))
+            elif text == "(":
+                function = self.next()[1].upper()
+                if function not in AGGREGATES:
+                    raise ValueError(f"unsupported aggregate {function}")
+                self.expect("(")
+                distinct = self.keyword("DISTINCT")
+                if distinct:
+                    self.next()
+                argument = None if self.peek()[1] == "*" else self.next()[1][1:]
+                if argument is None:
+                    self.next()
+                self.expect(")")
+                self.expect("AS")
+                name = self.next()[1][1:]
+                self.expect(")")
+                query.projection.append((name, (function, distinct, argument)))
+            else:
+                raise ValueError(f"unsupported SELECT item {text!r}")
+        if self.keyword("WHERE"):
+            self.next()
+        self.expect("{")
+        while self.peek()[1] != "}":
+            if self.keyword("FILTER"):
+                self.next()
+                query.filters.append(self.expression())
+            else:
+                self.triples(query.patterns)
+            if self.peek()[1] == ".":
+                self.next()
+        self.expect("}")
+        while self.peek()[0] != "eof":
+            if self.keyword("GROUP"):
+                self.next()
+                self.expect("BY")
+                while self.peek()[0] == "var":
+                    query.group_by.append(self.next()[1][1:])
+            elif self.keyword("ORDER"):
+                self.next()
+                self.expect("BY")
+                while self.peek()[0] == "var" or self.keyword("ASC", "DESC"):
+                    if self.peek()[0] == "var":
+                        query.order_by.append((self.next()[1][1:], False))
+                    else:
+                        descending = self.next()[1].upper() == "DESC"
+                        self.expect("(")
+                        query.order_by.append((self.next()[1][1:], descending))
+                        self.expect(")")
+            elif self.keyword("LIMIT"):
+                self.next()
+                query.limit = int(self.next()[1])
+            elif self.keyword("OFFSET"):
+                self.next()
+                query.offset = int(self.next()[1])
+            else:
+                raise ValueError(f"unsupported query clause {self.peek()[1]!r}")
+        return query
+
+    def node(self):
+        if self.peek()[0] == "var":
+            return "var", self.next()[1][1:]
+        return "term", self.term()
+
+    def triples(self, patterns):
+        subject = self.node()
+        while True:
+            path = [self.node()]
+            while self.peek()[1] == "/":
+                self.next()
+                path.append(self.node())
+            while True:
+                obj = self.node()
+                # A sequence path becomes a chain of patterns through fresh variables.
+                current = subject
+                for step, predicate in enumerate(path):
+                    if step == len(path) - 1:
+                        target = obj
+                    else:
+                        self._fresh += 1
+                        target = ("var", f" path{self._fresh}")
+                    patterns.append((current, predicate, target))
+                    current = target
+                if self.peek()[1] != ",":
+                    break
+                self.next()
+            if self.peek()[1] != ";":
+                return
+            self.next()
+            if self.peek()[1] in (".", "}"):
+                return
+
+    # Expressions: or -> and -> comparison -> unary -> primary.
+    def expression(self):
+        left = self.conjunction()
+        while self.peek()[1] == "||":
+            self.next()
+            left = ("or", left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.comparison()
+        while self.peek()[1] == "&&":
+            self.next()
+            left = ("and", left, self.comparison())
+        return left
+
+    def comparison(self):
+        left = self.unary()
+        text = self.peek()[1]
+        if text in COMPARISONS:
+            self.next()
+            return ("compare", COMPARISONS[text], left, self.unary())
+        negate = self.keyword("NOT")
+        if negate:
+            self.next()
+        if self.keyword("IN"):
+            self.next()
+            return ("in", negate, left, self.arguments())
+        if negate:
+            raise ValueError("expected IN after NOT")
+        return left
+
+    def unary(self):
+        if self.peek()[1] == "!":
+            self.next()
+            return ("not", self.unary())
+        return self.primary()
+
+    def arguments(self):
+        self.expect("(")
+        arguments = []
+        while self.peek()[1] != ")":
+            arguments.append(self.expression())
+            if self.peek()[1] == ",":
+                self.next()
+        self.expect(")")
+        return arguments
+
+    def primary(self):
+        kind, text = self.peek()
+        if text == "(":
+            self.next()
+            inner = self.expression()
+            self.expect(")")
+            return inner
+        if kind == "var":
+            self.next()
+            return ("var", text[1:])
+        if kind == "word" and text.upper() in FUNCTIONS:
+            self.next()
+            return ("call", text.upper(), self.arguments())
+        return ("const", term_value(self.term()))
+
+
+def _regex(text, pattern, flags=""):
+    return re.search(pattern, text, re.IGNORECASE if "i" in flags else 0) is not None
+
+
+FUNCTIONS = {
+    "STR": lambda value: str(value),
+    "LCASE": lambda value: value.lower(),
+    "UCASE": lambda value: value.upper(),
+    "CONTAINS": lambda text, part: part in text,
+    "STRSTARTS": lambda text, part: text.startswith(part),
+    "REGEX": _regex,
+    "BOUND": lambda value: value is not None,
+}
+
+
+def expression_variables(expression):
+    if expression[0] == "var":
+        return {expression[1]}
+    found = set()
+    for part in expression[1:]:
+        if isinstance(part, tuple):
+            found |= expression_variables(part)
+        elif isinstance(part, list):
+            for item in part:
+                found |= expression_variables(item)
+    return found
+
+
+class QueryEngine:
+    def __init__(self, store):
+        self.store = store
+
+    def evaluate(self, expression, row):
+        kind = expression[0]
+        if kind == "var":
+            term_id = row.get(expression[1])
+            return None if term_id is None else term_value(self.store.terms[term_id])
+        if kind == "const":
+            return expression[1]
+        if kind == "and":
+            return self.evaluate(expression[1], row) and self.evaluate(expression[2], row)
+        if kind == "or":
+            return self.evaluate(expression[1], row) or self.evaluate(expression[2], row)
+        if kind == "not":
+            return not self.evaluate(expression[1], row)
+        if kind == "compare":
+            left, right = self.evaluate(expression[2], row), self.evaluate(expression[3], row)
+            if left is None or right is None:
+                return False
+            return expression[1](left, right)
+        if kind == "in":
+            value = self.evaluate(expression[2], row)
+            found = any(value == self.evaluate(item, row) for item in expression[3])
+            return found != expression[1]
+        if kind == "call":
+            arguments = [self.evaluate(argument, row) for argument in expression[2]]
+            if expression[1] != "BOUND" and any(argument is None for argument in arguments):
+                return None
+            return FUNCTIONS[expression[1]](*arguments)
+        raise ValueError(f"unknown expression {kind}")
+
+    def passes(self, expression, row):
+        # Evaluation errors (type mismatches and the like) make a FILTER false, as in SPARQL.
+        try:
+            return bool(self.evaluate(expression, row))
+        except (TypeError, ValueError, AttributeError, re.error):
+            return False
+
+    def _estimate(self, pattern, bound):
+        store = self.store
+        constants = []
+        for kind, value in pattern:
+            if kind == "term":
+                term_id = store.term_id(value)
+                if term_id is None:
+                    return 0
+                constants.append(term_id)
+            else:
+                constants.append(None)
+        estimate = store.count(*constants)
+        predicate = constants[1]
+        for position, (kind, value) in zip("spo", pattern):
+            if kind == "var" and value in bound:
+                estimate /= store.distinct(position, predicate)
+        return estimate
+
+    def solve(self, patterns, filters):
+        store = self.store
+        remaining = list(patterns)
+        pending = [(expression, expression_variables(expression)) for expression in filters]
+        rows = [{}]
+        bound = set()
+        while remaining and rows:
+            # Prefer patterns connected to what is already bound, then the smallest estimate.
+            def cost(pattern):
+                variables = {value for kind, value in pattern if kind == "var"}
+                connected = not bound or bool(variables & bound) or not variables
+                return not connected, self._estimate(pattern, bound)
+            pattern = min(remaining, key=cost)
+            remaining.remove(pattern)
+            constants = []
+            for kind, value in pattern:
+                constants.append(store.term_id(value) if kind == "term" else None)
+            if any(kind == "term" and term_id is None for (kind, _), term_id in zip(pattern, constants)):
+                return []
+            names = [value if kind == "var" else None for kind, value in pattern]
+            extended = []
+            for row in rows:
+                query = [row.get(name, constant) if name else constant for name, constant in zip(names, constants)]
+                for triple in store.match(*query):
+                    new = dict(row)
+                    for name, term_id in zip(names, triple):
+                        if name is None:
+                            continue
+                        if new.setdefault(name, term_id) != term_id:
+                            # The same variable twice in one pattern, e.g. ?x :p ?x.
+                            break
+                    else:
+                        extended.append(new)
+            rows = extended
+            bound |= {name for name in names if name}
+            ready = [item for item in pending if item[1] <= bound]
+            pending = [item for item in pending if not item[1] <= bound]
+            for expression, _ in ready:
+                rows = [row for row in rows if self.passes(expression, row)]
+        for expression, _ in pending:
+            rows = [row for row in rows if self.passes(expression, row)]
+        return rows
+
+    def aggregate(self, function, distinct, argument, rows):
+        terms = self.store.terms
+        if argument is None:
+            values = [None] * len(rows)
+        else:
+            values = [row[argument] for row in rows if argument in row]
+        if distinct:
+            values = list(dict.fromkeys(values))
+        if function == "COUNT":
+            return canonical_literal(str(len(values)), f"{XSD}integer")
+        if not values:
+            return canonical_literal("0", f"{XSD}integer") if function in ("SUM", "AVG") else None
+        if function in ("MIN", "MAX"):
+            pick = min if function == "MIN" else max
+            return terms[pick(values, key=lambda term_id: sort_key(terms[term_id]))]
+        numbers = []
+        rank = 0
+        for term_id in values:
+            lexical, datatype, _ = literal_parts(terms[term_id])
+            if datatype not in NUMERIC_TYPES:
+                return None
+            numbers.append(NUMERIC_TYPES[datatype](lexical))
+            rank = max(rank, NUMERIC_RANK.get(datatype, 0))
+        total = sum(numbers)
+        if function == "AVG":
+            total /= len(numbers)
+            rank = max(rank, 1)
+        datatype = RANK_TYPES[rank]
+        return canonical_literal(format_number(total, datatype), datatype)
+
+    def run(self, query):
+        rows = self.solve(query.patterns, query.filters)
+        names = [name for name, _ in query.projection]
+        aggregates = any(spec for _, spec in query.projection)
+        terms = self.store.terms
+        if aggregates or query.group_by:
+            groups = {}
+            for row in rows:
+                groups.setdefault(tuple(row.get(name) for name in query.group_by), []).append(row)
+            if not groups and not query.group_by:
+                groups[()] = []
+            results = []
+            for key, members in groups.items():
+                values = dict(zip(query.group_by, key))
+                result = []
+                for name, spec in query.projection:
+                    if spec is None:
+                        if name not in values:
+                            raise ValueError(f"?{name} is neither grouped nor aggregated")
+                        term_id = values[name]
+                        result.append(None if term_id is None else terms[term_id])
+                    else:
+                        result.append(self.aggregate(*spec, members))
+                results.append(result)
+        else:
+            results = [[None if row.get(name) is None else terms[row[name]] for name in names] for row in rows]
+        if query.distinct:
+            results = [list(row) for row in dict.fromkeys(tuple(row) for row in results)]
+        for name, descending in reversed(query.order_by):
+            index = names.index(name)
+            results.sort(key=lambda row: sort_key(row[index]), reverse=descending)
+        end = None if query.limit is None else query.offset + query.limit
+        return names, results[query.offset:end]
+
+
+def sort_key(term):
+    # Unbound < IRIs < numbers < other literals, following the SPARQL ORDER BY ranking.
+    if term is None:
+        return (0, 0, "")
+    if term.startswith("<"):
+        return (1, 0, term)
+    value = term_value(term)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (2, value, "")
+    return (3, 0, str(value))
+
+
+def query_files(query_dir):
+    return sorted(glob.glob(os.path.join(query_dir, "*.rq")))
+
+
+def results_path(results_dir, query_file):
+    return os.path.join(results_dir, os.path.splitext(os.path.basename(query_file))[0] + "_results.csv")
+
+
+def write_results(path, names, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(names)
+        writer.writerows([csv_value(term) for term in row] for row in rows)
+
+
+def compare_results(path, names, rows):
+    # Row order is only fixed up to ties, so the stored file is compared as a multiset of rows.
+    with open(path, newline="", encoding="utf-8") as f:
+        expected = list(csv.reader(f))
+    found = [names] + [[csv_value(term) for term in row] for row in rows]
+    if not expected or expected[0] != names:
+        return f"header {expected[:1]} != {names}"
+    missing = Counter(map(tuple, expected[1:])) - Counter(map(tuple, found[1:]))
+    extra = Counter(map(tuple, found[1:])) - Counter(map(tuple, expected[1:]))
+    if missing or extra:
+        return f"{sum(missing.values())} rows missing, {sum(extra.values())} unexpected"
+    return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the published SPARQL queries without GraphDB.")
+    parser.add_argument("--data", nargs="+", default=DATA_FILES,
+                        help="uploader outputs to load (.ttl, .nt, .nq or .rdfb); the text files may be compressed "
+                             "(.gz, .bz2, .xz, .zst, .zip)")
+    parser.add_argument("--queries", default=QUERY_DIR, help="directory with the .rq files")
+    parser.add_argument("--results", default=RESULTS_DIR, help="directory with the <query>_results.csv files")
+    parser.add_argument("--check", action="store_true",
+                        help="compare with the stored results instead of overwriting them")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    missing = [path for path in args.data if not os.path.exists(path)]
+    if missing:
+        sys.exit(f"missing data files: {', '.join(missing)} (run the uploaders first or pass --data)")
+
+    store = TripleStore()
+    for path in args.data:
+        print(f"Loaded {store.load(path)} triples from '{path}'")
+    engine = QueryEngine(store)
+
+    failures = 0
+    for query_file in query_files(args.queries):
+        with open(query_file, encoding="utf-8") as f:
+            names, rows = engine.run(QueryParser(f.read()).parse())
+        path = results_path(args.results, query_file)
+        if args.check:
+            problem = compare_results(path, names, rows) if os.path.exists(path) else "no stored results"
+            failures += problem is not None
+            print(f"{os.path.basename(query_file)}: {problem or 'OK'}")
+        else:
+            write_results(path, names, rows)
+            print(f"{os.path.basename(query_file)}: {len(rows)} rows written to '{path}'")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
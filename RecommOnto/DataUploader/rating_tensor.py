@@ -0,0 +1,160 @@
+"""User x item rating tensors collected in the same pass as the graph (--tensor).
+
+Every rating the uploader turns into triples is also appended here as
+(user, item, value) plus integer-coded context columns.  The users and items
+are the IRIs the graph uses for the rater and the rated item, and a context
+column is named after the predicate of the value (":hasUsersMood").  The
+arrays are written as plain .npy files, so a training job can np.load them
+with mmap_mode="r" (see load_tensor):
+
+  <stem>.tensor/coo_user.npy, coo_item.npy, coo_value.npy
+        one entry per input rating, in input order (repeated ratings of the
+        same item by the same user stay separate entries)
+  <stem>.tensor/csr_indptr.npy, csr_indices.npy, csr_data.npy, csr_order.npy
+        the same entries sorted by user and item; csr_order maps them back
+        to the COO positions, which the context columns follow
+  <stem>.tensor/user_iris.npy, item_iris.npy
+        full IRI of every row and column index
+  <stem>.tensor/item_labels.npy
+        display label of every column index, when the uploader sets them
+  <stem>.tensor/context_<name>.npy, context_<name>_labels.npy
+        code per entry and the full IRI of every code
+  <stem>.tensor/ratings_coo.npz
+        scipy.sparse COO matrix, only when scipy is installed
+  <stem>.tensor/meta.json
+
+Columns seeded with labels keep those codes, so the LDOS-CoMoDa columns use
+the numbers of its CSV (mood 1 = Positive) and 0 for Unknown.
+"""
+import json
+import os
+from array import array
+
+from rdf_emitter import PREFIXES, expand_iri
+
+
+def tensor_dir(output_path):
+    return os.path.splitext(output_path)[0] + ".tensor"
+
+
+class RatingTensor:
+    def __init__(self, columns=()):
+        # columns are the context column names, or {name: [label of code 0, code 1, ...]}
+        # to fix the codes in advance.  Every add() has to pass all of them.
+        self.user_ids = {}
+        self.item_ids = {}
+        self.users = array("l")
+        self.items = array("l")
+        self.values = array("d")
+        # {item: display label}, e.g. movie titles; optional.
+        self.item_labels = {}
+        seeds = columns if isinstance(columns, dict) else {name: () for name in columns}
+        self.codes = {name: {label: code for code, label in enumerate(labels)} for name, labels in seeds.items()}
+        self.contexts = {name: array("l") for name in seeds}
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def _id(ids, key):
+        index = ids.get(key)
+        if index is None:
+            index = ids[key] = len(ids)
+        return index
+
+    def add(self, user, item, value, context=()):
+        self.users.append(self._id(self.user_ids, user))
+        self.items.append(self._id(self.item_ids, item))
+        self.values.append(value)
+        for name, label in context:
+            self.contexts[name].append(self._id(self.codes[name], label))
+
+    def extend(self, users, items, values):
+        for user, item, value in zip(users, items, values):
+            self.add(user, item, value)
+
+    def merge(self, other):
+        # Appends the entries of another tensor (e.g. from a worker), re-coding its IDs.
+        user_map = [self._id(self.user_ids, user) for user in other.user_ids]
+        item_map = [self._id(self.item_ids, item) for item in other.item_ids]
+        self.users.extend(user_map[i] for i in other.users)
+        self.items.extend(item_map[i] for i in other.items)
+        self.values.extend(other.values)
+        self.item_labels.update(other.item_labels)
+        for name, codes in other.codes.items():
+            code_map = [self._id(self.codes[name], label) for label in codes]
+            self.contexts[name].extend(code_map[c] for c in other.contexts[name])
+
+    def to_arrays(self):
+        """Returns (meta, {array name: array}) as write() stores them."""
+        import numpy as np
+
+        shape = (len(self.user_ids), len(self.item_ids))
+        users = np.array(self.users, dtype=np.int32)
+        items = np.array(self.items, dtype=np.int32)
+        values = np.array(self.values, dtype=np.float32)
+        order = np.lexsort((items, users))
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(users, minlength=shape[0]), out=indptr[1:])
+
+        def iris(terms):
+            return np.array([expand_iri(term, PREFIXES) for term in terms], dtype=str)
+
+        arrays = {
+            "coo_user": users,
+            "coo_item": items,
+            "coo_value": values,
+            "csr_indptr": indptr,
+            "csr_indices": items[order],
+            "csr_data": values[order],
+            "csr_order": order,
+            "user_iris": iris(self.user_ids),
+            "item_iris": iris(self.item_ids),
+        }
+        if self.item_labels:
+            arrays["item_labels"] = np.array([self.item_labels.get(item, "") for item in self.item_ids], dtype=str)
+        columns = {}
+        for name, codes in self.codes.items():
+            column = name.lstrip(":")
+            dtype = np.int8 if len(codes) <= 127 else np.int16 if len(codes) <= 32767 else np.int32
+            arrays[f"context_{column}"] = np.array(self.contexts[name], dtype=dtype)
+            arrays[f"context_{column}_labels"] = iris(codes)
+            columns[column] = {"predicate": expand_iri(name, PREFIXES), "codes": len(codes)}
+        meta = {"shape": shape, "entries": len(values), "contexts": columns, "arrays": sorted(arrays)}
+        return meta, arrays
+
+    def write(self, output_path):
+        import numpy as np
+
+        directory = tensor_dir(output_path)
+        os.makedirs(directory, exist_ok=True)
+        meta, arrays = self.to_arrays()
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, name + ".npy"), values)
+
+        try:
+            import scipy.sparse
+        except ImportError:
+            pass
+        else:
+            matrix = scipy.sparse.coo_matrix((arrays["coo_value"], (arrays["coo_user"], arrays["coo_item"])),
+                                             shape=meta["shape"])
+            scipy.sparse.save_npz(os.path.join(directory, "ratings_coo.npz"), matrix)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return directory
+
+
+def load_tensor(directory, mmap_mode="r"):
+    """Returns (meta, {array name: array}) with the arrays memory-mapped by default."""
+    import numpy as np
+
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta, {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+                  for name in meta["arrays"]}
+
+
+def report_tensor(output_path, tensor):
+    print(f"Tensor: {len(tensor)} ratings, {len(tensor.user_ids)} users x {len(tensor.item_ids)} items "
+          f"in '{tensor_dir(output_path)}'.")
@@ -0,0 +1,735 @@
+"""Shared triple emission for the DataUploader scripts.
+
+Uploaders hand structured (subject, predicate, object) records to a
+TripleEmitter, which groups them by subject and writes them in a few large
+chunks instead of one small write() per triple block.  The same record stream
+can be written as Turtle, RDF/XML, N-Triples, N-Quads and the binary .rdfb
+format (see graph_binary) in one pass.
+
+With shard_bytes the outputs are split into self-contained shards
+(<stem>.shard0000.ttl, ...), each with its own header, that can be parsed and
+loaded in parallel.  New subjects go to the open shard until the estimated
+size of its largest text file reaches shard_bytes; it is then closed and the
+next new subject starts a new one.  The bound is approximate, since a shard
+can pass it by the subjects of one slice (SHARD_SLICE).  All triples of a
+subject stay in one shard: a key_sets.HashedKeyMap (about 24 bytes per
+subject) remembers where each subject went, and triples of a subject whose
+shard was already closed are appended to that shard, which can then grow past
+shard_bytes (the Amazon users, for example, get a rating link with every
+review).  Footers (and the binary graphs) are written when the emitter closes,
+so appending only reopens the files; compressed shards get another member or
+frame.
+<stem>.shards.json lists the shards with their files, triple and subject
+counts, and sizes.
+
+checkpoint() flushes the outputs to disk and returns their sizes, the triple
+count and the entity hashes.  An emitter created later with resume=<that state>
+truncates the files back to those sizes and appends, so a run interrupted
+after a checkpoint can continue from it.  Only plain text outputs can be
+resumed: binary graphs are written at close, and compressed or sharded files
+cannot be cut back.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from array import array
+from collections import namedtuple
+from itertools import repeat
+from time import perf_counter
+
+from compressed_io import Compression, compressed_path, open_output
+from key_sets import HashedKeyMap
+
+BASE_IRI = "http://www.semanticweb.org/emili/ontologies/2025/3/recommendations/"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDF_TYPE = RDF_NS + "type"
+
+PREFIXES = {
+    "": BASE_IRI,
+    "rdf": RDF_NS,
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "schema": "http://schema.org/",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+}
+
+# Subjects and predicates are Turtle terms (":Book_x", "rdfs:label", "a",
+# "<http://...>"); objects are either such terms or a Literal.  Literal values
+# are expected to be escaped already (see escape_literal).
+Literal = namedtuple("Literal", ["value", "datatype"], defaults=[None])
+
+DEFAULT_BUFFER_TRIPLES = 200000
+SHARD_SLICE = 1000
+WRITE_BUFFER_BYTES = 1 << 20
+
+# Shared with the vectorized (pandas .str) code paths, so both apply the same rules.
+NON_WORD = re.compile(r'\W|^(?=\d)')
+LITERAL_REPLACEMENTS = (('\\', '\\\\'), ('\n', ' '), ('\r', ' '), ('"', '\\"'), ('^', ''))
+_escaped_char = re.compile(r"\\(.)")
+
+
+def escape_literal(value):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        return str(value)
+    for old, new in LITERAL_REPLACEMENTS:
+        value = value.replace(old, new)
+    return value.strip()
+
+
+def sanitize_identifier(text, lower=True):
+    if not text:
+        return "unknown"
+    text = text.strip()
+    return NON_WORD.sub('_', text.lower() if lower else text)
+
+
+def sanitize_name(name):
+    # LDOS-CoMoDa actor/director local names; kept separate so existing IRIs stay stable.
+    return name.strip().replace(" ", "_").replace(".", "").replace(",", "").replace("-", "").replace("'", "").replace("/", "")
+
+
+def prefix_header(prefixes=PREFIXES):
+    lines = [f"@prefix {name}: <{iri}> ." for name, iri in prefixes.items()]
+    return "\n".join(lines) + "\n\n"
+
+
+def literal_column(values, datatype=None):
+    return [Literal(value, datatype) for value in values]
+
+
+def turtle_term(term):
+    if term.__class__ is str:
+        return term
+    if term.datatype:
+        return f'"{term.value}"^^{term.datatype}'
+    return f'"{term.value}"'
+
+
+def turtle_block(subject, pairs):
+    parts = [subject]
+    last = None
+    for predicate, obj in pairs:
+        if predicate == last:
+            parts.append(", ")
+        else:
+            parts.append(" ;\n    " if last is not None else " ")
+            parts.append(predicate)
+            parts.append(" ")
+            last = predicate
+        parts.append(obj if obj.__class__ is str else turtle_term(obj))
+    parts.append(" .\n\n")
+    return "".join(parts)
+
+
+def expand_iri(term, prefixes):
+    if term == "a":
+        return RDF_TYPE
+    if term.startswith("<"):
+        return term[1:-1]
+    prefix, _, local = term.partition(":")
+    return prefixes[prefix] + local
+
+
+def unescape_literal(value):
+    # Literal values are stored Turtle-escaped; RDF/XML needs the raw text back.
+    if "\\" not in value:
+        return value
+    return _escaped_char.sub(r"\1", value)
+
+
+def xml_escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+class TurtleSerializer:
+    extension = ".ttl"
+
+    def __init__(self, prefixes):
+        self.prefixes = prefixes
+
+    def header(self):
+        return prefix_header(self.prefixes)
+
+    def render(self, blocks):
+        return "".join([turtle_block(s, pairs) for s, pairs in blocks.items()])
+
+    def footer(self):
+        return ""
+
+
+class NTriplesSerializer:
+    extension = ".nt"
+
+    def __init__(self, prefixes, graph=None):
+        self.prefixes = prefixes
+        self._terms = {}
+        self._end = f" <{graph}> .\n" if graph else " .\n"
+
+    def term(self, term):
+        if term.__class__ is not str:
+            if term.datatype:
+                return f'"{term.value}"^^<{self.iri(term.datatype)}>'
+            return f'"{term.value}"'
+        return f"<{self.iri(term)}>"
+
+    def iri(self, term):
+        # Predicates, classes and datatypes repeat constantly; subjects mostly do not.
+        iri = self._terms.get(term)
+        if iri is None:
+            iri = expand_iri(term, self.prefixes)
+            if len(self._terms) < 4096:
+                self._terms[term] = iri
+        return iri
+
+    def header(self):
+        return ""
+
+    def render(self, blocks):
+        end = self._end
+        term = self.term
+        lines = []
+        for subject, pairs in blocks.items():
+            s = f"<{expand_iri(subject, self.prefixes)}> "
+            for predicate, obj in pairs:
+                lines.append(f"{s}<{self.iri(predicate)}> {term(obj)}{end}")
+        return "".join(lines)
+
+    def footer(self):
+        return ""
+
+
+class NQuadsSerializer(NTriplesSerializer):
+    extension = ".nq"
+
+
+class RdfXmlSerializer:
+    extension = ".rdf"
+
+    def __init__(self, prefixes):
+        self.prefixes = prefixes
+        self._namespaces = {iri: name for name, iri in prefixes.items()}
+        self._elements = {}
+
+    def element(self, predicate):
+        element = self._elements.get(predicate)
+        if element is None:
+            iri = expand_iri(predicate, self.prefixes)
+            split = max(iri.rfind("#"), iri.rfind("/")) + 1
+            namespace, local = iri[:split], iri[split:]
+            name = self._namespaces.get(namespace)
+            if name is None:
+                element = (f"ns0:{local}", f' xmlns:ns0="{xml_escape(namespace)}"')
+            else:
+                element = (f"{name}:{local}" if name else local, "")
+            self._elements[predicate] = element
+        return element
+
+    def header(self):
+        namespaces = "".join(
+            f'\n    xmlns{":" + name if name else ""}="{xml_escape(iri)}"' for name, iri in self.prefixes.items())
+        if "rdf" not in self.prefixes:
+            namespaces += f'\n    xmlns:rdf="{RDF_NS}"'
+        return f'<?xml version="1.0" encoding="utf-8"?>\n<rdf:RDF{namespaces}>\n'
+
+    def render(self, blocks):
+        prefixes = self.prefixes
+        parts = []
+        for subject, pairs in blocks.items():
+            parts.append(f'  <rdf:Description rdf:about="{xml_escape(expand_iri(subject, prefixes))}">\n')
+            for predicate, obj in pairs:
+                name, xmlns = self.element(predicate)
+                if obj.__class__ is str:
+                    parts.append(f'    <{name}{xmlns} rdf:resource="{xml_escape(expand_iri(obj, prefixes))}"/>\n')
+                else:
+                    datatype = f' rdf:datatype="{xml_escape(expand_iri(obj.datatype, prefixes))}"' if obj.datatype else ""
+                    parts.append(f"    <{name}{xmlns}{datatype}>{xml_escape(unescape_literal(obj.value))}</{name}>\n")
+            parts.append("  </rdf:Description>\n")
+        return "".join(parts)
+
+    def footer(self):
+        return "</rdf:RDF>\n"
+
+
+class BinaryGraphSerializer:
+    # Collects dictionary-encoded triples and writes the .rdfb file when the emitter closes
+    # (the triples have to be sorted first).  A fragment (header=False) is written as
+    # "subject<TAB>predicate<TAB>object" lines of N-Triples terms instead, which the emitter
+    # reading it back with append_fragment feeds into its own dictionary.
+    extension = ".rdfb"
+    binary = True
+
+    def __init__(self, prefixes, fragment=False):
+        self.fragment = fragment
+        self._nt = NTriplesSerializer(prefixes)
+        self._ids = {}
+        self._terms = []
+        self._subjects = array("I")
+        self._predicates = array("I")
+        self._objects = array("I")
+
+    def _id(self, term):
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = self._ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+    def header(self):
+        return "" if self.fragment else b""
+
+    def render(self, blocks):
+        nt_term = self._nt.term
+        prefixes = self._nt.prefixes
+        if self.fragment:
+            lines = []
+            for subject, pairs in blocks.items():
+                s = f"<{expand_iri(subject, prefixes)}>\t"
+                lines.extend(f"{s}{nt_term(predicate)}\t{nt_term(obj)}\n" for predicate, obj in pairs)
+            return "".join(lines)
+        term_id = self._id
+        for subject, pairs in blocks.items():
+            s = term_id(f"<{expand_iri(subject, prefixes)}>")
+            for predicate, obj in pairs:
+                self._subjects.append(s)
+                self._predicates.append(term_id(nt_term(predicate)))
+                self._objects.append(term_id(nt_term(obj)))
+        return b""
+
+    def load_fragment(self, lines):
+        term_id = self._id
+        for line in lines:
+            subject, predicate, obj = line.rstrip("\n").split("\t", 2)
+            self._subjects.append(term_id(subject))
+            self._predicates.append(term_id(predicate))
+            self._objects.append(term_id(obj))
+
+    def footer(self):
+        return "" if self.fragment else b""
+
+    def write_graph(self, out):
+        # numpy is only needed for this format, so it is not imported with the module.
+        import graph_binary
+        return graph_binary.write_graph(out, self._terms, self._subjects, self._predicates, self._objects)
+
+
+class EntitySpool:
+    # Used for incremental runs: keeps an order-independent content hash per subject (a sum
+    # of per-triple hashes, so blocks split across flushes or workers still add up) and
+    # spools every triple as "subject<TAB>predicate<TAB>object" so changed entities can be
+    # written out again once the run is complete.
+    extension = ".spool"
+    HASH_MASK = (1 << 63) - 1
+
+    def __init__(self):
+        self.hashes = {}
+
+    def header(self):
+        return ""
+
+    def render(self, blocks):
+        hashes = self.hashes
+        blake2b = hashlib.blake2b
+        lines = []
+        for subject, pairs in blocks.items():
+            total = hashes.get(subject, 0)
+            for predicate, obj in pairs:
+                line = f"{subject}\t{predicate}\t{obj if obj.__class__ is str else turtle_term(obj)}\n"
+                lines.append(line)
+                total += int.from_bytes(blake2b(line.encode("utf-8"), digest_size=8).digest(), "little")
+            hashes[subject] = total & self.HASH_MASK
+        return "".join(lines)
+
+    def footer(self):
+        return ""
+
+    def merge(self, hashes):
+        own = self.hashes
+        for subject, value in hashes.items():
+            own[subject] = (own.get(subject, 0) + value) & self.HASH_MASK
+
+
+SERIALIZERS = {
+    "turtle": TurtleSerializer,
+    "xml": RdfXmlSerializer,
+    "nt": NTriplesSerializer,
+    "nq": NQuadsSerializer,
+    "binary": BinaryGraphSerializer,
+}
+
+
+def output_paths(path, formats=("turtle",)):
+    # path names the Turtle output; the other formats go next to it with their own extension.
+    stem = os.path.splitext(path)[0]
+    return {fmt: stem + SERIALIZERS[fmt].extension for fmt in formats}
+
+
+def shard_path(path, index):
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.shard{index:04d}{extension}"
+
+
+def shard_manifest_path(path):
+    return os.path.splitext(path)[0] + ".shards.json"
+
+
+def written_paths(path, formats=("turtle",), compression=Compression(), shard_bytes=None):
+    # The files a finished TripleEmitter leaves for the user: the manifest of a sharded
+    # graph, otherwise one file per format with the compression suffix of the text ones.
+    if shard_bytes:
+        return [shard_manifest_path(path)]
+    return [out_path if getattr(SERIALIZERS[fmt], "binary", False) else compressed_path(out_path, compression)
+            for fmt, out_path in output_paths(path, formats).items()]
+
+
+def shard_files(manifest_path, preference=("nq", "nt", "turtle", "xml", "binary")):
+    """Returns the shard files of one format from a .shards.json manifest, in shard order."""
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    fmt = next(fmt for fmt in preference if fmt in manifest["formats"])
+    directory = os.path.dirname(manifest_path)
+    return [os.path.join(directory, shard["files"][fmt]) for shard in manifest["shards"]]
+
+
+SIZE_UNITS = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+
+def parse_size(value):
+    # "64M" -> 67108864; plain numbers are bytes.
+    unit = SIZE_UNITS.get(value[-1:].lower())
+    return int(float(value[:-1]) * unit) if unit else int(value)
+
+
+def spool_path(path):
+    return os.path.splitext(path)[0] + EntitySpool.extension
+
+
+def default_graph_iri(path):
+    return f"{BASE_IRI}graph/{os.path.splitext(os.path.basename(path))[0]}"
+
+
+def parse_formats(value):
+    formats = [fmt.strip() for fmt in value.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in SERIALIZERS]
+    if unknown:
+        raise ValueError(f"unknown output format(s): {', '.join(unknown)} (choose from {', '.join(SERIALIZERS)})")
+    return formats
+
+
+class TripleEmitter:
+    def __init__(self, path, prefixes=PREFIXES, buffer_triples=DEFAULT_BUFFER_TRIPLES,
+                 formats=("turtle",), header=True, graph=None, track_entities=False, compression=Compression(),
+                 shard_bytes=None, resume=None):
+        self.path = path
+        self.formats = tuple(formats)
+        self.buffer_triples = buffer_triples
+        self.triple_count = 0
+        # Seconds spent rendering triples and writing them out (see instrumentation.RunReport).
+        self.timings = {"format": 0.0, "write": 0.0}
+        self._blocks = {}
+        self._pending = 0
+        self._prefixes = prefixes
+        self._graph = graph or default_graph_iri(path)
+        self._compression = compression
+        # header=False writes headerless fragments, to be appended to a full output later.
+        self._header = header
+        self._shard_bytes = shard_bytes if header else None
+        # manifest entries of the finished shards
+        self._shards = []
+        self._closed = False
+        # state from checkpoint(); the files are reopened at the sizes it holds
+        self._resume = resume
+        if resume is not None and (shard_bytes or compression.method or "binary" in self.formats or not header):
+            raise ValueError("only plain text outputs can be resumed (no shards, compression or binary format)")
+        if self._shard_bytes:
+            # The shard of every subject, the outputs of the open shard (the last one in
+            # self._shards) and the bytes written to its largest text file.  Bytes not
+            # written yet are estimated with _per_triple.
+            self._shard_of = HashedKeyMap()
+            self._shard_serializers = []
+            self._shard_outputs = None
+            self._shard_written = 0
+            self._per_triple = 100
+            self._outputs = []
+        else:
+            self._outputs = self._open_outputs(path)
+        # track_entities adds the per-subject hashes and triple spool needed for delta output.
+        self._spool = None
+        self.entity_hashes = None
+        if track_entities:
+            self._spool = EntitySpool()
+            self.entity_hashes = self._spool.hashes
+            if resume is not None:
+                out = self._reopen(spool_path(path))
+            else:
+                out = open(spool_path(path), "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+                if header:
+                    out.write(self._spool.header())
+            self._outputs.append((self._spool, out, spool_path(path)))
+        if resume is not None:
+            self.triple_count = resume["triple_count"]
+            if track_entities:
+                self.entity_hashes.update(resume["entity_hashes"])
+
+    def _serializer(self, fmt):
+        if fmt == "nq":
+            return NQuadsSerializer(self._prefixes, self._graph)
+        if fmt == "binary":
+            return BinaryGraphSerializer(self._prefixes, fragment=not self._header)
+        return SERIALIZERS[fmt](self._prefixes)
+
+    def _open_outputs(self, path):
+        header = self._header
+        outputs = []
+        for fmt, out_path in output_paths(path, self.formats).items():
+            serializer = self._serializer(fmt)
+            if self._resume is not None:
+                outputs.append((serializer, self._reopen(out_path), out_path))
+                continue
+            if header and getattr(serializer, "binary", False):
+                out = open(out_path, "wb", buffering=WRITE_BUFFER_BYTES)
+            elif header:
+                # compression applies to the finished text outputs, not to fragments
+                out_path = compressed_path(out_path, self._compression)
+                out = open_output(out_path, "w", self._compression, buffering=WRITE_BUFFER_BYTES)
+            else:
+                out = open(out_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+            if header:
+                out.write(serializer.header())
+            outputs.append((serializer, out, out_path))
+        return outputs
+
+    def add(self, subject, predicate, obj):
+        block = self._blocks.get(subject)
+        if block is None:
+            self._blocks[subject] = [(predicate, obj)]
+        else:
+            block.append((predicate, obj))
+        self._pending += 1
+        self.triple_count += 1
+        if self._pending >= self.buffer_triples:
+            self.flush()
+
+    def extend(self, triples):
+        blocks = self._blocks
+        count = 0
+        for subject, predicate, obj in triples:
+            block = blocks.get(subject)
+            if block is None:
+                blocks[subject] = [(predicate, obj)]
+            else:
+                block.append((predicate, obj))
+            count += 1
+        self._pending += count
+        self.triple_count += count
+        if self._pending >= self.buffer_triples:
+            self.flush()
+
+    def extend_columns(self, subjects, columns):
+        # columns holds (predicate, objects) pairs; objects is either aligned with subjects
+        # or a single term shared by all of them.  None objects are skipped.
+        predicates = [predicate for predicate, _ in columns]
+        values = [repeat(objects) if isinstance(objects, (str, Literal)) else objects for _, objects in columns]
+        blocks = self._blocks
+        count = 0
+        for subject, *objects in zip(subjects, *values):
+            block = blocks.get(subject)
+            if block is None:
+                block = blocks[subject] = []
+            for predicate, obj in zip(predicates, objects):
+                if obj is not None:
+                    block.append((predicate, obj))
+                    count += 1
+        self._pending += count
+        self.triple_count += count
+        if self._pending >= self.buffer_triples:
+            self.flush()
+
+    def _reopen(self, path):
+        out = open(path, "r+", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+        out.seek(self._resume["sizes"][path])
+        out.truncate()
+        return out
+
+    def checkpoint(self):
+        """Writes out everything added so far and returns the state to pass as resume=."""
+        if self._shard_bytes or self._compression.method or "binary" in self.formats:
+            raise ValueError("only plain text outputs can be resumed (no shards, compression or binary format)")
+        self.flush()
+        sizes = {}
+        for _, out, path in self._outputs:
+            out.flush()
+            os.fsync(out.fileno())
+            sizes[path] = out.tell()
+        return {"sizes": sizes, "triple_count": self.triple_count, "entity_hashes": self.entity_hashes}
+
+    def _write(self, outputs, blocks):
+        # Returns the length of the longest text written (0 for binary outputs).
+        timings = self.timings
+        longest = 0
+        for serializer, out, _ in outputs:
+            start = perf_counter()
+            text = serializer.render(blocks)
+            rendered = perf_counter()
+            out.write(text)
+            timings["format"] += rendered - start
+            timings["write"] += perf_counter() - rendered
+            longest = max(longest, len(text))
+        return longest
+
+    def _write_shard(self, index, outputs, part, triples):
+        written = self._write(outputs, part)
+        self._shards[index]["triples"] += triples
+        if index == len(self._shards) - 1:
+            self._shard_written += written
+        if written:
+            self._per_triple = written / triples
+
+    def _open_shard(self):
+        index = len(self._shards)
+        self._shard_outputs = self._open_outputs(shard_path(self.path, index))
+        self._shard_serializers.append([(serializer, path) for serializer, _, path in self._shard_outputs])
+        self._shards.append({
+            "index": index,
+            "triples": 0,
+            "subjects": 0,
+            "files": {fmt: os.path.basename(path) for fmt, (_, _, path) in zip(self.formats, self._shard_outputs)},
+        })
+        self._shard_written = 0
+
+    def _close_shard(self):
+        # The footer is left for close(), since later triples may still be appended.
+        start = perf_counter()
+        for _, out, _ in self._shard_outputs:
+            out.close()
+        self.timings["write"] += perf_counter() - start
+        self._shard_outputs = None
+
+    def _append_outputs(self, index):
+        outputs = []
+        for serializer, path in self._shard_serializers[index]:
+            if getattr(serializer, "binary", False):
+                out = open(path, "ab", buffering=WRITE_BUFFER_BYTES)
+            else:
+                out = open_output(path, "a", self._compression, buffering=WRITE_BUFFER_BYTES)
+            outputs.append((serializer, out, path))
+        return outputs
+
+    def _flush_shards(self):
+        # New subjects are written to the open shard in parts of at most SHARD_SLICE subjects;
+        # the shard is closed before a new subject that would go past shard_bytes by the
+        # estimate.  Subjects already placed in a closed shard are appended to it.
+        shard_of = self._shard_of
+        part = {}
+        triples = 0
+        late = {}
+        for subject, pairs in self._blocks.items():
+            index = shard_of.get(subject)
+            if index is None:
+                if self._shard_outputs is not None and (
+                        self._shard_written + triples * self._per_triple >= self._shard_bytes):
+                    if part:
+                        self._write_shard(len(self._shards) - 1, self._shard_outputs, part, triples)
+                        part = {}
+                        triples = 0
+                    self._close_shard()
+                if self._shard_outputs is None:
+                    self._open_shard()
+                index = len(self._shards) - 1
+                shard_of[subject] = index
+                self._shards[index]["subjects"] += 1
+            elif self._shard_outputs is None or index != len(self._shards) - 1:
+                late.setdefault(index, {})[subject] = pairs
+                continue
+            part[subject] = pairs
+            triples += len(pairs)
+            if len(part) >= SHARD_SLICE:
+                self._write_shard(index, self._shard_outputs, part, triples)
+                part = {}
+                triples = 0
+        if part:
+            self._write_shard(len(self._shards) - 1, self._shard_outputs, part, triples)
+        for index, blocks in late.items():
+            outputs = self._append_outputs(index)
+            try:
+                self._write_shard(index, outputs, blocks, sum(len(pairs) for pairs in blocks.values()))
+            finally:
+                for _, out, _ in outputs:
+                    out.close()
+
+    def flush(self):
+        if not self._blocks:
+            return
+        if self._shard_bytes:
+            self._flush_shards()
+        self._write(self._outputs, self._blocks)
+        self._blocks = {}
+        self._pending = 0
+
+    def append_fragment(self, path, triple_count=0, entity_hashes=None):
+        # Copies headerless fragments written with the same formats (see header=False) into the
+        # outputs; entity_hashes comes from a fragment emitter created with track_entities.
+        if self._shard_bytes:
+            raise ValueError("fragments cannot be appended to sharded output")
+        self.flush()
+        stem = os.path.splitext(path)[0]
+        for serializer, out, _ in self._outputs:
+            start = perf_counter()
+            with open(stem + serializer.extension, "r", encoding="utf-8") as fragment:
+                if hasattr(serializer, "load_fragment"):
+                    serializer.load_fragment(fragment)
+                    self.timings["format"] += perf_counter() - start
+                else:
+                    shutil.copyfileobj(fragment, out, WRITE_BUFFER_BYTES)
+                    self.timings["write"] += perf_counter() - start
+        if self._spool is not None and entity_hashes:
+            self._spool.merge(entity_hashes)
+        self.triple_count += triple_count
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._close_outputs(self._outputs)
+        self._outputs = []
+        if self._shard_bytes:
+            if self._shard_outputs is not None:
+                self._close_shard()
+            self._finish_shards()
+            self._write_shard_manifest()
+
+    def _close_outputs(self, outputs):
+        for serializer, out, _ in outputs:
+            start = perf_counter()
+            if self._header:
+                if hasattr(serializer, "write_graph"):
+                    serializer.write_graph(out)
+                out.write(serializer.footer())
+            out.close()
+            self.timings["write"] += perf_counter() - start
+
+    def _finish_shards(self):
+        for index, shard in enumerate(self._shards):
+            if any(hasattr(serializer, "write_graph") or serializer.footer()
+                   for serializer, _ in self._shard_serializers[index]):
+                self._close_outputs(self._append_outputs(index))
+            shard["bytes"] = {fmt: os.path.getsize(path)
+                              for fmt, (_, path) in zip(self.formats, self._shard_serializers[index])}
+
+    def _write_shard_manifest(self):
+        manifest = {"output": os.path.basename(self.path), "shard_bytes": self._shard_bytes,
+                    "shard_bytes_approximate": True, "formats": list(self.formats),
+                    "triples": self.triple_count, "shards": self._shards}
+        with open(shard_manifest_path(self.path), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
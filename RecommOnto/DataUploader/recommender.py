@@ -0,0 +1,167 @@
+"""Contextual top-N movie recommendations from the LDOS-CoMoDa ratings, in process.
+
+    engine = ContextualRecommender.from_tensor("output_LDOS-CoMoDa.tensor")
+    engine.top_items({"hasAgeGroup": "Adult", "hasUsersMood": "Negative"}, n=10, min_support=2)
+
+The ratings and their context columns are the arrays the LDOS-CoMoDa uploader
+writes with --tensor, memory-mapped, or are read straight from the CSV with
+from_csv.  A context filter maps a column (hasAgeGroup, hasUsersMood,
+hasCompanion, hasLocation, hasDayOfWeek, ...) to one value or a list of values
+("Negative", ":Negative" or the full IRI).  Items are ranked by their mean
+rating over the matching ratings, ties by the number of ratings; items with
+fewer than min_support matching ratings are left out.
+
+Results are tuples of Recommendation and are cached (LRU) per normalized
+filter, so repeated questions cost a dictionary lookup.  Every input rating
+counts once.  This differs from the published SPARQL queries, where a user
+rating the same movie twice shares one rating and one context node.
+
+    python recommender.py --context hasAgeGroup=Adult --context hasUsersMood=Negative -n 5
+"""
+import argparse
+import os
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from rating_tensor import load_tensor
+from rdf_emitter import BASE_IRI
+
+CACHE_SIZE = 1024
+LDOS_SCRIPT = "DataUploader_LDOS-CoMoDa.py"
+
+Recommendation = namedtuple("Recommendation", ["item", "label", "mean", "count"])
+
+
+def _local_name(term):
+    if term.startswith(BASE_IRI):
+        return term[len(BASE_IRI):]
+    return term.lstrip(":")
+
+
+class ContextualRecommender:
+    def __init__(self, meta, arrays, cache_size=CACHE_SIZE):
+        self.item_count = meta["shape"][1]
+        self.items = np.asarray(arrays["coo_item"])
+        self.values = np.asarray(arrays["coo_value"], dtype=np.float64)
+        self.item_iris = arrays["item_iris"]
+        self.item_labels = arrays.get("item_labels")
+        self.columns = {}
+        self.codes = {}
+        for name in meta["contexts"]:
+            self.columns[name] = np.asarray(arrays[f"context_{name}"])
+            self.codes[name] = {_local_name(str(label)): code
+                                for code, label in enumerate(arrays[f"context_{name}_labels"])}
+        self._top = lru_cache(maxsize=cache_size)(self._compute)
+
+    @classmethod
+    def from_tensor(cls, directory, cache_size=CACHE_SIZE):
+        meta, arrays = load_tensor(directory)
+        return cls(meta, arrays, cache_size)
+
+    @classmethod
+    def from_csv(cls, csv_path="LDOS-CoMoDa.csv", cache_size=CACHE_SIZE):
+        # Uses the uploader's own maps and context extraction (run from this directory,
+        # the uploader loads mapping_files/ on import).
+        import csv
+        import importlib.util
+
+        from rating_tensor import RatingTensor
+
+        spec = importlib.util.spec_from_file_location("ldos_uploader", os.path.join(os.path.dirname(
+            os.path.abspath(__file__)), LDOS_SCRIPT))
+        uploader = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(uploader)
+        tensor = RatingTensor(uploader.tensor_columns())
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                tensor.add(f":User{row['userID']}", f":Movie{row['itemID']}", float(row['rating']),
+                           uploader.rating_context(row))
+        tensor.item_labels = uploader.tensor_item_labels(tensor.item_ids)
+        meta, arrays = tensor.to_arrays()
+        return cls(meta, arrays, cache_size)
+
+    def normalize(self, context):
+        """Returns the cache key of a context filter: ((column, (codes...)), ...) sorted."""
+        key = []
+        for column, values in (context or {}).items():
+            name = _local_name(column)
+            codes = self.codes.get(name)
+            if codes is None:
+                raise KeyError(f"unknown context column {column!r} (choose from {', '.join(self.columns)})")
+            if isinstance(values, str):
+                values = [values]
+            selected = set()
+            for value in values:
+                code = codes.get(_local_name(value))
+                if code is None:
+                    raise KeyError(f"unknown value {value!r} for {name} (choose from {', '.join(codes)})")
+                selected.add(code)
+            key.append((name, tuple(sorted(selected))))
+        return tuple(sorted(key))
+
+    def top_items(self, context=None, n=10, min_support=1):
+        return self._top(self.normalize(context), n, max(min_support, 1))
+
+    def cache_info(self):
+        return self._top.cache_info()
+
+    def clear_cache(self):
+        self._top.cache_clear()
+
+    def _compute(self, key, n, min_support):
+        mask = None
+        for name, codes in key:
+            column = self.columns[name]
+            match = column == codes[0] if len(codes) == 1 else np.isin(column, codes)
+            mask = match if mask is None else mask & match
+        items = self.items if mask is None else self.items[mask]
+        values = self.values if mask is None else self.values[mask]
+
+        counts = np.bincount(items, minlength=self.item_count)
+        sums = np.bincount(items, weights=values, minlength=self.item_count)
+        eligible = np.flatnonzero(counts >= min_support)
+        means = sums[eligible] / counts[eligible]
+        ranked = eligible[np.lexsort((eligible, -counts[eligible], -means))[:n]]
+        return tuple(
+            Recommendation(str(self.item_iris[i]), str(self.item_labels[i]) if self.item_labels is not None else None,
+                           float(sums[i] / counts[i]), int(counts[i]))
+            for i in ranked
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Top-N LDOS-CoMoDa movies for a context filter.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--tensor", help="directory written by the uploader's --tensor")
+    source.add_argument("--input", default="LDOS-CoMoDa.csv", help="LDOS-CoMoDa CSV (used without --tensor)")
+    parser.add_argument("--context", action="append", default=[], metavar="COLUMN=VALUE[,VALUE]",
+                        help="e.g. hasUsersMood=Negative or hasCompanion=Partner,Friends")
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--min-support", type=int, default=1, help="minimum number of matching ratings per movie")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    engine = ContextualRecommender.from_tensor(args.tensor) if args.tensor else ContextualRecommender.from_csv(args.input)
+    loaded = time.perf_counter()
+    context = {}
+    for item in args.context:
+        column, _, values = item.partition("=")
+        context[column] = values.split(",")
+    results = engine.top_items(context, args.n, args.min_support)
+    first = time.perf_counter()
+    engine.top_items(context, args.n, args.min_support)
+    cached = time.perf_counter()
+    for rank, result in enumerate(results, 1):
+        print(f"{rank:>3}. {result.mean:.3f} ({result.count} ratings)  {result.label or ''}  {result.item}")
+    print(f"Loaded in {1000 * (loaded - start):.1f} ms; query {1000 * (first - loaded):.2f} ms, "
+          f"cached {1000 * (cached - first):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""One-pass uniform and stratified sampling of ratings (--sample).
+
+RatingSampler keeps a reservoir (Algorithm R) per stratum while the input is
+read once, so a bounded subset can come from the whole file instead of its
+first rows.  With a single stratum it is a plain uniform sample of `size`
+items.  With several (per genre, per book), `size` is shared equally between
+the strata, and the share a small stratum cannot use is handed on to the
+larger ones (water-filling): a stratum with fewer items than the common share
+keeps all of them, every other one gets the same number of items, and the
+shares add up to `size`.  Fewer than `size` items are returned only when the
+input holds fewer.
+
+Memory stays at about 2 * size items: all reservoirs share one capacity, and
+when they hold twice `size` items together, the capacity is lowered to the
+water level that keeps about `size` of them and every reservoir is subsampled
+to it.  The capacity only ever drops, so each reservoir stays a uniform sample
+of its own items, and it never drops below the share items() gives out.  At
+most `size` strata are kept: beyond that, a uniform random subset of them
+stays (the ones with the smallest seeded hash, so a dropped stratum stays
+dropped) and each gives one item.
+
+The state is plain Python data and a random.Random, so a sampler pickles with
+an uploader checkpoint and continues where it stopped.  The same seed and
+input give the same sample.
+"""
+import hashlib
+import heapq
+import random
+
+
+def water_level(counts, budget):
+    # The smallest level with sum(min(count, level)) >= budget; counts must add up to at least budget.
+    remaining = budget
+    open_counts = len(counts)
+    for count in sorted(counts):
+        if count * open_counts >= remaining:
+            break
+        remaining -= count
+        open_counts -= 1
+    return -(-remaining // open_counts)
+
+
+class RatingSampler:
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.random = random.Random(seed)
+        self.salt = self.random.getrandbits(64).to_bytes(8, "little")
+        # {stratum: [items seen, [(position, item), ...]]}
+        self.reservoirs = {}
+        # (-priority, stratum) of the kept strata, so the one with the highest priority is dropped first
+        self.priorities = []
+        self.capacity = size
+        self.kept = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.kept
+
+    def _priority(self, stratum):
+        digest = hashlib.blake2b(repr(stratum).encode("utf-8"), digest_size=8, key=self.salt).digest()
+        return int.from_bytes(digest, "little")
+
+    def _new_stratum(self, stratum):
+        # Returns the new reservoir, or None when the stratum is not among the kept ones.
+        if self.size < 1:
+            return None
+        priority = self._priority(stratum)
+        if len(self.reservoirs) >= self.size:
+            if priority >= -self.priorities[0][0]:
+                return None
+            _, dropped = heapq.heapreplace(self.priorities, (-priority, stratum))
+            self.kept -= len(self.reservoirs.pop(dropped)[1])
+        else:
+            heapq.heappush(self.priorities, (-priority, stratum))
+        reservoir = self.reservoirs[stratum] = [0, []]
+        return reservoir
+
+    def _shrink(self):
+        self.capacity = water_level([len(items) for _, items in self.reservoirs.values()], self.size)
+        self.kept = 0
+        for reservoir in self.reservoirs.values():
+            if len(reservoir[1]) > self.capacity:
+                reservoir[1] = self.random.sample(reservoir[1], self.capacity)
+            self.kept += len(reservoir[1])
+
+    def add(self, item, stratum=None):
+        reservoir = self.reservoirs.get(stratum)
+        if reservoir is None:
+            reservoir = self._new_stratum(stratum)
+            if reservoir is None:
+                self.position += 1
+                return
+        reservoir[0] += 1
+        items = reservoir[1]
+        if len(items) < self.capacity:
+            items.append((self.position, item))
+            self.kept += 1
+            if self.kept > 2 * self.size:
+                self._shrink()
+        else:
+            index = self.random.randrange(reservoir[0])
+            if index < self.capacity:
+                items[index] = (self.position, item)
+        self.position += 1
+
+    def items(self):
+        """The sampled items in input order."""
+        reservoirs = [items for _, items in self.reservoirs.values()]
+        if self.kept > self.size:
+            # Every reservoir gets min(its items, level), the level chosen so the shares add up to
+            # size; the remainder of an uneven split goes to random larger strata.
+            level = water_level([len(items) for items in reservoirs], self.size) - 1
+            shares = [min(len(items), level) for items in reservoirs]
+            larger = [index for index, items in enumerate(reservoirs) if len(items) > level]
+            for index in self.random.sample(larger, self.size - sum(shares)):
+                shares[index] += 1
+            reservoirs = [items if share == len(items) else self.random.sample(items, share)
+                          for items, share in zip(reservoirs, shares)]
+        kept = [entry for items in reservoirs for entry in items]
+        kept.sort(key=lambda entry: entry[0])
+        return [item for _, item in kept]
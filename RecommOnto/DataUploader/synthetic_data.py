@@ -0,0 +1,199 @@
+"""Synthetic inputs for the uploaders, at any scale.
+
+The Amazon (books_data.csv, books_rating.csv) and Pitchfork (database.sqlite)
+dumps are not part of the repository; these generators write files with the
+same columns and tables, including the awkward parts the uploaders have to
+handle (quoted titles, multi-line review texts, missing genres and years, the
+"fantasy live 1999" label).  The LDOS-CoMoDa generator scales the real
+LDOS-CoMoDa.csv: every copy of the original rows gets new user IDs and
+resampled context values, while the movies stay the ones in mapping_files/.
+
+    python synthetic_data.py --dataset ldos --rows 2000000 --output /tmp/bench
+
+Output is deterministic for a given --seed.
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+
+LDOS_SOURCE = "LDOS-CoMoDa.csv"
+# User IDs of the n-th copy are offset by n * LDOS_USER_STRIDE (the real IDs are far below it).
+LDOS_USER_STRIDE = 100000
+LDOS_CONTEXT_COLUMNS = ['rating', 'time', 'daytype', 'season', 'location', 'weather', 'social',
+                        'endEmo', 'dominantEmo', 'mood', 'physical', 'decision', 'interaction']
+
+AMAZON_BOOK_COLUMNS = ["Title", "description", "authors", "image", "previewLink", "publisher",
+                       "publishedDate", "infoLink", "categories", "ratingsCount"]
+AMAZON_RATING_COLUMNS = ["Id", "Title", "Price", "User_id", "profileName", "review/helpfulness",
+                         "review/score", "review/time", "review/summary", "review/text"]
+AMAZON_CATEGORIES = ["['Fiction']", "['Juvenile Fiction']", "['Biography & Autobiography']", "['History']",
+                     "['Religion']", "['Business & Economics']", "['Horror']", "['Comics & Graphic Novels']",
+                     "['Books']", ""]
+# Ratings per book in the real dump are very skewed; a few titles get most of them.
+AMAZON_RATINGS_PER_BOOK = 20
+
+PITCHFORK_TABLES = [
+    "reviews(reviewid integer, title text, artist text, url text, score real, best_new_music integer,"
+    " author text, author_type text, pub_date text, pub_weekday integer, pub_day integer,"
+    " pub_month integer, pub_year integer)",
+    "artists(reviewid integer, artist text)",
+    "genres(reviewid integer, genre text)",
+    "labels(reviewid integer, label text)",
+    "years(reviewid integer, year integer)",
+    "content(reviewid integer, content text)",
+]
+PITCHFORK_GENRES = ["rock", "electronic", "experimental", "rap", "pop/r&b", "metal", "folk/country", "jazz",
+                    "global", None]
+PITCHFORK_LABELS = ["xl", "4ad", "sub pop", "merge", "matador", "warp", "domino", '"fantasy live 1999"']
+
+WORDS = ("the of and a to in is you that it he was for on are as with his they at be this have from or one had "
+         "by word but not what all were we when your can said there use an each which she do how their if will "
+         "up other about out many then them these so some her would make like him into time has look two more "
+         "write go see number no way could people my than first water been call who oil its now find long down "
+         "day did get come made may part book story read author plot character album record sound song").split()
+
+
+def _texts(rng, count, min_words, max_words):
+    # A pool of texts to draw from; building one per row would dominate the generation time.
+    texts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), 'said "quoted", and\nmore')
+        texts.append(" ".join(words))
+    return texts
+
+
+def generate_amazon(directory, ratings, seed=0):
+    """Writes books_data.csv and books_rating.csv with `ratings` rating rows; returns the paths."""
+    rng = random.Random(seed)
+    book_count = max(ratings // AMAZON_RATINGS_PER_BOOK, 1)
+    titles = []
+    for i in range(book_count):
+        title = f"Synthetic Book {i}"
+        if i % 97 == 0:
+            title = f'The "Quoted" Book {i}'
+        elif i % 31 == 0:
+            title = f"Book, Part {i}: A Story"
+        titles.append(title)
+
+    books_path = os.path.join(directory, "books_data.csv")
+    with open(books_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(AMAZON_BOOK_COLUMNS)
+        descriptions = _texts(rng, 200, 20, 120)
+        for title in titles:
+            writer.writerow([title, rng.choice(descriptions), "['Some Author']", "", "", rng.choice(["Pub", ""]),
+                             str(rng.randint(1900, 2020)), "", rng.choice(AMAZON_CATEGORIES), str(rng.randint(1, 50))])
+
+    ratings_path = os.path.join(directory, "books_rating.csv")
+    users = max(ratings // 3, 1)
+    texts = _texts(rng, 1000, 30, 250)
+    summaries = _texts(rng, 200, 2, 8)
+    with open(ratings_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(AMAZON_RATING_COLUMNS)
+        for i in range(ratings):
+            # Half of the ratings follow a Pareto popularity curve; a few point at unknown titles.
+            if rng.random() < 0.02:
+                title = "Not In The Catalogue"
+            elif rng.random() < 0.5:
+                title = titles[min(int(rng.paretovariate(1.2)) - 1, book_count - 1)]
+            else:
+                title = titles[rng.randrange(book_count)]
+            user = f"A{rng.randrange(users):013d}"
+            name = rng.choice([f"Reader {user[-5:]}", "", 'J. "Jay" Smith', "O'Brien"])
+            writer.writerow([str(i), title, "", user if rng.random() > 0.05 else "", name,
+                             f"{rng.randint(0, 5)}/{rng.randint(5, 10)}", rng.choice(["5.0", "4.0", "3.0", "2.0", "1.0"]),
+                             str(rng.randint(900000000, 1400000000)), rng.choice(summaries), rng.choice(texts)])
+    return books_path, ratings_path
+
+
+def generate_pitchfork(directory, reviews, seed=0):
+    """Writes database.sqlite with `reviews` reviews in the Pitchfork tables; returns the path."""
+    rng = random.Random(seed)
+    path = os.path.join(directory, "database.sqlite")
+    if os.path.exists(path):
+        os.remove(path)
+    artists = max(reviews // 2, 1)
+    authors = [f"author {i}" for i in range(max(reviews // 50, 1))] + ["o'neil", None]
+    contents = _texts(rng, 200, 300, 1200)
+    conn = sqlite3.connect(path)
+    for table in PITCHFORK_TABLES:
+        conn.execute(f"CREATE TABLE {table}")
+    rows = {name: [] for name in ("reviews", "artists", "genres", "labels", "years", "content")}
+    for reviewid in range(reviews):
+        artist = f"artist {rng.randrange(artists)}"
+        title = rng.choice([f"Album {reviewid}", f"Album's \"{reviewid}\"", f"Rock n' Roll {reviewid}"])
+        rows["reviews"].append((reviewid, title, artist, "", round(rng.uniform(0, 10), 1), int(rng.random() < 0.05),
+                                rng.choice(authors), "contributor", "2015-01-01", 0, 1, 1, 2015))
+        rows["artists"].extend((reviewid, a) for a in [artist] + ([f"artist {rng.randrange(artists)}"]
+                                                                  if rng.random() < 0.1 else []))
+        rows["genres"].extend((reviewid, g) for g in rng.sample(PITCHFORK_GENRES, rng.choice([1, 1, 1, 2, 3])))
+        rows["labels"].extend((reviewid, rng.choice(PITCHFORK_LABELS)) for _ in range(rng.choice([1, 1, 2])))
+        rows["years"].extend((reviewid, rng.choice([rng.randint(1960, 2017), None]))
+                             for _ in range(rng.choice([0, 1, 1, 1, 2])))
+        rows["content"].append((reviewid, rng.choice(contents)))
+    for name, values in rows.items():
+        if values:
+            conn.executemany(f"INSERT INTO {name} VALUES ({','.join('?' * len(values[0]))})", values)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def generate_ldos(directory, rows, seed=0, source=LDOS_SOURCE):
+    """Writes LDOS-CoMoDa.csv with `rows` rows scaled from the real file; returns the path."""
+    rng = random.Random(seed)
+    with open(source, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        original = list(reader)
+    # Context values of the copies are drawn from each column's distribution in the real data.
+    columns = {name: [row[name] for row in original] for name in LDOS_CONTEXT_COLUMNS}
+
+    path = os.path.join(directory, "LDOS-CoMoDa.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for i in range(rows):
+            copy, index = divmod(i, len(original))
+            row = original[index]
+            if copy:
+                row = dict(row)
+                row['userID'] = str(int(row['userID']) + copy * LDOS_USER_STRIDE)
+                for name, values in columns.items():
+                    row[name] = rng.choice(values)
+            writer.writerow(row)
+    return path
+
+
+GENERATORS = {
+    "amazon": generate_amazon,
+    "pitchfork": generate_pitchfork,
+    "ldos": generate_ldos,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write synthetic uploader inputs.")
+    parser.add_argument("--dataset", choices=sorted(GENERATORS), required=True)
+    parser.add_argument("--rows", type=int, required=True,
+                        help="rating rows (amazon, ldos) or reviews (pitchfork) to generate")
+    parser.add_argument("--output", default=".", help="directory for the generated files")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    paths = GENERATORS[args.dataset](args.output, args.rows, args.seed)
+    for path in paths if isinstance(paths, tuple) else (paths,):
+        print(f"Wrote '{path}' ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
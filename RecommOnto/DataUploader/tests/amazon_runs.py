@@ -0,0 +1,23 @@
+"""Helpers for the tests that run the Amazon uploader on the amazon_inputs fixture."""
+import subprocess
+import sys
+
+from conftest import HERE
+from query_engine import parse_turtle
+
+
+def run_uploader(inputs, output, *args, code=None):
+    books, ratings = inputs
+    command = [sys.executable, "-c", code] if code else [sys.executable, "DataUploader_Amazon_Books.py"]
+    command += [*args, "--books", books, "--ratings", ratings, "--output", str(output), "--progress", "0"]
+    return subprocess.run(command, cwd=HERE, capture_output=True, text=True)
+
+
+def ntriples(path):
+    with open(path, encoding="utf-8") as f:
+        return {line for line in f if line.strip()}
+
+
+def turtle_graph(path):
+    with open(path, encoding="utf-8") as f:
+        return set(parse_turtle(f.read()))
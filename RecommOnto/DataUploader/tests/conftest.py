@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The uploaders and their modules are scripts run from DataUploader/, not an installed package.
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from synthetic_data import generate_amazon
+
+
+@pytest.fixture(scope="session")
+def amazon_inputs(tmp_path_factory):
+    """Synthetic books_data.csv and books_rating.csv with 3000 ratings."""
+    return generate_amazon(str(tmp_path_factory.mktemp("amazon")), 3000, seed=1)
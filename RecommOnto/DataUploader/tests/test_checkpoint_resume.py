@@ -0,0 +1,37 @@
+import os
+
+from amazon_runs import run_uploader
+
+# Runs the uploader with save_checkpoint replaced by a hard exit at its n-th call, as a crash would.
+CRASH_AT_CHECKPOINT = """
+import os, sys
+import DataUploader_Amazon_Books as uploader
+n = int(sys.argv.pop(1))
+calls = []
+save_checkpoint = uploader.save_checkpoint
+def crash(path, state):
+    calls.append(path)
+    if len(calls) == n:
+        os._exit(3)
+    save_checkpoint(path, state)
+uploader.save_checkpoint = crash
+uploader.main()
+"""
+
+
+def test_resume_gives_the_same_output(amazon_inputs, tmp_path):
+    options = ["--formats", "turtle,nt", "--checkpoint-every", "500", "--rollups", "--sample", "book",
+               "--max-records", "1000", "--seed", "3"]
+    full = run_uploader(amazon_inputs, tmp_path / "full.ttl", *options)
+    assert full.returncode == 0, full.stderr
+
+    crashed = run_uploader(amazon_inputs, tmp_path / "run.ttl", "3", *options, code=CRASH_AT_CHECKPOINT)
+    assert crashed.returncode == 3, crashed.stderr
+    assert os.path.exists(tmp_path / "run.checkpoint")
+    resumed = run_uploader(amazon_inputs, tmp_path / "run.ttl", *options, "--resume")
+    assert resumed.returncode == 0, resumed.stderr
+
+    for name in ("ttl", "nt", "rollups.csv"):
+        with open(tmp_path / f"full.{name}", "rb") as expected, open(tmp_path / f"run.{name}", "rb") as actual:
+            assert actual.read() == expected.read(), name
+    assert not os.path.exists(tmp_path / "run.checkpoint")
@@ -0,0 +1,87 @@
+"""Round trips through the .rdfb format written by TripleEmitter(formats=["binary"])."""
+import io
+
+import pytest
+
+from rdf_emitter import Literal, TripleEmitter
+
+np = pytest.importorskip("numpy")
+import graph_binary  # noqa: E402  (needs numpy)
+from graph_store_loader import read_lines  # noqa: E402
+from query_engine import TripleStore  # noqa: E402
+
+
+def write_graph(tmp_path, triples):
+    with TripleEmitter(str(tmp_path / "graph.ttl"), formats=("nt", "binary")) as out:
+        out.extend(triples)
+    with open(tmp_path / "graph.nt", encoding="utf-8") as f:
+        return {line for line in f if line.strip()}
+
+
+def sample_triples(subjects=300):
+    triples = [(":Genre", "a", "rdfs:Class")]
+    for i in range(subjects):
+        subject = f":Item_{i}"
+        triples.append((subject, "a", "schema:Book" if i % 3 else "schema:Movie"))
+        triples.append((subject, "rdfs:label", Literal(f"Zażółć \\\"gęślą\\\" {i}")))
+        triples.append((subject, ":Value", Literal(str(i % 5 + 0.5), "xsd:float")))
+        for j in range(i % 4):
+            triples.append((subject, ":hasGenre", f":Genre_{(i + j) % 7}"))
+    # Duplicates are stored once.
+    triples.append((":Item_1", "a", "schema:Book"))
+    return triples
+
+
+def test_round_trip(tmp_path):
+    expected = write_graph(tmp_path, sample_triples())
+    with graph_binary.BinaryGraph(str(tmp_path / "graph.rdfb")) as graph:
+        assert graph.triple_count == len(expected)
+        out = io.StringIO()
+        graph.write_ntriples(out)
+        assert set(out.getvalue().splitlines(keepends=True)) == expected
+
+        streamed = set()
+        for block in graph.blocks():
+            s, p, o = (graph.decode(column.tolist()) for column in block)
+            streamed.update(f"{a} {b} {c} .\n" for a, b, c in zip(s, p, o))
+        assert streamed == expected
+
+
+def test_lookups(tmp_path):
+    expected = write_graph(tmp_path, sample_triples())
+    subject = "<http://www.semanticweb.org/emili/ontologies/2025/3/recommendations/Item_7>"
+    predicate = "<http://www.semanticweb.org/emili/ontologies/2025/3/recommendations/hasGenre>"
+    with graph_binary.BinaryGraph(str(tmp_path / "graph.rdfb")) as graph:
+        for term_id in range(graph.term_count):
+            assert graph.term_id(graph.term(term_id)) == term_id
+        assert graph.term_id("<http://example.org/missing>") is None
+
+        out = io.StringIO()
+        graph.write_ntriples(out, subject=subject)
+        assert set(out.getvalue().splitlines(keepends=True)) == {line for line in expected
+                                                                 if line.startswith(subject + " ")}
+        out = io.StringIO()
+        graph.write_ntriples(out, subject=subject, predicate=predicate)
+        assert set(out.getvalue().splitlines(keepends=True)) == {line for line in expected
+                                                                 if line.startswith(f"{subject} {predicate} ")}
+        out = io.StringIO()
+        graph.write_ntriples(out, predicate=predicate)
+        assert set(out.getvalue().splitlines(keepends=True)) == {line for line in expected
+                                                                 if f" {predicate} " in line}
+
+
+def test_readers_take_rdfb_like_ntriples(tmp_path):
+    expected = write_graph(tmp_path, sample_triples())
+    assert sorted(read_lines(str(tmp_path / "graph.rdfb"))) == sorted(expected)
+
+    binary, text = TripleStore(), TripleStore()
+    assert binary.load(str(tmp_path / "graph.rdfb")) == text.load(str(tmp_path / "graph.nt")) == len(expected)
+    assert set(binary.terms) == set(text.terms)
+    assert binary.count(p=binary.term_id("<http://www.w3.org/2000/01/rdf-schema#label>")) == 300
+
+
+def test_varints():
+    values = np.array([0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1, 2 ** 40], dtype=np.uint64)
+    data, lengths = graph_binary.encode_varints(values)
+    assert len(data) == int(lengths.sum())
+    assert graph_binary.decode_varints(data).tolist() == values.tolist()
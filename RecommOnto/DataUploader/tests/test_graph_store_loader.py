@@ -0,0 +1,66 @@
+import random
+import threading
+
+import pytest
+
+import graph_store_loader
+from graph_store_loader import CONTENT_TYPES, GraphStoreLoader, LoadError, read_lines, stand_in_server
+from rdf_emitter import Literal, TripleEmitter
+
+
+@pytest.fixture
+def graph(tmp_path):
+    path = str(tmp_path / "graph.ttl")
+    with TripleEmitter(path, formats=("turtle", "nt")) as out:
+        for i in range(1000):
+            out.extend([
+                (f":User{i}", "a", ":User"),
+                (f":User{i}", ":rated", f":Rating{i}_{i % 7}"),
+                (f":Rating{i}_{i % 7}", "schema:ratingValue", Literal(str(i % 5 + 1), "xsd:float")),
+            ])
+    with open(tmp_path / "graph.nt", "rb") as f:
+        statements = {line.rstrip(b"\n") for line in f if line.strip()}
+    return path, statements
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(graph_store_loader, "RETRY_DELAY", 0.001)
+    random.seed(5)
+    server = stand_in_server(0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def load(server, path, concurrency=4, retries=20, start_batch=0):
+    loader = GraphStoreLoader(f"http://127.0.0.1:{server.server_address[1]}/", concurrency=concurrency,
+                              retries=retries, timeout=10)
+    return loader.load([(read_lines(path), CONTENT_TYPES["nt"])], batch_triples=100, start_batch=start_batch)
+
+
+def test_every_triple_arrives_once_despite_failures(graph, server):
+    path, statements = graph
+    server.fail_rate = 0.3
+    stats = load(server, path)
+    assert stats["retries"] > 0
+    assert stats["triples"] == len(statements)
+    assert server.statements == statements
+    assert server.received == len(statements)
+
+
+def test_start_batch_resumes_without_posting_twice(graph, server):
+    path, statements = graph
+    server.fail_rate = 0.3
+    with pytest.raises(LoadError) as failure:
+        load(server, path, concurrency=1, retries=0)
+    resume = failure.value.resume_batch
+    assert resume > 0
+    assert server.received == resume * 100
+
+    server.fail_rate = 0.0
+    load(server, path, concurrency=1, start_batch=resume)
+    assert server.statements == statements
+    assert server.received == len(statements)
@@ -0,0 +1,31 @@
+"""End-to-end check of the Amazon uploader's --incremental deltas on synthetic inputs."""
+import os
+import re
+
+from amazon_runs import run_uploader, turtle_graph
+from rdf_emitter import PREFIXES, expand_iri
+
+
+def test_incremental_deltas_update_the_previous_graph(amazon_inputs, tmp_path):
+    output = tmp_path / "amazon.ttl"
+    first = run_uploader(amazon_inputs, output, "--incremental", "--max-records", "1500")
+    assert first.returncode == 0, first.stderr
+    assert not os.path.exists(tmp_path / "amazon.delta-insert.ttl")
+    previous = turtle_graph(output)
+
+    second = run_uploader(amazon_inputs, output, "--incremental", "--max-records", "2000")
+    assert second.returncode == 0, second.stderr
+    current = turtle_graph(output)
+    assert current != previous
+
+    with open(tmp_path / "amazon.delta-delete.ru", encoding="utf-8") as f:
+        deleted = {f"<{expand_iri(term, PREFIXES)}>"
+                   for batch in re.findall(r"VALUES \?s \{ (.*?) \}", f.read()) for term in batch.split()}
+    inserted = turtle_graph(tmp_path / "amazon.delta-insert.ttl")
+    updated = {triple for triple in previous if triple[0] not in deleted} | inserted
+    assert updated == current
+
+    # A third run over the same input has nothing to change.
+    third = run_uploader(amazon_inputs, output, "--incremental", "--max-records", "2000")
+    assert third.returncode == 0, third.stderr
+    assert turtle_graph(tmp_path / "amazon.delta-insert.ttl") == set()
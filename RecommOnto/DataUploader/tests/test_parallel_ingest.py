@@ -0,0 +1,31 @@
+import csv
+
+from amazon_runs import ntriples, run_uploader
+from csv_partition import split_csv_ranges
+from synthetic_data import generate_amazon
+
+
+def test_ranges_split_on_record_boundaries(tmp_path):
+    # The synthetic reviews contain quoted fields with commas, quotes and newlines.
+    _, ratings = generate_amazon(str(tmp_path), 2000, seed=2)
+    with open(ratings, newline="", encoding="utf-8") as f:
+        expected = list(csv.reader(f))[1:]
+
+    for parts in (1, 2, 7):
+        ranges = split_csv_ranges(ratings, parts)
+        assert len(ranges) == parts
+        rows = []
+        with open(ratings, "rb") as f:
+            for start, end in ranges:
+                f.seek(start)
+                text = f.read(end - start).decode("utf-8")
+                rows.extend(csv.reader(text.splitlines(keepends=True)))
+        assert rows == expected
+
+
+def test_parallel_and_serial_ingest_give_the_same_graph(amazon_inputs, tmp_path):
+    serial = run_uploader(amazon_inputs, tmp_path / "serial.ttl", "--formats", "nt", "--workers", "1")
+    assert serial.returncode == 0, serial.stderr
+    parallel = run_uploader(amazon_inputs, tmp_path / "parallel.ttl", "--formats", "nt", "--workers", "3")
+    assert parallel.returncode == 0, parallel.stderr
+    assert ntriples(tmp_path / "parallel.nt") == ntriples(tmp_path / "serial.nt")
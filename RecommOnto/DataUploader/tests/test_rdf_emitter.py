@@ -0,0 +1,72 @@
+import pytest
+
+import rdf_emitter
+from query_engine import parse_turtle
+from rdf_emitter import Literal, TripleEmitter, escape_literal, sanitize_identifier
+
+TRIPLES = [
+    (":Book_a", "a", "schema:Book"),
+    (":User_1", "schema:rating", ":Rating_1"),
+    (":Book_a", "rdfs:label", Literal(escape_literal('Say "hi"\nagain'))),
+    (":User_1", "a", "foaf:Person"),
+    (":Rating_1", ":Value", Literal("4.0", "xsd:float")),
+    (":Book_a", ":hasGenre", ":" + sanitize_identifier("Science Fiction")),
+    (":User_1", "schema:rating", ":Rating_2"),
+]
+
+
+class CountingOutput:
+    def __init__(self, out, writes):
+        self.out = out
+        self.writes = writes
+
+    def write(self, text):
+        self.writes.append(text)
+        return self.out.write(text)
+
+    def close(self):
+        self.out.close()
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    writes = []
+    open_output = rdf_emitter.open_output
+    monkeypatch.setattr(rdf_emitter, "open_output",
+                        lambda *args, **kwargs: CountingOutput(open_output(*args, **kwargs), writes))
+    return writes
+
+
+def test_triples_are_grouped_by_subject(tmp_path):
+    path = str(tmp_path / "graph.ttl")
+    with TripleEmitter(path) as out:
+        out.extend(TRIPLES)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    # One block per subject, in the order the subjects first appeared.
+    blocks = [block.split(" ", 1)[0] for block in text.split("\n\n")[1:] if block.strip()]
+    assert blocks == [":Book_a", ":User_1", ":Rating_1"]
+    assert ":User_1 schema:rating :Rating_1 ;\n    a foaf:Person ;\n    schema:rating :Rating_2 .\n" in text
+    assert len(set(parse_turtle(text))) == len(TRIPLES)
+
+
+def test_output_is_written_in_a_few_large_chunks(tmp_path, writes):
+    with TripleEmitter(str(tmp_path / "graph.ttl"), buffer_triples=1000) as out:
+        for i in range(5000):
+            out.add(f":User_{i % 50}", "schema:rating", f":Rating_{i}")
+    # The header, one write per 1000 buffered triples and the footer.
+    assert len(writes) == 7
+    assert out.triple_count == 5000
+
+
+def test_formats_hold_the_same_graph(tmp_path):
+    rdflib = pytest.importorskip("rdflib")
+    path = str(tmp_path / "graph.ttl")
+    with TripleEmitter(path, formats=("turtle", "xml", "nt")) as out:
+        out.extend(TRIPLES)
+    graphs = [rdflib.Graph().parse(str(tmp_path / name), format=fmt)
+              for name, fmt in (("graph.ttl", "turtle"), ("graph.rdf", "xml"), ("graph.nt", "nt"))]
+    assert len(graphs[0]) == len(TRIPLES)
+    assert graphs[0].isomorphic(graphs[1]) and graphs[0].isomorphic(graphs[2])
+    labels = {str(o) for o in graphs[0].objects(predicate=rdflib.RDFS.label)}
+    assert labels == {'Say "hi" again'}
@@ -0,0 +1,59 @@
+from collections import Counter
+
+from sampling import RatingSampler
+
+
+def sample(size, strata, seed=0):
+    sampler = RatingSampler(size, seed)
+    for position, stratum in enumerate(strata):
+        sampler.add(position, stratum)
+    return sampler.items()
+
+
+def test_uniform_sample_keeps_input_order():
+    items = sample(50, [None] * 1000)
+    assert len(items) == 50
+    assert items == sorted(items)
+
+
+def test_unused_quota_is_handed_on():
+    # Three small strata and one large one: the small ones keep everything, the large one the rest.
+    strata = ["big"] * 500 + ["a"] * 3 + ["b"] * 5 + ["c"] * 2
+    items = sample(40, strata)
+    counts = Counter(strata[position] for position in items)
+    assert len(items) == 40
+    assert counts == {"a": 3, "b": 5, "c": 2, "big": 30}
+
+
+def test_equal_shares():
+    strata = [f"book{i % 4}" for i in range(400)] + ["book0"] * 400
+    counts = Counter(strata[position] for position in sample(100, strata))
+    assert sorted(counts.values()) == [25, 25, 25, 25]
+
+
+def test_more_strata_than_size():
+    sampler = RatingSampler(20, 1)
+    for position in range(5000):
+        sampler.add(position, f"book{position % 1000}")
+    items = sampler.items()
+    assert len(items) == 20
+    assert len(sampler.reservoirs) <= 20
+    assert len({position % 1000 for position in items}) == 20
+
+
+def test_memory_is_bounded():
+    sampler = RatingSampler(100, 2)
+    for position in range(20000):
+        sampler.add(position, f"book{position % 37}")
+        assert len(sampler) <= 200
+    assert len(sampler.items()) == 100
+
+
+def test_same_seed_same_sample():
+    strata = [f"genre{i % 7}" for i in range(2000)]
+    assert sample(70, strata, seed=5) == sample(70, strata, seed=5)
+
+
+def test_empty_sample():
+    assert sample(0, [None] * 10) == []
+    assert sample(0, ["a", "b", "a"]) == []
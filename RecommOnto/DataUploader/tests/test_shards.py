@@ -0,0 +1,33 @@
+import json
+
+from amazon_runs import ntriples, run_uploader, turtle_graph
+from query_engine import parse_turtle
+from rdf_emitter import shard_files
+
+
+def test_shards_add_up_to_the_full_graph(amazon_inputs, tmp_path):
+    full = run_uploader(amazon_inputs, tmp_path / "full.ttl", "--formats", "turtle,nt")
+    assert full.returncode == 0, full.stderr
+    sharded = run_uploader(amazon_inputs, tmp_path / "sharded.ttl", "--formats", "turtle,nt", "--shard-bytes", "200K")
+    assert sharded.returncode == 0, sharded.stderr
+
+    with open(tmp_path / "sharded.shards.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert len(manifest["shards"]) > 1
+    assert sum(shard["triples"] for shard in manifest["shards"]) == manifest["triples"]
+    union = set()
+    shard_of = {}
+    for index, path in enumerate(shard_files(str(tmp_path / "sharded.shards.json"), ("nt",))):
+        triples = ntriples(path)
+        union |= triples
+        # All triples of a subject are in one shard.
+        for line in triples:
+            assert shard_of.setdefault(line.split(" ", 1)[0], index) == index, line
+    assert union == ntriples(tmp_path / "full.nt")
+    assert sum(shard["subjects"] for shard in manifest["shards"]) == len(shard_of)
+    # Every Turtle shard parses on its own.
+    turtle = set()
+    for path in shard_files(str(tmp_path / "sharded.shards.json"), ("turtle",)):
+        with open(path, encoding="utf-8") as f:
+            turtle.update(parse_turtle(f.read()))
+    assert turtle == turtle_graph(tmp_path / "full.ttl")